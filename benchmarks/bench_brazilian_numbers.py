@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark da conversão de números no formato brasileiro (part_percent e
+theoretical_qty): conversores vetorizados do B3ParquetProcessor vs a versão
+anterior baseada em Series.apply.
+
+Execução: python benchmarks/bench_brazilian_numbers.py [--rows 10000000] [--legacy-rows 1000000]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Adicionar src ao path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from scraping.parquet_processor import B3ParquetProcessor  # noqa: E402
+
+
+def legacy_decimal(series: pd.Series) -> pd.Series:
+    """Implementação anterior (Series.apply), mantida como referência."""
+    def convert_value(value):
+        if pd.isna(value):
+            return 0.0
+        if isinstance(value, (int, float)):
+            return float(value)
+        try:
+            clean_value = str(value).strip().replace(',', '.')
+            parts = clean_value.split('.')
+            if len(parts) > 2:
+                clean_value = ''.join(parts[:-1]) + '.' + parts[-1]
+            return float(clean_value)
+        except (ValueError, AttributeError):
+            return 0.0
+    return series.apply(convert_value)
+
+
+def legacy_number(series: pd.Series) -> pd.Series:
+    """Implementação anterior (Series.apply), mantida como referência."""
+    def convert_value(value):
+        if pd.isna(value):
+            return 0
+        if isinstance(value, (int, float)):
+            return int(value)
+        try:
+            return int(float(str(value).replace('.', '').replace(' ', '')))
+        except (ValueError, AttributeError):
+            return 0
+    return series.apply(convert_value)
+
+
+def build_columns(rows: int, seed: int = 42):
+    """Gera colunas textuais como as da API ("8,123" e "1.234.567"), com 0,1% inválidos."""
+    rng = np.random.default_rng(seed)
+    part = pd.Series(np.char.replace(np.round(rng.uniform(0, 15, rows), 3).astype(str), '.', ','),
+                     name='part_percent', dtype='str')
+    qty = pd.Series([f"{v:,}".replace(',', '.') for v in rng.integers(1, 5_000_000_000, rows)],
+                    name='theoretical_qty', dtype='str')
+    invalid = rng.choice(rows, max(1, rows // 1000), replace=False)
+    part.iloc[invalid] = 'n/d'
+    qty.iloc[invalid] = '-'
+    return part, qty
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--legacy-rows', type=int, default=1_000_000,
+                        help='linhas usadas na versão com apply (tempo extrapolado)')
+    args = parser.parse_args()
+
+    processor = B3ParquetProcessor.__new__(B3ParquetProcessor)
+    part, qty = build_columns(args.rows)
+    print(f"📦 {args.rows:,} linhas de part_percent e theoretical_qty")
+
+    report = {}
+    _, decimal_s = timed(processor._convert_brazilian_decimal, part, report)
+    _, number_s = timed(processor._convert_brazilian_number, qty, report)
+    print(f"⚡ vetorizado: decimal {decimal_s:.2f}s, inteiro {number_s:.2f}s "
+          f"({report['conversion_errors']:,} falhas contadas)")
+
+    n = min(args.legacy_rows, args.rows)
+    legacy_part, legacy_qty = part.head(n), qty.head(n)
+    expected, legacy_decimal_s = timed(legacy_decimal, legacy_part)
+    assert np.allclose(expected, processor._convert_brazilian_decimal(legacy_part))
+    expected, legacy_number_s = timed(legacy_number, legacy_qty)
+    assert (expected == processor._convert_brazilian_number(legacy_qty)).all()
+
+    scale = args.rows / n
+    print(f"🐢 apply ({n:,} linhas, extrapolado): decimal {legacy_decimal_s * scale:.2f}s, "
+          f"inteiro {legacy_number_s * scale:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark de memória da limpeza (clean_and_validate_dataframe +
+add_processing_metadata): versão atual, com máscara única, sem cópias do
+DataFrame inteiro e record_hash em fatias, vs a versão anterior (dropna por
+campo, df.copy() na conversão de tipos e nos metadados, conversão para
+category e hash de uma vez).
+
+Cada variante roda em um processo próprio. Depois de montar a entrada o pico
+de RSS do processo é zerado (/proc/self/clear_refs, Linux) e o pico da limpeza
+é lido de VmHWM; sem esse suporte cai para resource.getrusage, que inclui o
+pico da montagem da entrada.
+
+Execução: python benchmarks/bench_cleaning_memory.py [--rows 2000000]
+"""
+
+import argparse
+import json
+import logging
+import resource
+import subprocess
+import sys
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Adicionar src ao path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from scraping.parquet_processor import B3ParquetProcessor, current_rss_mb  # noqa: E402
+
+VARIANTS = ('anterior', 'atual')
+
+
+def build_input(rows: int, seed: int = 42) -> pd.DataFrame:
+    """Registros brutos como vindos da API (textos no formato brasileiro, nulos e duplicatas)."""
+    rng = np.random.default_rng(seed)
+    codes = rng.integers(0, rows, size=rows)
+    codigo = pd.Series([f"TST{c}" for c in codes], dtype=object)
+    codigo[rng.random(rows) < 0.01] = None
+    return pd.DataFrame({
+        'codigo': codigo,
+        'acao': [f"EMPRESA {c}" for c in codes],
+        'tipo': np.where(codes % 2, 'PN', 'ON'),
+        'setor': [f"Setor {c % 30}" if c % 7 else None for c in codes],
+        'subsetor': [f"Subsetor {c % 90}" for c in codes],
+        'segmento': None,
+        'part_percent': [f"{c % 100},{c % 1000:03d}" for c in codes],
+        'part_accumulated': None,
+        'theoretical_qty': [f"{c:,}".replace(',', '.') for c in codes],
+        'endpoint_name': 'carteira_dia',
+        'endpoint_description': 'Carteira do Dia'
+    })
+
+
+def legacy_clean(processor: B3ParquetProcessor, df: pd.DataFrame) -> pd.DataFrame:
+    """Versão anterior da limpeza + metadados, mantida como referência."""
+    report = {'null_values_fixed': 0, 'data_type_corrections': 0, 'conversion_errors': 0}
+    df = df.dropna(how='all')
+    for field in ['codigo', 'acao']:
+        df = df.dropna(subset=[field])
+
+    df = df.copy()
+    for field in ['part_percent', 'part_accumulated']:
+        df[field] = processor._convert_brazilian_decimal(df[field], report)
+    df['theoretical_qty'] = processor._convert_brazilian_number(df['theoretical_qty'], report)
+    for field in ['setor', 'subsetor', 'segmento']:
+        df[field] = df[field].fillna('N/A')
+    for field in ['codigo', 'acao', 'setor', 'subsetor', 'segmento', 'endpoint_name', 'endpoint_description']:
+        df[field] = df[field].astype('category')
+    report['null_values_fixed'] += df.isnull().sum().sum()
+    df = df.drop_duplicates(subset=['codigo'], keep='first')
+
+    df = df.copy()
+    df['processed_at'] = datetime.now()
+    df['partition_date'] = date.today()
+    df['source_file'] = 'bench.json'
+    df['record_hash'] = pd.util.hash_pandas_object(df[['codigo', 'acao', 'part_percent']], index=False)
+    return df
+
+
+def reset_peak_rss() -> bool:
+    """Zera o pico de RSS do processo (VmHWM). Retorna False se não suportado."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as handle:
+            handle.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> float:
+    """Pico de RSS do processo em MB (VmHWM no Linux, ru_maxrss nos demais)."""
+    try:
+        with open('/proc/self/status') as handle:
+            for line in handle:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_variant(variant: str, rows: int) -> dict:
+    """Executa uma variante no processo atual e mede tempo e memória."""
+    logging.disable(logging.WARNING)
+    processor = B3ParquetProcessor(upload_to_s3=False, use_manifest=False)
+    df = build_input(rows)
+    baseline = current_rss_mb()
+    reset_peak_rss()
+
+    start = time.perf_counter()
+    if variant == 'anterior':
+        result = legacy_clean(processor, df)
+    else:
+        df_clean, _ = processor.clean_and_validate_dataframe(df)
+        result = processor.add_processing_metadata(df_clean, 'bench.json')
+    seconds = time.perf_counter() - start
+
+    peak = peak_rss_mb()
+    return {'variant': variant, 'rows': len(result), 'baseline_mb': baseline,
+            'peak_mb': peak, 'seconds': seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--variant', choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.rows)))
+        return
+
+    print(f"📦 Entrada: {args.rows:,} registros brutos")
+    print(f"{'variante':<10} {'RSS entrada MB':>15} {'pico MB':>9} {'acréscimo MB':>13} {'tempo s':>8}")
+    for variant in VARIANTS:
+        output = subprocess.run(
+            [sys.executable, __file__, '--variant', variant, '--rows', str(args.rows)],
+            check=True, capture_output=True, text=True
+        ).stdout.strip().splitlines()[-1]
+        result = json.loads(output)
+        print(f"{variant:<10} {result['baseline_mb']:>15.0f} {result['peak_mb']:>9.0f} "
+              f"{result['peak_mb'] - result['baseline_mb']:>13.0f} {result['seconds']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
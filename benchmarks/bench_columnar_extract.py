@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Benchmark da extração de ações: lista de dicts vs RecordBatch Arrow.
+
+Compara extract_stocks_from_response (um dict por ação + pd.DataFrame sobre a
+lista) com extract_stocks_to_record_batch (arrays por campo + to_pandas) em
+uma resposta sintética no formato da API da B3.
+
+Execução: python benchmarks/bench_columnar_extract.py [--rows 200000] [--repeat 5]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Adicionar src ao path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from bench_json_codec import build_payload, best_of  # noqa: E402
+from scraping.utils import (  # noqa: E402
+    extract_stocks_from_response, extract_stocks_to_record_batch
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    payload = build_payload(args.rows)
+    print(f"📦 Resposta sintética: {args.rows:,} ações")
+
+    cases = {
+        'dicts': lambda: extract_stocks_from_response(payload),
+        'dicts + DataFrame': lambda: pd.DataFrame(extract_stocks_from_response(payload)),
+        'record batch': lambda: extract_stocks_to_record_batch(payload),
+        'record batch + pandas': lambda: extract_stocks_to_record_batch(payload).to_pandas()
+    }
+
+    print(f"{'extração':<24} {'tempo (ms)':>12} {'rows/s':>14}")
+    for name, func in cases.items():
+        elapsed = best_of(func, args.repeat)
+        print(f"{name:<24} {elapsed * 1000:>12.1f} {args.rows / elapsed:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
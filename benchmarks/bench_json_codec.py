@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos backends JSON do scraping (encode/decode e decodificação tipada).
+
+Gera uma resposta sintética no formato da API da B3 e mede a vazão de cada
+backend instalado (json da biblioteca padrão, orjson, msgspec).
+
+Execução: python benchmarks/bench_json_codec.py [--rows 50000] [--repeat 5]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Adicionar src ao path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from scraping.utils import (  # noqa: E402
+    JSON_BACKENDS, get_json_codec, decode_stock_records, extract_stocks_from_response
+)
+
+
+def build_payload(rows: int) -> dict:
+    """Cria uma resposta sintética com `rows` ações."""
+    return {
+        'page': {'pageNumber': 1, 'pageSize': rows, 'totalRecords': rows, 'totalPages': 1},
+        'header': {'date': '04/08/25', 'text': 'Quantidade Teórica Total', 'part': '100,000'},
+        'results': [
+            {
+                'segment': None,
+                'cod': f'TST{i % 10000:04d}',
+                'asset': f'EMPRESA {i}',
+                'type': 'ON  NM',
+                'part': f'{(i % 1000) / 100:.3f}'.replace('.', ','),
+                'partAcum': None,
+                'theoricalQty': f'{i * 1000:,}'.replace(',', '.'),
+                'sectorName': f'Setor {i % 30}',
+                'subSectorName': f'Subsetor {i % 90}'
+            }
+            for i in range(rows)
+        ]
+    }
+
+
+def best_of(func, repeat: int) -> float:
+    """Retorna o menor tempo (segundos) entre `repeat` execuções."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    payload = build_payload(args.rows)
+    content = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    size_mb = len(content) / 1024 / 1024
+
+    print(f"📦 Payload: {args.rows} ações, {size_mb:.2f} MB")
+    print(f"{'backend':<10} {'encode MB/s':>12} {'decode MB/s':>12} {'decode+parse rows/s':>20}")
+
+    for name, (_, available) in JSON_BACKENDS.items():
+        if not available():
+            print(f"{name:<10} {'(não instalado)':>12}")
+            continue
+
+        codec = get_json_codec(name)
+        encode_s = best_of(lambda: codec.dumps(payload), args.repeat)
+        decode_s = best_of(lambda: codec.loads(content), args.repeat)
+        parse_s = best_of(lambda: extract_stocks_from_response(codec.loads(content)), args.repeat)
+
+        print(f"{name:<10} {size_mb / encode_s:>12.1f} {size_mb / decode_s:>12.1f} "
+              f"{args.rows / parse_s:>20,.0f}")
+
+    typed_s = best_of(lambda: decode_stock_records(content), args.repeat)
+    print(f"\n🧱 decode_stock_records (tipado): {args.rows / typed_s:,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
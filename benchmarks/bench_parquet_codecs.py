@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark das opções de escrita Parquet (codec, nível, row group e
+codificação) sobre um histórico sintético de vários anos no schema canônico.
+
+Para cada configuração reporta tamanho, tempo de escrita e tempo de leitura
+(arquivo único em memória, como os compactados por scraping.compaction).
+
+Execução: python benchmarks/bench_parquet_codecs.py [--years 5] [--stocks 90] [--repeat 3]
+"""
+
+import argparse
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Adicionar src ao path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from scraping.data_config import DataLakeConfig  # noqa: E402
+from scraping.parquet_processor import (  # noqa: E402
+    conform_to_stock_schema, resolve_parquet_write_options
+)
+
+TEXT_COLUMNS = ['codigo', 'acao', 'setor', 'subsetor', 'segmento', 'tipo',
+                'endpoint_name', 'endpoint_description', 'source_file']
+
+# Nome → opções que substituem as de DataLakeConfig
+SETTINGS = {
+    'none': {'compression': 'none'},
+    'snappy': {'compression': 'snappy'},
+    'lz4': {'compression': 'lz4'},
+    'gzip': {'compression': 'gzip'},
+    'zstd-1': {'compression': 'zstd', 'compression_level': 1},
+    'zstd-3': {'compression': 'zstd', 'compression_level': 3},
+    'zstd-9': {'compression': 'zstd', 'compression_level': 9},
+    'zstd-19': {'compression': 'zstd', 'compression_level': 19},
+    'zstd-3 rg=16k': {'compression': 'zstd', 'compression_level': 3, 'row_group_size': 16384},
+    'zstd-3 page=64k': {'compression': 'zstd', 'compression_level': 3, 'data_page_size': 64 * 1024},
+    'zstd-3 bss': {'compression': 'zstd', 'compression_level': 3, 'use_byte_stream_split': True},
+    'zstd-3 dict=texto': {'compression': 'zstd', 'compression_level': 3, 'use_dictionary': TEXT_COLUMNS},
+    'zstd-3 dict=texto bss': {'compression': 'zstd', 'compression_level': 3, 'use_dictionary': TEXT_COLUMNS,
+                              'use_byte_stream_split': True},
+}
+
+
+def trading_days(years: int, end: date = date(2025, 8, 1)):
+    """Dias úteis (seg-sex) dos últimos `years` anos."""
+    day = end - timedelta(days=365 * years)
+    while day < end:
+        if day.weekday() < 5:
+            yield day
+        day += timedelta(days=1)
+
+
+def build_history(years: int, stocks: int, seed: int = 42) -> pa.Table:
+    """Cria um histórico diário sintético da carteira (uma linha por ação por dia)."""
+    rng = np.random.default_rng(seed)
+    days = list(trading_days(years))
+    rows = len(days) * stocks
+
+    codes = np.array([f"TST{i:02d}{'34'[i % 2]}" for i in range(stocks)])
+    sectors = np.array([f"Setor {i % 12}" for i in range(stocks)])
+    weights = rng.dirichlet(np.ones(stocks)) * 100
+    # Pesos variam pouco de um dia para o outro, como na carteira real
+    drift = rng.normal(1, 0.01, size=(len(days), stocks)).cumprod(axis=0)
+    part = np.round((weights * drift) / (weights * drift).sum(axis=1, keepdims=True) * 100, 3)
+
+    day_index = np.repeat(np.arange(len(days)), stocks)
+    stock_index = np.tile(np.arange(stocks), len(days))
+    table = pa.table({
+        'codigo': codes[stock_index],
+        'acao': np.char.add('EMPRESA ', codes[stock_index]),
+        'tipo': np.where(stock_index % 2, 'PN', 'ON'),
+        'setor': sectors[stock_index],
+        'subsetor': np.char.add(sectors[stock_index], ' / Sub'),
+        'segmento': np.full(rows, 'N/A'),
+        'part_percent': part.ravel(),
+        'part_accumulated': np.cumsum(part, axis=1).ravel(),
+        'theoretical_qty': rng.integers(10**8, 10**10, size=stocks)[stock_index],
+        'endpoint_name': np.full(rows, 'carteira_dia_codigo'),
+        'source_file': np.full(rows, 'b3_carteira_dia_codigo.json'),
+        'processed_at': pa.array([datetime.combine(days[i], datetime.min.time()) for i in day_index],
+                                 pa.timestamp('us')),
+        'partition_date': pa.array([days[i] for i in day_index], pa.date32()),
+        'record_hash': rng.integers(0, 2**63, size=rows, dtype=np.uint64)
+    })
+    return conform_to_stock_schema(table)
+
+
+def best_of(func, repeat: int) -> float:
+    """Retorna o menor tempo (segundos) entre `repeat` execuções."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--stocks', type=int, default=90)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    table = build_history(args.years, args.stocks)
+    print(f"📦 Histórico: {args.years} anos, {table.num_rows:,} linhas, "
+          f"{table.nbytes / 1024 / 1024:.1f} MB em memória")
+    print(f"{'configuração':<22} {'tamanho KB':>11} {'razão':>7} {'escrita ms':>11} {'leitura ms':>11}")
+
+    baseline = None
+    for name, overrides in SETTINGS.items():
+        options = resolve_parquet_write_options(
+            DataLakeConfig.parquet_write_options(**overrides), table.schema
+        )
+
+        def write():
+            sink = pa.BufferOutputStream()
+            pq.write_table(table, sink, **options)
+            return sink.getvalue()
+
+        buffer = write()
+        write_s = best_of(write, args.repeat)
+        read_s = best_of(lambda: pq.read_table(pa.BufferReader(buffer)), args.repeat)
+        baseline = baseline or buffer.size
+
+        print(f"{name:<22} {buffer.size / 1024:>11,.1f} {baseline / buffer.size:>7.2f} "
+              f"{write_s * 1000:>11.1f} {read_s * 1000:>11.1f}")
+
+    print(f"\n⚙️ Configuração atual: {DataLakeConfig.PARQUET_COMPRESSION} "
+          f"(nível {DataLakeConfig.PARQUET_COMPRESSION_LEVEL or 'padrão'})")
+
+
+if __name__ == "__main__":
+    main()
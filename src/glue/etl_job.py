@@ -13,9 +13,13 @@ from awsglue.dynamicframe import DynamicFrame
 from pyspark.sql import DataFrame
 from pyspark.sql.functions import *
 from pyspark.sql.types import *
+from pyspark.sql.window import Window
 import boto3
 from datetime import datetime
 
+# Grupo do ranking de setores: mês de extração
+RANKING_KEYS = ["extraction_year_month"]
+
 # Inicializar contextos
 args = getResolvedOptions(sys.argv, ['JOB_NAME', 'BOVESPA_S3_BUCKET'])
 sc = SparkContext()
@@ -111,8 +115,8 @@ def apply_transformations(df: DataFrame) -> DataFrame:
     print("📅 Adicionando campos de data...")
     df = df.withColumn("etl_processing_date", current_date()) \
            .withColumn("etl_processing_timestamp", current_timestamp()) \
-           .withColumn("extraction_year_month", date_format(col("ano").cast("string") + "-" + 
-                      lpad(col("mes").cast("string"), 2, "0") + "-01", "yyyy-MM"))
+           .withColumn("extraction_year_month",
+                      format_string("%04d-%02d", col("ano").cast("int"), col("mes").cast("int")))
     
     # TRANSFORMAÇÃO 3: Agrupamento numérico - Agregações por setor (obrigatório)
     print("📊 Aplicando agrupamentos numéricos...")
@@ -125,7 +129,7 @@ def apply_transformations(df: DataFrame) -> DataFrame:
                               .otherwise("Low"))
     
     # Agregação por setor e mês
-    df_sector_summary = df_enriched.groupBy("setor", "extraction_year_month") \
+    df_sector_summary = df_enriched.groupBy("setor", *RANKING_KEYS) \
                                    .agg(
                                        count("stock_code").alias("total_stocks_in_sector"),
                                        sum("participacao").alias("total_participation"),
@@ -139,8 +143,10 @@ def apply_transformations(df: DataFrame) -> DataFrame:
                                               .when(col("avg_participation") > 0.1, "Medium Performance")
                                               .otherwise("Low Performance"))
     
-    # Adicionar ranking de setores
-    window_spec = Window.orderBy(desc("total_participation"))
+    # Adicionar ranking de setores dentro de cada mês. Sem partitionBy o Spark
+    # leva todas as linhas para uma única partição; particionado, cada mês é
+    # ordenado em paralelo (e são ~30 setores por grupo)
+    window_spec = Window.partitionBy(*RANKING_KEYS).orderBy(desc("total_participation"))
     df_final = df_sector_summary.withColumn("sector_rank", 
                                            row_number().over(window_spec))
     
@@ -237,90 +243,5 @@ def update_glue_catalog(bucket_name: str):
         print(f"⚠️ Aviso: Erro ao atualizar Glue Catalog: {str(e)}")
         # Não falhar o job por causa do catalog
 
-if __name__ == "__main__":
-    main()
-                         sum(col("part_percent").cast("double")).alias("total_sector_participation"),
-                         avg(col("part_percent").cast("double")).alias("avg_sector_participation"),
-                         max(col("part_percent").cast("double")).alias("max_sector_participation")
-                     
-    
-    # Adicionar dados individuais das ações também
-    df_with_metrics = df.withColumn("sector_rank", 
-                                   row_number().over(
-                                       Window.partitionBy("setor")
-                                            .orderBy(col("part_percent").desc())
-                                   ))
-    
-    print("Transformações aplicadas com sucesso")
-    return df_with_metrics
-
-def write_parquet_partitioned(df: DataFrame, output_path: str):
-    """
-    Salva dados refinados em Parquet particionado por data e setor.
-    """
-    print(f"Salvando dados refinados em: {output_path}")
-    
-    # Particionar por data e setor
-    df.write \
-      .mode("overwrite") \
-      .partitionBy("year_month", "setor") \
-      .parquet(output_path)
-    
-    # Registrar no Glue Catalog
-    sink = glueContext.getSink(
-        path=output_path,
-        connection_type="s3",
-        updateBehavior="UPDATE_IN_DATABASE",
-        partitionKeys=["year_month", "setor"],
-        compression="snappy",
-        enableUpdateCatalog=True,
-        updateCatalogOptions={"database": "bovespa_db", "tableName": "bovespa_refined"}
-    )
-    
-    print("Dados salvos e catalogados com sucesso")
-
-if __name__ == "__main__":
-    main()
-
-def read_json_data(input_path: str) -> DataFrame:
-    """
-    Lê dados JSON do S3.
-    
-    Args:
-        input_path: Caminho dos dados de entrada
-        
-    Returns:
-        DataFrame com dados carregados
-    """
-    # TODO: Implementar leitura de dados JSON
-    pass
-
-def apply_transformations(df: DataFrame) -> DataFrame:
-    """
-    Aplica transformações nos dados.
-    
-    Args:
-        df: DataFrame de entrada
-        
-    Returns:
-        DataFrame transformado
-    """
-    # TODO: Implementar transformações
-    # - Agrupamento por setor
-    # - Renomeação de colunas
-    # - Cálculos com datas
-    pass
-
-def write_parquet_partitioned(df: DataFrame, output_path: str) -> None:
-    """
-    Escreve dados em formato Parquet particionado.
-    
-    Args:
-        df: DataFrame para salvar
-        output_path: Caminho de saída
-    """
-    # TODO: Implementar escrita particionada
-    pass
-
 if __name__ == "__main__":
     main()
@@ -4,9 +4,35 @@ Implementa TODAS as transformações obrigatórias do desafio:
 1. Agrupamento numérico (sumarização, contagem ou soma)
 2. Renomear 2 colunas
 3. Cálculo com campos de data
+
+Modo incremental (padrão): um watermark em S3 guarda o LastModified mais
+recente já lido (incremental_state.py). Cada execução recalcula apenas os
+meses (ano/mes) com arquivos novos ou regravados desde então, inclusive
+backfills de meses antigos (apontados pelo manifesto do scraper), e sobrescreve somente as partições year_month
+correspondentes (dynamic partition overwrite). A leitura fica limitada aos
+meses alterados, independente do tamanho do histórico. `--ETL_MODE full`
+reprocessa tudo.
+
+As transformações vêm de transformations.py, o plano de escrita de
+write_planner.py e o watermark de incremental_state.py (publicar junto com o
+script e passar em --extra-py-files); os dois primeiros também são usados
+por local_job.py sem Spark. As escritas são
+reparticionadas pelas colunas de partição, com arquivos limitados ao tamanho
+alvo (--TARGET_FILE_SIZE_MB), e o relatório traz arquivos e bytes por
+partição.
+
+Cada execução lê o S3 uma única vez: a entrada transformada fica em cache
+(persist) e alimenta as duas escritas, e as contagens são coletadas como
+observed metrics durante a própria escrita, sem count(). O resumo da
+execução vai para refined/_etl_metrics/.
 """
 
+import json
 import sys
+import time
+from datetime import datetime, timezone
+
+import boto3
 from awsglue.transforms import *
 from awsglue.utils import getResolvedOptions
 from pyspark.context import SparkContext
@@ -18,117 +44,185 @@ from pyspark.sql.functions import *
 from pyspark.sql.types import *
 from pyspark.sql.window import Window
 
+# Módulos compartilhados com a execução local (enviados via --extra-py-files)
+import incremental_state
+import transformations
+import write_planner
+
+try:
+    # Observed metrics: contagens coletadas na própria escrita (Spark 3.3+ / Glue 4.0)
+    from pyspark.sql import Observation
+except ImportError:
+    Observation = None
+
+# Argumentos opcionais do job (getResolvedOptions falha se um argumento pedido não foi passado)
+OPTIONAL_ARGS = ['BOVESPA_S3_BUCKET', 'ETL_MODE', 'JOB_RUN_ID', 'TARGET_FILE_SIZE_MB']
+
+# Relatórios de execução
+METRICS_PREFIX = "refined/_etl_metrics/"
+
+# Saídas refinadas e suas colunas de particionamento
+OUTPUTS = {
+    'individual_stocks': ["year_month", "setor"],
+    'sector_summary': ["year_month", "quarter"]
+}
+
 # Inicializar contextos
-args = getResolvedOptions(sys.argv, ['JOB_NAME'])
+args = getResolvedOptions(
+    sys.argv, ['JOB_NAME'] + [name for name in OPTIONAL_ARGS if f"--{name}" in sys.argv]
+)
 sc = SparkContext()
 glueContext = GlueContext(sc)
 spark = glueContext.spark_session
 job = Job(glueContext)
 job.init(args['JOB_NAME'], args)
 
-def read_parquet_data(input_path: str) -> DataFrame:
+def read_parquet_data(input_path: str, partitions: list = None) -> DataFrame:
     """
     Lê dados Parquet do S3 e converte para DataFrame.
+    
+    Com `partitions`, lê apenas esses prefixos (ex.: ano=2025/mes=08) em vez
+    do data lake inteiro. As colunas extraction_date e year_month vêm do
+    caminho de cada arquivo (dia e mês de referência), com partition_date
+    como fallback para arquivos compactados sem o dia no caminho.
     """
-    print(f"Lendo dados de: {input_path}")
+    paths = [f"{input_path}{partition}/" for partition in partitions] if partitions else [input_path]
+    print(f"Lendo dados de: {', '.join(paths)}")
     
-    # Criar DynamicFrame a partir dos dados Parquet no S3
-    dynamic_frame = glueContext.create_dynamic_frame.from_options(
-        connection_type="s3",
-        connection_options={
-            "paths": [input_path],
-            "recurse": True
-        },
-        format="parquet",
-        format_options={}
-    )
+    # recursiveFileLookup: diários (ano/mes/dia) e compactados (ano/mes, ano) convivem no mesmo prefixo
+    df = spark.read.option("recursiveFileLookup", "true").parquet(*paths)
     
-    # Converter para DataFrame do Spark
-    df = dynamic_frame.toDF()
+    source_path = input_file_name()
+    year = regexp_extract(source_path, r"ano=(\d{4})", 1)
+    month = regexp_extract(source_path, r"mes=(\d{2})", 1)
+    day = regexp_extract(source_path, r"dia=(\d{2})", 1)
+    df = df.withColumn("extraction_date",
+                       when(day != "", to_date(concat_ws("-", year, month, day)))
+                       .otherwise(col("partition_date"))) \
+           .withColumn("year_month",
+                       when(month != "", concat_ws("-", year, month))
+                       .otherwise(date_format(col("partition_date"), "yyyy-MM")))
     
-    print(f"DataFrame criado com {df.count()} registros")
-    print(f"Schema: {df.printSchema()}")
+    # Sem count(): a leitura só acontece na primeira escrita
+    df.printSchema()
     return df
 
-def apply_transformations(df: DataFrame) -> DataFrame:
+def observe_rows(df: DataFrame, name: str):
+    """
+    Anexa ao DataFrame uma contagem de linhas coletada durante a próxima action.
+    
+    Returns:
+        tuple: (DataFrame observado, Observation ou None se o Spark não suportar)
+    """
+    if Observation is None:
+        return df, None
+    observation = Observation(name)
+    return df.observe(observation, count(lit(1)).alias("rows")), observation
+
+def observed_rows(df: DataFrame, observation) -> int:
+    """
+    Lê a contagem observada depois da escrita.
+    
+    Sem Observation (Spark < 3.3) conta o DataFrame, que já lê do cache da
+    entrada em vez de reler o S3.
+    """
+    if observation is not None:
+        return observation.get.get("rows", 0)
+    return df.count()
+
+def write_job_metrics(s3_client, bucket: str, metrics: dict):
+    """
+    Grava o relatório da execução em refined/_etl_metrics/ (um JSON por execução).
+    """
+    key = f"{METRICS_PREFIX}run_{datetime.now(timezone.utc):%Y%m%d_%H%M%S}.json"
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=json.dumps(metrics, indent=2, default=str).encode('utf-8'),
+        ContentType='application/json'
+    )
+    print(f"📊 Métricas do job: {json.dumps(metrics, default=str)}")
+    print(f"📊 Relatório salvo em: s3://{bucket}/{key}")
+
+def apply_transformations(df: DataFrame):
     """
     Aplica transformações obrigatórias do desafio:
     ✅ 1. Agrupamento numérico (sumarização, contagem ou soma)
     ✅ 2. Renomear 2 colunas  
     ✅ 3. Cálculo com campos de data
+    
+    A lógica fica em transformations.py, compartilhada com a execução local
+    (local_job.py); aqui roda no backend Spark.
     """
     print("🔄 Aplicando transformações obrigatórias...")
-    
-    # ✅ TRANSFORMAÇÃO 1: Renomear 2 colunas (OBRIGATÓRIO)
-    print("1️⃣ Renomeando colunas...")
-    df = df.withColumnRenamed("codigo", "stock_code") \
-           .withColumnRenamed("acao", "company_name")
-    
-    # ✅ TRANSFORMAÇÃO 2: Cálculo com campos de data (OBRIGATÓRIO)
-    print("2️⃣ Adicionando cálculos de data...")
-    df = df.withColumn("extraction_date", current_date()) \
-           .withColumn("processing_timestamp", current_timestamp()) \
-           .withColumn("year_month", date_format(current_date(), "yyyy-MM")) \
-           .withColumn("quarter", quarter(current_date())) \
-           .withColumn("days_since_extraction", 
-                      datediff(current_date(), to_date(col("extraction_date"))))
-    
-    # ✅ TRANSFORMAÇÃO 3: Agrupamento numérico (OBRIGATÓRIO)
-    print("3️⃣ Criando agregações por setor...")
-    
-    # Dados individuais com ranking
-    df_individual = df.withColumn("sector_rank", 
-                                 row_number().over(
-                                     Window.partitionBy("setor")
-                                           .orderBy(col("part_percent").cast("double").desc())
-                                 )) \
-                     .withColumn("part_percent_double", col("part_percent").cast("double"))
-    
-    # Dados agregados por setor (sumarização, contagem, soma)
-    df_sector_summary = df.groupBy("setor", "year_month", "quarter") \
-                         .agg(
-                             count("stock_code").alias("total_stocks_count"),
-                             sum(col("part_percent").cast("double")).alias("total_sector_participation"),
-                             avg(col("part_percent").cast("double")).alias("avg_sector_participation"),
-                             max(col("part_percent").cast("double")).alias("max_sector_participation"),
-                             min(col("part_percent").cast("double")).alias("min_sector_participation"),
-                             stddev(col("part_percent").cast("double")).alias("stddev_sector_participation")
-                         ) \
-                         .withColumn("processing_timestamp", current_timestamp())
-    
+    df_individual, df_sector_summary = transformations.apply_transformations(df)
     print("✅ Transformações aplicadas com sucesso!")
-    print(f"📊 Registros individuais: {df_individual.count()}")
-    print(f"📈 Setores agregados: {df_sector_summary.count()}")
     
     return df_individual, df_sector_summary
 
-def write_parquet_partitioned(df_individual: DataFrame, df_summary: DataFrame, output_path: str):
+def report_written_files(s3_client, output_path: str, name: str, partitions: list = None) -> dict:
     """
-    Salva dados refinados em Parquet particionado por data e setor.
+    Lista os arquivos gravados nas partições afetadas e resume por partição.
+    
+    Returns:
+        dict: partição -> arquivos, bytes, menor/maior arquivo e arquivos pequenos
     """
-    print(f"💾 Salvando dados refinados em: {output_path}")
+    bucket, prefix = write_planner.split_s3_path(f"{output_path}/{name}/")
+    files = []
+    for partition_prefix in incremental_state.written_partition_prefixes(partitions):
+        paginator = s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket, Prefix=f"{prefix}{partition_prefix}"):
+            files.extend((obj['Key'], obj['Size']) for obj in page.get('Contents', []))
+    summary = write_planner.summarize_files(files, prefix)
+    print(write_planner.format_file_report(name, summary))
+    return summary
+
+def write_parquet_partitioned(df_individual: DataFrame, df_summary: DataFrame, output_path: str,
+                              dynamic: bool = True, partitions: list = None,
+                              target_file_size_mb: float = write_planner.TARGET_FILE_SIZE_MB) -> dict:
+    """
+    Salva dados refinados em Parquet particionado por data e setor.
     
-    # Salvar dados individuais particionados por ano/mês/setor
-    individual_path = f"{output_path}/individual_stocks/"
-    print(f"Salvando dados individuais em: {individual_path}")
+    Com `dynamic`, o overwrite substitui só as partições presentes nos
+    DataFrames (meses recalculados) e mantém as demais. Cada saída é
+    reparticionada pelas suas colunas de partição (um arquivo por partição,
+    dividido só acima do tamanho alvo).
     
-    df_individual.write \
-                 .mode("overwrite") \
-                 .partitionBy("year_month", "setor") \
-                 .option("compression", "snappy") \
-                 .parquet(individual_path)
+    Returns:
+        dict: Linhas gravadas, tempo de cada escrita e arquivos por partição
+    """
+    print(f"💾 Salvando dados refinados em: {output_path}")
+    spark.conf.set("spark.sql.sources.partitionOverwriteMode", "dynamic" if dynamic else "static")
+    frames = {'individual_stocks': df_individual, 'sector_summary': df_summary}
+    observations = {}
+    written = {'files': {}}
     
-    # Salvar dados agregados particionados por ano/mês
-    summary_path = f"{output_path}/sector_summary/"
-    print(f"Salvando dados agregados em: {summary_path}")
+    for name, partition_columns in OUTPUTS.items():
+        df, observations[name] = observe_rows(frames[name], name)
+        df, max_records = write_planner.plan_spark_write(df, partition_columns, target_file_size_mb)
+        frames[name] = df
+        path = f"{output_path}/{name}/"
+        print(f"Salvando {name} em: {path} (até {max_records} registros por arquivo)")
+        
+        started = time.perf_counter()
+        df.write \
+          .mode("overwrite") \
+          .partitionBy(*partition_columns) \
+          .option("compression", "snappy") \
+          .option("maxRecordsPerFile", max_records) \
+          .parquet(path)
+        written[f"write_{name}_seconds"] = round(time.perf_counter() - started, 2)
     
-    df_summary.write \
-              .mode("overwrite") \
-              .partitionBy("year_month", "quarter") \
-              .option("compression", "snappy") \
-              .parquet(summary_path)
+    written['individual_rows'] = observed_rows(frames['individual_stocks'], observations['individual_stocks'])
+    written['sector_summary_rows'] = observed_rows(frames['sector_summary'], observations['sector_summary'])
+    print(f"📊 Registros individuais: {written['individual_rows']}")
+    print(f"📈 Setores agregados: {written['sector_summary_rows']}")
     
+    s3_client = boto3.client('s3')
+    for name in OUTPUTS:
+        written['files'][name] = report_written_files(s3_client, output_path, name, partitions)
     print("✅ Dados salvos com sucesso!")
+    return written
 
 def register_glue_catalog(output_path: str):
     """
@@ -183,24 +277,53 @@ def main():
         # Configurações do job
         # Configuração via argumentos do Glue
         bucket_name = args.get('BOVESPA_S3_BUCKET', 'bovespa-pipeline-data-adri-victor')
-        input_path = f"s3://{bucket_name}/data_lake/"
+        incremental = args.get('ETL_MODE', 'incremental') != 'full'
+        input_path = f"s3://{bucket_name}/{incremental_state.INPUT_PREFIX}"
         output_path = f"s3://{bucket_name}/refined/"
+        s3_client = boto3.client('s3')
+        job_started = time.perf_counter()
+        metrics = {
+            'job_name': args['JOB_NAME'],
+            'job_run_id': args.get('JOB_RUN_ID'),
+            'mode': 'incremental' if incremental else 'full',
+            'started_at': datetime.now(timezone.utc).isoformat()
+        }
+        
+        # 1. Descobrir partições novas desde o último processamento
+        watermark = incremental_state.load_watermark(s3_client, bucket_name) if incremental else {}
+        partitions, new_watermark = incremental_state.list_new_partitions(s3_client, bucket_name, watermark)
+        if not partitions:
+            print("✅ Nenhuma partição nova desde o último processamento")
+            metrics.update(partitions=[], total_seconds=round(time.perf_counter() - job_started, 2))
+            write_job_metrics(s3_client, bucket_name, metrics)
+            return
+        print(f"📅 Modo {'incremental' if incremental else 'completo'}: {len(partitions)} partições")
+        metrics['partitions'] = partitions
         
-        # 1. Ler dados brutos do S3
+        # 2. Ler dados brutos do S3 (só os meses afetados no modo incremental)
         print("📖 Lendo dados do S3...")
-        df = read_parquet_data(input_path)
+        df = read_parquet_data(input_path, partitions if incremental else None)
         
-        # 2. Aplicar transformações obrigatórias
+        # 3. Aplicar transformações obrigatórias
         print("🔧 Aplicando transformações...")
         df_individual, df_summary = apply_transformations(df)
         
-        # 3. Salvar dados refinados com particionamento
+        # 4. Salvar dados refinados com particionamento
         print("💾 Salvando dados refinados...")
-        write_parquet_partitioned(df_individual, df_summary, output_path)
+        target_file_size_mb = float(args.get('TARGET_FILE_SIZE_MB', write_planner.TARGET_FILE_SIZE_MB))
+        metrics.update(write_parquet_partitioned(
+            df_individual, df_summary, output_path, dynamic=incremental,
+            partitions=partitions if incremental else None, target_file_size_mb=target_file_size_mb
+        ))
+        spark.catalog.clearCache()
+        incremental_state.save_watermark(s3_client, bucket_name, new_watermark)
+        metrics['watermark'] = new_watermark
         
-        # 4. Registrar no Glue Catalog
+        # 5. Registrar no Glue Catalog
         register_glue_catalog(output_path)
         
+        metrics['total_seconds'] = round(time.perf_counter() - job_started, 2)
+        write_job_metrics(s3_client, bucket_name, metrics)
         print("🎉 Job ETL B3 concluído com sucesso!")
         
     except Exception as e:
@@ -0,0 +1,256 @@
+"""
+Estado do processamento incremental do ETL B3 (watermark em S3).
+
+O watermark guarda o LastModified mais recente já lido do data lake. Cada
+execução seleciona as partições ano/mes com objetos gravados depois dele
+sem listar o histórico inteiro:
+
+- janela recente: lista apenas os meses do watermark em diante (e o mês
+  anterior, pois a partição é a data do pregão, não a da gravação);
+- backfills: lê o manifesto de processamento do scraper
+  (data_lake/_processing_manifest.json), que registra a chave de cada arquivo
+  enviado, e lista também os meses antigos com entradas novas.
+
+O custo de cada execução cresce com o período desde o último processamento,
+não com o tamanho do data lake. Sem watermark (primeira execução ou
+ETL_MODE=full), ou se o manifesto não puder ser lido, o prefixo data_lake/
+é listado inteiro.
+
+Limitação: o manifesto guarda só a última gravação de cada arquivo de origem;
+se o mesmo arquivo bruto for reprocessado para vários meses antigos entre
+duas execuções do ETL, apenas o último é detectado (use ETL_MODE=full).
+
+As funções são Python puro (boto3), usadas pelo job Glue
+(etl_job_complete.py) e testáveis sem Spark nem awsglue.
+"""
+
+import json
+import re
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+# Estado do processamento incremental
+WATERMARK_KEY = "refined/_etl_watermark.json"
+INPUT_PREFIX = "data_lake/"
+
+# Manifesto do scraper (mesmo valor de ProcessingConfig.MANIFEST_S3_KEY)
+MANIFEST_KEY = "data_lake/_processing_manifest.json"
+
+# Partição de um arquivo do data lake: ano=YYYY/mes=MM/... (diário ou mensal) ou ano=YYYY/... (anual)
+PARTITION_PATTERN = re.compile(r"^ano=(\d{4})/(?:mes=(\d{2})/)?")
+
+
+def load_watermark(s3_client, bucket: str) -> Dict:
+    """
+    Lê o watermark do processamento incremental (vazio na primeira execução).
+
+    Args:
+        s3_client: Cliente boto3 do S3
+        bucket (str): Bucket do pipeline
+
+    Returns:
+        Dict: Watermark gravado ou {} se ainda não existir
+    """
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=WATERMARK_KEY)
+    except s3_client.exceptions.NoSuchKey:
+        return {}
+    return json.loads(response['Body'].read())
+
+
+def save_watermark(s3_client, bucket: str, watermark: Dict) -> None:
+    """
+    Grava o watermark depois que os dados refinados foram salvos.
+
+    Args:
+        s3_client: Cliente boto3 do S3
+        bucket (str): Bucket do pipeline
+        watermark (Dict): Novo watermark (ver list_new_partitions)
+    """
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=WATERMARK_KEY,
+        Body=json.dumps(watermark, indent=2).encode('utf-8'),
+        ContentType='application/json'
+    )
+    print(f"🔖 Watermark atualizado: {watermark['last_modified']} ({len(watermark['partitions'])} partições)")
+
+
+def partition_of(relative_key: str) -> Optional[str]:
+    """
+    Partição (ano=YYYY/mes=MM ou ano=YYYY) de uma chave relativa ao data lake.
+
+    Manifesto, temporários e arquivos que não são Parquet não têm partição.
+    Arquivos compactados mensais caem no próprio mês; anuais, no ano inteiro.
+
+    Args:
+        relative_key (str): Chave sem o prefixo data_lake/
+
+    Returns:
+        Optional[str]: Partição do arquivo ou None se deve ser ignorado
+    """
+    if not relative_key.endswith('.parquet') or any(
+            part.startswith(('_', '.')) for part in relative_key.split('/')):
+        return None
+    match = PARTITION_PATTERN.match(relative_key)
+    if not match:
+        return None
+    year, month = match.groups()
+    return f"ano={year}/mes={month}" if month else f"ano={year}"
+
+
+def partition_prefix(partition: str) -> Tuple[str, Optional[str]]:
+    """
+    Prefixo (e delimitador) da listagem de uma partição do data lake.
+
+    Meses são listados recursivamente (dias e compactado mensal); anos, só no
+    primeiro nível, onde ficam os compactados anuais.
+
+    Args:
+        partition (str): ano=YYYY/mes=MM ou ano=YYYY
+
+    Returns:
+        Tuple: (prefixo, delimitador ou None)
+    """
+    if '/mes=' in partition:
+        return f"{INPUT_PREFIX}{partition}/", None
+    return f"{INPUT_PREFIX}{partition}/", '/'
+
+
+def recent_partitions(since: datetime, now: datetime) -> Set[str]:
+    """
+    Meses (e anos) da janela entre o mês anterior ao watermark e o atual.
+
+    Args:
+        since (datetime): LastModified do watermark
+        now (datetime): Horário atual
+
+    Returns:
+        Set[str]: Partições ano=YYYY/mes=MM e ano=YYYY da janela
+    """
+    year, month = (since.year - 1, 12) if since.month == 1 else (since.year, since.month - 1)
+    partitions = set()
+    while (year, month) <= (now.year, now.month):
+        partitions.update((f"ano={year:04d}/mes={month:02d}", f"ano={year:04d}"))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return partitions
+
+
+def manifest_partitions(s3_client, bucket: str, since: datetime) -> Optional[Set[str]]:
+    """
+    Partições com arquivos enviados ou compactados depois do watermark,
+    segundo o manifesto de processamento do scraper.
+
+    Args:
+        s3_client: Cliente boto3 do S3
+        bucket (str): Bucket do pipeline
+        since (datetime): LastModified do watermark
+
+    Returns:
+        Optional[Set[str]]: Partições alteradas ou None se o manifesto não
+            puder ser lido (backfills não seriam detectados)
+    """
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=MANIFEST_KEY)
+        entries = json.loads(response['Body'].read()).get('entries', {})
+    except (s3_client.exceptions.NoSuchKey, ValueError, AttributeError) as e:
+        print(f"⚠️ Manifesto indisponível ({e!r}), listando o data lake inteiro")
+        return None
+
+    partitions = set()
+    for entry in entries.values():
+        s3_key = entry.get('s3_key') or ''
+        # processed_at/compacted_at são gravados no horário local do scraper
+        changed = [datetime.fromisoformat(entry[field]).astimezone(timezone.utc)
+                   for field in ('processed_at', 'compacted_at') if entry.get(field)]
+        if not s3_key.startswith(INPUT_PREFIX) or not any(ts > since for ts in changed):
+            continue
+        partition = partition_of(s3_key[len(INPUT_PREFIX):])
+        if partition:
+            partitions.add(partition)
+    return partitions
+
+
+def _list_objects(s3_client, bucket: str, prefix: str, delimiter: Optional[str] = None) -> Iterator[Dict]:
+    paginator = s3_client.get_paginator('list_objects_v2')
+    params = {'Bucket': bucket, 'Prefix': prefix}
+    if delimiter:
+        params['Delimiter'] = delimiter
+    for page in paginator.paginate(**params):
+        yield from page.get('Contents', [])
+
+
+def list_new_partitions(s3_client, bucket: str, watermark: Dict,
+                        now: Optional[datetime] = None) -> Tuple[List[str], Optional[Dict]]:
+    """
+    Lista as partições (ano=YYYY/mes=MM) com arquivos novos ou regravados
+    desde o watermark.
+
+    Com watermark, só são listados os meses da janela recente e os meses
+    antigos apontados pelo manifesto (backfill ou reprocessamento); em cada
+    um, os objetos são filtrados por LastModified. Sem watermark ou sem
+    manifesto legível, o data lake inteiro é listado.
+
+    Args:
+        s3_client: Cliente boto3 do S3
+        bucket (str): Bucket do pipeline
+        watermark (Dict): Watermark atual ({} processa tudo)
+        now (Optional[datetime]): Horário atual (padrão: agora, em UTC)
+
+    Returns:
+        Tuple: (partições ordenadas, novo watermark ou None se nada mudou)
+    """
+    since = (datetime.fromisoformat(watermark['last_modified'])
+             if watermark.get('last_modified') else None)
+
+    backfilled = manifest_partitions(s3_client, bucket, since) if since else None
+    if backfilled is None:
+        listings = [(INPUT_PREFIX, None)]
+    else:
+        candidates = recent_partitions(since, now or datetime.now(timezone.utc)) | backfilled
+        listings = [partition_prefix(partition) for partition in sorted(candidates)]
+
+    partitions = set()
+    latest = None
+    for prefix, delimiter in listings:
+        for obj in _list_objects(s3_client, bucket, prefix, delimiter):
+            partition = partition_of(obj['Key'][len(INPUT_PREFIX):])
+            if partition is None or (since and obj['LastModified'] <= since):
+                continue
+            partitions.add(partition)
+            if latest is None or obj['LastModified'] > latest:
+                latest = obj['LastModified']
+
+    if not partitions:
+        return [], None
+
+    partitions = sorted(partitions)
+    new_watermark = {
+        'last_modified': latest.astimezone(timezone.utc).isoformat(),
+        'partitions': partitions,
+        'updated_at': datetime.now(timezone.utc).isoformat()
+    }
+    return partitions, new_watermark
+
+
+def written_partition_prefixes(partitions: Optional[List[str]] = None) -> List[str]:
+    """
+    Prefixos year_month= das partições de saída afetadas (todas se None).
+
+    ano=2025/mes=08 vira year_month=2025-08/; ano=2025 (compactado anual) vira
+    year_month=2025-, que cobre os meses do ano.
+
+    Args:
+        partitions (Optional[List[str]]): Partições do data lake recalculadas
+
+    Returns:
+        List[str]: Prefixos relativos à raiz de cada saída
+    """
+    if not partitions:
+        return ['']
+    prefixes = []
+    for partition in partitions:
+        match = PARTITION_PATTERN.match(f"{partition}/")
+        year, month = match.groups()
+        prefixes.append(f"year_month={year}-{month}/" if month else f"year_month={year}-")
+    return prefixes
@@ -0,0 +1,212 @@
+"""
+Execução local do ETL B3, sem Spark nem Glue.
+
+Aplica as mesmas transformações do job Glue (transformations.py) com o
+backend pandas/pyarrow. Serve para lotes pequenos (o dia a dia são algumas
+centenas de registros), que rodam em segundos numa Lambda ou na máquina de
+desenvolvimento sem o custo de inicialização do Glue.
+
+Lê e grava tanto em disco quanto em S3 (caminhos s3://, via pyarrow.fs) e
+segue o layout do job Glue: refined/individual_stocks particionado por
+year_month/setor e refined/sector_summary por year_month/quarter. Só as
+partições recalculadas são substituídas (equivalente ao dynamic partition
+overwrite do Spark), e os arquivos seguem o mesmo plano de escrita
+(write_planner.py): tamanho alvo e relatório de arquivos por partição.
+
+Uso: python src/glue/local_job.py --input data_lake --output refined [--partitions ano=2025/mes=08]
+"""
+
+import argparse
+import re
+import time
+from datetime import date
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+try:
+    from .transformations import apply_transformations
+    from .write_planner import (
+        TARGET_FILE_SIZE_MB, estimate_row_width, format_file_report, rows_per_file, summarize_files
+    )
+except ImportError:
+    # Fallback para execução direta
+    from transformations import apply_transformations
+    from write_planner import (
+        TARGET_FILE_SIZE_MB, estimate_row_width, format_file_report, rows_per_file, summarize_files
+    )
+
+# Partição de referência no caminho de cada arquivo do data lake
+_YEAR = re.compile(r"ano=(\d{4})")
+_MONTH = re.compile(r"mes=(\d{2})")
+_DAY = re.compile(r"dia=(\d{2})")
+
+# Saídas e colunas de particionamento (mesmas do job Glue)
+OUTPUTS = {
+    'individual_stocks': ['year_month', 'setor'],
+    'sector_summary': ['year_month', 'quarter']
+}
+
+
+def _list_parquet_files(filesystem: pafs.FileSystem, base: str) -> List[str]:
+    """Arquivos .parquet sob `base`, ignorando manifesto, temporários e ocultos."""
+    selector = pafs.FileSelector(base, recursive=True, allow_not_found=True)
+    files = []
+    for info in filesystem.get_file_info(selector):
+        relative = info.path[len(base):].lstrip('/')
+        if info.type == pafs.FileType.File and relative.endswith('.parquet') and not any(
+                part.startswith(('_', '.')) for part in relative.split('/')):
+            files.append(info.path)
+    return sorted(files)
+
+
+def _with_reference_columns(table: pa.Table, path: str) -> pa.Table:
+    """
+    Adiciona extraction_date e year_month a partir do caminho do arquivo
+    (mesma regra de etl_job_complete.read_parquet_data).
+    """
+    year, month, day = (pattern.search(path) for pattern in (_YEAR, _MONTH, _DAY))
+    if year and month and day:
+        extraction = pa.array([date(int(year[1]), int(month[1]), int(day[1]))] * table.num_rows, pa.date32())
+    else:
+        # Compactados sem o dia no caminho: data registrada no processamento
+        extraction = pc.cast(table['partition_date'], pa.date32())
+    if year and month:
+        year_month = pa.array([f"{year[1]}-{month[1]}"] * table.num_rows, pa.string())
+    else:
+        year_month = pc.strftime(extraction, format='%Y-%m')
+    return table.append_column('extraction_date', extraction).append_column('year_month', year_month)
+
+
+def read_data_lake(input_path: str, partitions: Optional[List[str]] = None) -> pa.Table:
+    """
+    Lê os arquivos Parquet do data lake (todos ou só as partições indicadas).
+
+    Args:
+        input_path (str): Raiz do data lake (diretório local ou s3://bucket/prefixo)
+        partitions (Optional[List[str]]): Prefixos relativos (ex.: ano=2025/mes=08)
+
+    Returns:
+        pa.Table: Registros com extraction_date e year_month
+    """
+    filesystem, base = pafs.FileSystem.from_uri(input_path) if '://' in input_path \
+        else (pafs.LocalFileSystem(), input_path)
+    base = base.rstrip('/')
+    roots = [f"{base}/{partition.strip('/')}" for partition in partitions] if partitions else [base]
+
+    tables = []
+    for root in roots:
+        for path in _list_parquet_files(filesystem, root):
+            table = pq.read_table(path, filesystem=filesystem)
+            tables.append(_with_reference_columns(table, path))
+    if not tables:
+        return pa.table({})
+    return pa.concat_tables(tables, promote_options='default')
+
+
+def write_refined(df, output_path: str, name: str,
+                  target_file_size_mb: float = TARGET_FILE_SIZE_MB) -> Dict:
+    """
+    Grava uma saída refinada particionada, substituindo só as partições presentes.
+
+    Args:
+        df (pd.DataFrame): Dados transformados
+        output_path (str): Raiz da camada refined (diretório local ou s3://)
+        name (str): Saída (chave de OUTPUTS)
+        target_file_size_mb (float): Tamanho alvo de cada arquivo
+
+    Returns:
+        Dict: Linhas gravadas ('rows') e arquivos por partição ('files')
+    """
+    filesystem, base = pafs.FileSystem.from_uri(output_path) if '://' in output_path \
+        else (pafs.LocalFileSystem(), output_path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    partition_columns = OUTPUTS[name]
+    max_rows = rows_per_file(estimate_row_width(
+        field.type for field in table.schema if field.name not in partition_columns
+    ), target_file_size_mb)
+    target = f"{base.rstrip('/')}/{name}"
+    ds.write_dataset(
+        table,
+        target,
+        filesystem=filesystem,
+        format='parquet',
+        partitioning=partition_columns,
+        partitioning_flavor='hive',
+        basename_template='part-{i}.snappy.parquet',
+        existing_data_behavior='delete_matching',
+        max_rows_per_file=max_rows,
+        max_rows_per_group=min(max_rows, 1024 * 1024),
+        file_options=ds.ParquetFileFormat().make_write_options(compression='snappy')
+    )
+
+    # Relatório só das partições gravadas nesta execução (por year_month, como no job Glue)
+    files = []
+    for year_month in pc.unique(table['year_month']).to_pylist():
+        selector = pafs.FileSelector(f"{target}/year_month={year_month}", recursive=True, allow_not_found=True)
+        files.extend((info.path, info.size) for info in filesystem.get_file_info(selector)
+                     if info.type == pafs.FileType.File)
+    summary = summarize_files(files, target)
+    print(format_file_report(name, summary))
+    return {'rows': table.num_rows, 'files': summary}
+
+
+def run_local_job(input_path: str, output_path: str, partitions: Optional[List[str]] = None,
+                  today: Optional[date] = None,
+                  target_file_size_mb: float = TARGET_FILE_SIZE_MB) -> Dict:
+    """
+    Executa leitura, transformações e escrita com o backend pandas/pyarrow.
+
+    Args:
+        input_path (str): Raiz do data lake
+        output_path (str): Raiz da camada refined
+        partitions (Optional[List[str]]): Partições a processar (padrão: todas)
+        today (Optional[date]): Data de referência para days_since_extraction
+        target_file_size_mb (float): Tamanho alvo dos arquivos de saída
+
+    Returns:
+        Dict: Métricas da execução (mesmos nomes do relatório do job Glue)
+    """
+    started = time.perf_counter()
+    table = read_data_lake(input_path, partitions)
+    metrics = {'mode': 'local', 'partitions': partitions or [], 'input_rows': table.num_rows}
+    if table.num_rows == 0:
+        print("✅ Nenhum registro para processar")
+        metrics['total_seconds'] = round(time.perf_counter() - started, 2)
+        return metrics
+
+    df_individual, df_summary = apply_transformations(table, today)
+    metrics['files'] = {}
+    for name, rows_key, df in (('individual_stocks', 'individual_rows', df_individual),
+                               ('sector_summary', 'sector_summary_rows', df_summary)):
+        written = write_refined(df, output_path, name, target_file_size_mb)
+        metrics[rows_key] = written['rows']
+        metrics['files'][name] = written['files']
+    metrics['total_seconds'] = round(time.perf_counter() - started, 2)
+
+    print(f"📊 Registros individuais: {metrics['individual_rows']}")
+    print(f"📈 Setores agregados: {metrics['sector_summary_rows']}")
+    return metrics
+
+
+def main():
+    """Ponto de entrada da linha de comando."""
+    parser = argparse.ArgumentParser(description="ETL B3 local (pandas/pyarrow, sem Spark)")
+    parser.add_argument('--input', default='data_lake', help='Raiz do data lake (diretório ou s3://)')
+    parser.add_argument('--output', default='refined', help='Raiz da camada refined (diretório ou s3://)')
+    parser.add_argument('--partitions', nargs='*', help='Partições a processar (ex.: ano=2025/mes=08)')
+    parser.add_argument('--target-size-mb', type=float, default=TARGET_FILE_SIZE_MB,
+                        help='Tamanho alvo dos arquivos de saída (MB)')
+    args = parser.parse_args()
+
+    metrics = run_local_job(args.input, args.output, args.partitions,
+                            target_file_size_mb=args.target_size_mb)
+    print(f"🎉 ETL local concluído em {metrics['total_seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
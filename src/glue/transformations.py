@@ -1,76 +1,256 @@
 """
 Lógicas de transformação para os dados B3.
 Funções auxiliares para o ETL job.
+
+Cada transformação é implementada uma vez e roda em dois backends:
+- Spark (pyspark.sql.DataFrame), usado pelo job Glue (etl_job_complete.py);
+- pandas/pyarrow (pd.DataFrame ou pa.Table), usado pela execução local
+  (local_job.py) e pelos testes, sem Spark nem awsglue.
+
+O backend é escolhido pelo tipo do DataFrame recebido. pyspark só é
+importado se estiver instalado, então o módulo funciona em Lambda.
+
+Entrada esperada: colunas do data lake (codigo, acao, setor, part_percent...)
+mais extraction_date (data de referência da partição) e, opcionalmente,
+year_month (YYYY-MM).
 """
 
-from typing import Dict, List, Any
-from pyspark.sql import DataFrame
-from pyspark.sql.functions import *
-from pyspark.sql.types import *
+from datetime import date, datetime
+from typing import Dict, Any, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+try:
+    from pyspark import StorageLevel
+    from pyspark.sql import DataFrame as SparkDataFrame
+    from pyspark.sql import functions as F
+    from pyspark.sql.window import Window
+except ImportError:
+    # Execução local (Lambda/testes): apenas o backend pandas/pyarrow
+    SparkDataFrame = None
+
+# Colunas renomeadas (nome no data lake -> nome na camada refined)
+RENAMED_COLUMNS = {
+    'codigo': 'stock_code',
+    'acao': 'company_name'
+}
+
+# Chaves do ranking e da agregação por setor
+RANK_PARTITION_COLUMNS = ['year_month', 'setor']
+SECTOR_GROUP_COLUMNS = ['setor', 'year_month', 'quarter']
+
+
+def is_spark(df: Any) -> bool:
+    """
+    Indica se o DataFrame é do Spark (caso contrário, backend pandas).
+
+    Args:
+        df: DataFrame Spark, pandas ou tabela Arrow
+
+    Returns:
+        bool: True para pyspark.sql.DataFrame
+    """
+    return SparkDataFrame is not None and isinstance(df, SparkDataFrame)
+
 
-def standardize_column_names(df: DataFrame) -> DataFrame:
+def _to_pandas(df: Any) -> pd.DataFrame:
+    """Converte tabela Arrow para pandas (DataFrames pandas passam direto)."""
+    return df.to_pandas() if isinstance(df, pa.Table) else df
+
+
+def standardize_column_names(df: Any) -> Any:
     """
     Padroniza nomes de colunas.
-    
+
     Args:
         df: DataFrame de entrada
-        
+
     Returns:
         DataFrame com colunas padronizadas
     """
-    # TODO: Implementar padronização de colunas
-    # Será desenvolvido na Fase 4
-    pass
+    if is_spark(df):
+        for source, target in RENAMED_COLUMNS.items():
+            df = df.withColumnRenamed(source, target)
+        return df
+    return _to_pandas(df).rename(columns=RENAMED_COLUMNS)
 
-def add_partition_columns(df: DataFrame) -> DataFrame:
+
+def add_partition_columns(df: Any, today: Optional[date] = None) -> Any:
     """
-    Adiciona colunas de particionamento (year, month, day).
-    
+    Adiciona os campos de data: year_month (se ausente), quarter,
+    days_since_extraction e processing_timestamp.
+
     Args:
-        df: DataFrame de entrada
-        
+        df: DataFrame de entrada com extraction_date
+        today (Optional[date]): Data de referência para days_since_extraction
+            (padrão: data atual)
+
     Returns:
         DataFrame com colunas de partição
     """
-    # TODO: Implementar colunas de partição
-    pass
+    if is_spark(df):
+        if 'year_month' not in df.columns:
+            df = df.withColumn("year_month", F.date_format(F.col("extraction_date"), "yyyy-MM"))
+        reference = F.lit(today) if today else F.current_date()
+        return df.withColumn("processing_timestamp", F.current_timestamp()) \
+                 .withColumn("quarter", F.quarter(F.to_date(F.concat(F.col("year_month"), F.lit("-01"))))) \
+                 .withColumn("days_since_extraction", F.datediff(reference, F.col("extraction_date")))
 
-def calculate_sector_aggregations(df: DataFrame) -> DataFrame:
+    df = _to_pandas(df).copy(deep=False)
+    extraction = pd.to_datetime(df['extraction_date'])
+    if 'year_month' not in df.columns:
+        df['year_month'] = extraction.dt.strftime('%Y-%m')
+    df['processing_timestamp'] = pd.Timestamp(datetime.now())
+    df['quarter'] = ((df['year_month'].str[5:7].astype('int32') - 1) // 3 + 1).astype('int32')
+    df['days_since_extraction'] = (pd.Timestamp(today or date.today()) - extraction).dt.days.astype('int32')
+    return df
+
+
+def cast_numeric_columns(df: Any) -> Any:
+    """
+    Adiciona part_percent_double (participação como número; texto inválido vira nulo).
+
+    Args:
+        df: DataFrame de entrada com part_percent
+
+    Returns:
+        DataFrame com part_percent_double
+    """
+    if is_spark(df):
+        return df.withColumn("part_percent_double", F.col("part_percent").cast("double"))
+    df = _to_pandas(df).copy(deep=False)
+    df['part_percent_double'] = pd.to_numeric(df['part_percent'], errors='coerce').astype('float64')
+    return df
+
+
+def add_sector_rank(df: Any) -> Any:
+    """
+    Adiciona o ranking da ação dentro do setor (maior participação = 1) em
+    cada mês.
+
+    O ranking é por mês para que uma execução incremental, que recalcula só
+    os meses com dados novos, produza o mesmo resultado do reprocessamento
+    completo.
+
+    Args:
+        df: DataFrame de entrada com setor, year_month e part_percent_double
+
+    Returns:
+        DataFrame com sector_rank
+    """
+    if is_spark(df):
+        window = Window.partitionBy(*RANK_PARTITION_COLUMNS).orderBy(F.col("part_percent_double").desc())
+        return df.withColumn("sector_rank", F.row_number().over(window))
+
+    df = _to_pandas(df).copy(deep=False)
+    # method='first' desempata pela ordem das linhas, como row_number
+    df['sector_rank'] = df.groupby(RANK_PARTITION_COLUMNS, dropna=False)['part_percent_double'] \
+                          .rank(method='first', ascending=False, na_option='bottom') \
+                          .astype('int32')
+    return df
+
+
+def calculate_sector_aggregations(df: Any) -> Any:
     """
     Calcula agregações por setor.
-    
+
     Args:
-        df: DataFrame de entrada
-        
+        df: DataFrame de entrada (com part_percent_double, ver cast_numeric_columns)
+
     Returns:
         DataFrame com agregações por setor
     """
-    # TODO: Implementar agregações por setor
-    pass
+    if is_spark(df):
+        participation = F.col("part_percent_double")
+        return df.groupBy(*SECTOR_GROUP_COLUMNS) \
+                 .agg(
+                     F.count("stock_code").alias("total_stocks_count"),
+                     F.sum(participation).alias("total_sector_participation"),
+                     F.avg(participation).alias("avg_sector_participation"),
+                     F.max(participation).alias("max_sector_participation"),
+                     F.min(participation).alias("min_sector_participation"),
+                     F.stddev(participation).alias("stddev_sector_participation")
+                 ) \
+                 .withColumn("processing_timestamp", F.current_timestamp())
+
+    df = _to_pandas(df)
+    grouped = df.groupby(SECTOR_GROUP_COLUMNS, dropna=False)
+    summary = grouped.agg(
+        total_stocks_count=('stock_code', 'count'),
+        avg_sector_participation=('part_percent_double', 'mean'),
+        max_sector_participation=('part_percent_double', 'max'),
+        min_sector_participation=('part_percent_double', 'min'),
+        stddev_sector_participation=('part_percent_double', 'std')
+    )
+    # Como no Spark, a soma de um grupo só com nulos é nula (não zero)
+    summary.insert(1, 'total_sector_participation',
+                   grouped['part_percent_double'].sum(min_count=1))
+    summary = summary.reset_index()
+    summary['total_stocks_count'] = summary['total_stocks_count'].astype('int64')
+    summary['processing_timestamp'] = pd.Timestamp(datetime.now())
+    return summary
 
-def clean_data_quality(df: DataFrame) -> DataFrame:
+
+def clean_data_quality(df: Any) -> Any:
     """
     Limpa e valida qualidade dos dados.
-    
+
+    Remove registros sem código ou nome da ação (antes ou depois da
+    padronização dos nomes).
+
     Args:
         df: DataFrame de entrada
-        
+
     Returns:
         DataFrame limpo
     """
-    # TODO: Implementar limpeza de dados
-    pass
+    required = [column for column in list(RENAMED_COLUMNS) + list(RENAMED_COLUMNS.values())
+                if column in df.columns]
+    if is_spark(df):
+        return df.dropna(subset=required)
+    return _to_pandas(df).dropna(subset=required)
 
-def enrich_with_metadata(df: DataFrame, metadata: Dict[str, Any]) -> DataFrame:
+
+def enrich_with_metadata(df: Any, metadata: Dict[str, Any]) -> Any:
     """
     Enriquece dados com metadados.
-    
+
     Args:
         df: DataFrame de entrada
-        metadata: Metadados para adicionar
-        
+        metadata: Metadados para adicionar (nome da coluna -> valor constante)
+
     Returns:
         DataFrame enriquecido
     """
-    # TODO: Implementar enriquecimento
-    pass
+    if is_spark(df):
+        for name, value in metadata.items():
+            df = df.withColumn(name, F.lit(value))
+        return df
+    return _to_pandas(df).assign(**metadata)
+
+
+def apply_transformations(df: Any, today: Optional[date] = None) -> Tuple[Any, Any]:
+    """
+    Aplica as transformações obrigatórias do desafio no backend do DataFrame:
+    1. Renomear 2 colunas
+    2. Cálculo com campos de data
+    3. Agrupamento numérico (ranking e agregações por setor)
+
+    Args:
+        df: Dados do data lake (Spark, pandas ou Arrow) com extraction_date
+        today (Optional[date]): Data de referência para days_since_extraction
+
+    Returns:
+        Tuple: (dados individuais com ranking, resumo por setor)
+    """
+    df = standardize_column_names(df)
+    df = add_partition_columns(df, today)
+    df = cast_numeric_columns(df)
+    if is_spark(df):
+        # Entrada comum aos dois ramos: materializada uma vez na primeira
+        # escrita e reaproveitada na segunda, sem reler o S3
+        df = df.persist(StorageLevel.MEMORY_AND_DISK)
+    df_individual = add_sector_rank(df)
+    df_sector_summary = calculate_sector_aggregations(df)
+    return df_individual, df_sector_summary
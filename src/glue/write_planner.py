@@ -0,0 +1,166 @@
+"""
+Planejamento das escritas particionadas da camada refined.
+
+Sem planejamento, cada task do Spark grava um arquivo em cada diretório de
+partição (year_month/setor) que recebe linhas dela, e o S3 se enche de
+objetos de poucos KB que o Athena precisa abrir um a um. O plano:
+- reparticiona pelas colunas de partição, para que cada partição de saída
+  seja escrita por uma única task;
+- limita as linhas por arquivo a partir da largura estimada da linha e do
+  tamanho alvo (arquivos grandes são divididos, pequenos não se multiplicam);
+- depois da escrita, resume quantos arquivos e quantos bytes ficaram em cada
+  partição.
+
+As funções são Python puro, usadas pelo job Glue e por local_job.py;
+plan_spark_write só chama métodos do DataFrame recebido, sem importar
+pyspark.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Tamanho alvo dos arquivos de saída (mesmo alvo da compactação do data lake)
+TARGET_FILE_SIZE_MB = 128
+
+# Largura estimada (bytes, sem compressão) por tipo; nomes do Spark
+# (simpleString) e do Arrow
+_TYPE_WIDTHS = {
+    'boolean': 1, 'bool': 1,
+    'tinyint': 1, 'int8': 1, 'uint8': 1,
+    'smallint': 2, 'int16': 2, 'uint16': 2,
+    'int': 4, 'int32': 4, 'uint32': 4, 'float': 4, 'date': 4, 'date32[day]': 4,
+    'bigint': 8, 'int64': 8, 'uint64': 8, 'double': 8, 'date64[ms]': 8
+}
+_TIMESTAMP_WIDTH = 8
+
+# Tipos sem largura fixa (texto, decimal, aninhados): média assumida
+DEFAULT_VARIABLE_WIDTH = 32
+
+# Arquivos abaixo deste tamanho são contados como pequenos no relatório
+SMALL_FILE_BYTES = 1024 * 1024
+
+
+def estimate_row_width(column_types: Iterable[str]) -> int:
+    """
+    Estima a largura de uma linha (bytes, sem compressão) a partir dos tipos.
+
+    Args:
+        column_types (Iterable[str]): Tipos das colunas (ex.: 'string', 'bigint', 'int64')
+
+    Returns:
+        int: Bytes estimados por linha (mínimo 1)
+    """
+    width = 0
+    for column_type in column_types:
+        column_type = str(column_type).lower()
+        if column_type in _TYPE_WIDTHS:
+            width += _TYPE_WIDTHS[column_type]
+        elif column_type.startswith('timestamp'):
+            width += _TIMESTAMP_WIDTH
+        else:
+            width += DEFAULT_VARIABLE_WIDTH
+    return max(width, 1)
+
+
+def rows_per_file(row_width: int, target_file_size_mb: float = TARGET_FILE_SIZE_MB) -> int:
+    """
+    Linhas por arquivo para atingir o tamanho alvo.
+
+    A estimativa é sem compressão, então os arquivos gravados tendem a ficar
+    abaixo do alvo, nunca acima.
+
+    Args:
+        row_width (int): Bytes estimados por linha
+        target_file_size_mb (float): Tamanho alvo de cada arquivo
+
+    Returns:
+        int: Máximo de linhas por arquivo (mínimo 1)
+    """
+    return max(int(target_file_size_mb * 1024 * 1024 // max(row_width, 1)), 1)
+
+
+def plan_spark_write(df, partition_columns: List[str],
+                     target_file_size_mb: float = TARGET_FILE_SIZE_MB) -> Tuple[object, int]:
+    """
+    Prepara um DataFrame Spark para escrita com partitionBy(partition_columns).
+
+    Args:
+        df: DataFrame Spark
+        partition_columns (List[str]): Colunas de particionamento da saída
+        target_file_size_mb (float): Tamanho alvo de cada arquivo
+
+    Returns:
+        Tuple: (DataFrame reparticionado, valor para a opção maxRecordsPerFile)
+    """
+    row_width = estimate_row_width(
+        field.dataType.simpleString() for field in df.schema.fields
+        if field.name not in partition_columns
+    )
+    return df.repartition(*partition_columns), rows_per_file(row_width, target_file_size_mb)
+
+
+def split_s3_path(path: str) -> Tuple[str, str]:
+    """
+    Separa bucket e prefixo de um caminho s3://bucket/prefixo.
+
+    Returns:
+        Tuple[str, str]: (bucket, prefixo sem barras repetidas, terminado em '/')
+    """
+    bucket, _, prefix = path.replace('s3://', '', 1).partition('/')
+    prefix = re.sub(r'/+', '/', prefix).strip('/')
+    return bucket, f"{prefix}/" if prefix else ''
+
+
+def summarize_files(files: Iterable[Tuple[str, int]], base: str) -> Dict[str, Dict]:
+    """
+    Resume arquivos gravados por partição (diretório relativo à base).
+
+    Args:
+        files (Iterable[Tuple[str, int]]): (caminho, tamanho em bytes) de cada arquivo
+        base (str): Raiz da saída (ex.: refined/individual_stocks/)
+
+    Returns:
+        Dict[str, Dict]: partição -> files, bytes, min_bytes, max_bytes, small_files
+    """
+    base = base.rstrip('/') + '/'
+    summary = {}
+    for path, size in files:
+        if not path.startswith(base):
+            continue
+        partition, _, name = path[len(base):].rpartition('/')
+        # Ignorar marcadores do Spark (_SUCCESS) e temporários
+        if not name.endswith('.parquet') or name.startswith(('_', '.')):
+            continue
+        stats = summary.setdefault(partition, {'files': 0, 'bytes': 0, 'min_bytes': size,
+                                               'max_bytes': size, 'small_files': 0})
+        stats['files'] += 1
+        stats['bytes'] += size
+        stats['min_bytes'] = min(stats['min_bytes'], size)
+        stats['max_bytes'] = max(stats['max_bytes'], size)
+        stats['small_files'] += size < SMALL_FILE_BYTES
+    return dict(sorted(summary.items()))
+
+
+def format_file_report(name: str, summary: Dict[str, Dict], max_lines: Optional[int] = 20) -> str:
+    """
+    Texto do relatório de arquivos por partição (para o log do job).
+
+    Args:
+        name (str): Nome da saída
+        summary (Dict[str, Dict]): Resultado de summarize_files
+        max_lines (Optional[int]): Máximo de partições listadas (None = todas)
+
+    Returns:
+        str: Relatório formatado
+    """
+    files = sum(stats['files'] for stats in summary.values())
+    total = sum(stats['bytes'] for stats in summary.values())
+    small = sum(stats['small_files'] for stats in summary.values())
+    lines = [f"📁 {name}: {len(summary)} partições, {files} arquivos, "
+             f"{total / 1024 / 1024:.2f} MB ({small} abaixo de {SMALL_FILE_BYTES // 1024} KB)"]
+    for partition, stats in list(summary.items())[:max_lines]:
+        lines.append(f"   {partition}: {stats['files']} arquivo(s), {stats['bytes'] / 1024:.1f} KB "
+                     f"(min {stats['min_bytes'] / 1024:.1f} KB, max {stats['max_bytes'] / 1024:.1f} KB)")
+    if max_lines is not None and len(summary) > max_lines:
+        lines.append(f"   ... mais {len(summary) - max_lines} partições")
+    return '\n'.join(lines)
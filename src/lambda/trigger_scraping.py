@@ -9,7 +9,7 @@ import logging
 import sys
 import os
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 # Adicionar src ao path para imports
 sys.path.append('/opt/python')  # Lambda layer path
@@ -57,8 +57,13 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         if not scraping_result['success']:
             raise Exception(f"Falha no scraping: {scraping_result['error']}")
         
-        # 2. Processar e enviar para S3
-        s3_result = process_and_upload_to_s3()
+        # 2. Processar e enviar para S3 (endpoints inalterados são ignorados)
+        # No modo em memória os lotes colunares seguem direto para o processador
+        batches = scraping_result.pop('batches', None)
+        s3_result = process_and_upload_to_s3(
+            skip_files=scraping_result.get('unchanged_files'),
+            batches=batches
+        )
         
         if not s3_result['success']:
             raise Exception(f"Falha no upload S3: {s3_result['error']}")
@@ -108,23 +113,45 @@ def run_scraping_pipeline() -> Dict[str, Any]:
     try:
         # Import dinâmico para evitar erros se módulos não estiverem disponíveis
         from scraping.scraping import B3Scraper
+        from scraping.http_cache import ResponseCache
+        from scraping.utils import build_columnar_batches
         
         logger.info("📊 Iniciando scraping B3...")
         
-        scraper = B3Scraper()
-        data = scraper.run_scraping()
+        # B3_PIPELINE_MODE=memory entrega os dados ao processador sem gravar JSON em /tmp
+        in_memory = os.environ.get('B3_PIPELINE_MODE', 'files').lower() == 'memory'
+        
+        # B3_HTTP_CACHE_DIR (ex.: /tmp/b3_cache) ativa o cache HTTP com revalidação
+        cache_dir = os.environ.get('B3_HTTP_CACHE_DIR')
+        scraper = B3Scraper(cache=ResponseCache(cache_dir) if cache_dir else None,
+                            persist_raw=not in_memory)
         
-        stocks_count = len(data.get('combined_stocks', []))
-        endpoints_count = len(data.get('endpoints', {}))
+        # B3_INDICES (ex.: "IBOV,SMLL,IDIV") ativa o modo multi-índice
+        indices_env = os.environ.get('B3_INDICES')
+        if indices_env:
+            indices = [index.strip() for index in indices_env.split(',') if index.strip()]
+            data = scraper.run_multi_index_scraping(indices)
+            stocks_count = data['metadata']['total_stocks']
+            endpoints_count = data['metadata']['total_endpoints_processed']
+        else:
+            # Endpoints buscados em paralelo: duração limitada pelo endpoint mais lento
+            data = scraper.run_scraping(concurrent=True)
+            stocks_count = len(data.get('combined_stocks', []))
+            endpoints_count = len(data.get('endpoints', {}))
         
         logger.info(f"✅ Scraping concluído: {stocks_count} ações de {endpoints_count} endpoints")
         
-        return {
+        result = {
             'success': True,
             'stocks_collected': stocks_count,
             'endpoints_processed': endpoints_count,
+            'unchanged_files': data.get('metadata', {}).get('unchanged_files', []),
             'timestamp': data.get('timestamp')
         }
+        if in_memory:
+            result['batches'] = build_columnar_batches(data)
+        
+        return result
         
     except ImportError as e:
         logger.error(f"❌ Módulo de scraping não encontrado: {str(e)}")
@@ -139,10 +166,16 @@ def run_scraping_pipeline() -> Dict[str, Any]:
             'error': str(e)
         }
 
-def process_and_upload_to_s3() -> Dict[str, Any]:
+def process_and_upload_to_s3(skip_files: Optional[List[str]] = None,
+                             batches: Optional[List[Dict]] = None) -> Dict[str, Any]:
     """
     Processa dados JSON e faz upload para S3.
     
+    Args:
+        skip_files: Arquivos JSON inalterados que não precisam ser reprocessados
+        batches: Lotes colunares do scraper (modo em memória); se None,
+            os arquivos JSON do diretório de entrada são processados
+    
     Returns:
         Dict com resultado do processamento
     """
@@ -156,8 +189,13 @@ def process_and_upload_to_s3() -> Dict[str, Any]:
         if not bucket_name:
             raise Exception("BOVESPA_S3_BUCKET não configurado no ambiente")
         
-        processor = B3ParquetProcessor(upload_to_s3=True)
-        results = processor.process_all_json_files()
+        # B3_KEEP_LOCAL_COPY=false grava o Parquet direto no S3, sem passar por /tmp
+        keep_local_copy = os.environ.get('B3_KEEP_LOCAL_COPY', 'true').lower() != 'false'
+        processor = B3ParquetProcessor(upload_to_s3=True, keep_local_copy=keep_local_copy)
+        if batches is not None:
+            results = processor.process_batches(batches)
+        else:
+            results = processor.process_all_json_files(skip_files=skip_files)
         
         files_processed = len(results.get('processed_files', []))
         uploads_success = len([r for r in results.get('processed_files', []) if r.get('s3_uploaded')])
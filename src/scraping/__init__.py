@@ -4,10 +4,13 @@ Estrutura modular para coleta e processamento de dados da Bovespa.
 """
 
 from .scraping import B3Scraper, main, display_summary
-from .config import ENDPOINTS_CONFIG, HTTP_HEADERS, Constants, FileConfig
+from .config import ENDPOINTS_CONFIG, HTTP_HEADERS, Constants, FileConfig, IndexConfig
 from .utils import (
     parse_stock_data, validate_json_response, extract_stocks_from_response,
-    save_json_data, load_json_data, format_timestamp, format_date
+    save_json_data, load_json_data, format_timestamp, format_date,
+    encode_payload, build_endpoint_url, build_index_endpoints,
+    get_json_codec, decode_stock_records, B3StockRecord, build_columnar_batches,
+    extract_stocks_to_record_batch
 )
 
 __version__ = "1.0.0"
@@ -21,11 +24,20 @@ __all__ = [
     'HTTP_HEADERS',
     'Constants',
     'FileConfig',
+    'IndexConfig',
     'parse_stock_data',
     'validate_json_response',
     'extract_stocks_from_response',
     'save_json_data',
     'load_json_data',
     'format_timestamp',
-    'format_date'
+    'format_date',
+    'encode_payload',
+    'build_endpoint_url',
+    'build_index_endpoints',
+    'get_json_codec',
+    'decode_stock_records',
+    'B3StockRecord',
+    'build_columnar_batches',
+    'extract_stocks_to_record_batch'
 ]
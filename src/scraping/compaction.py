@@ -0,0 +1,531 @@
+"""
+Compactação de arquivos pequenos do data lake da B3.
+
+O layout diário `ano=YYYY/mes=MM/dia=DD/<dataset>_YYYYMMDD.parquet` gera
+arquivos de poucas centenas de registros; com os anos, Glue e Athena passam
+a maior parte do tempo listando objetos e lendo rodapés. Este módulo junta
+os arquivos diários de cada dataset em arquivos mensais
+(`ano=YYYY/mes=MM/<dataset>_YYYYMM.parquet`) ou anuais
+(`ano=YYYY/<dataset>_YYYY.parquet`), divididos pelo tamanho alvo.
+
+Cada arquivo compactado registra nos metadados Parquet a origem de cada
+faixa de linhas (arquivo diário e hash do conteúdo). Com isso a compactação
+é idempotente: arquivos diários já incorporados são apenas removidos, e um
+arquivo diário reprocessado substitui a sua faixa na execução seguinte.
+
+A troca é feita por grupo (dataset, período) em três passos:
+1. os arquivos compactados são gravados por completo em `_staging/`, que
+   leitores (Glue, Athena, local_job) ignoram;
+2. cada um é promovido para a partição final (os.replace no disco, cópia no
+   S3) e
+3. os arquivos substituídos são removidos.
+Uma falha antes do passo 2 não altera o que os leitores veem (o staging é
+descartado). Só entre os passos 2 e 3 — poucas chamadas por grupo, sem
+serialização — um leitor pode ver as linhas do grupo em dobro; se a execução
+for interrompida nesse intervalo, a seguinte reconhece pelo hash os diários
+já incorporados e apenas os remove. Os registros carregam `partition_date` (a data da partição diária
+de origem, não a do processamento), então o dia continua disponível para
+consultas depois da compactação.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import boto3
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    from .config import setup_logger
+    from .data_config import CompactionConfig, DataLakeConfig, ProcessingConfig
+    from .parquet_processor import S3Uploader, conform_to_stock_schema, resolve_parquet_write_options
+    from .processing_manifest import ProcessingManifest
+except ImportError:
+    # Fallback para execução direta
+    from config import setup_logger
+    from data_config import CompactionConfig, DataLakeConfig, ProcessingConfig
+    from parquet_processor import S3Uploader, conform_to_stock_schema, resolve_parquet_write_options
+    from processing_manifest import ProcessingManifest
+
+# Configurar logger
+logger = setup_logger(__name__)
+
+DAY, MONTH, YEAR = "day", "month", "year"
+
+# Arquivos reconhecidos, por nível (chaves relativas à raiz do data lake)
+_FILE_PATTERNS = {
+    DAY: re.compile(r'^ano=(?P<year>\d{4})/mes=(?P<month>\d{2})/dia=\d{2}/'
+                    r'(?P<dataset>[^/]+)_\d{8}\.parquet$'),
+    MONTH: re.compile(r'^ano=(?P<year>\d{4})/mes=(?P<month>\d{2})/'
+                      r'(?P<dataset>[^/]+)_\d{6}(?:_part\d{2,})?\.parquet$'),
+    YEAR: re.compile(r'^ano=(?P<year>\d{4})/'
+                     r'(?P<dataset>[^/]+)_\d{4}(?:_part\d{2,})?\.parquet$')
+}
+
+
+def classify_lake_file(key: str) -> Optional[Tuple[str, str, int, Optional[int]]]:
+    """
+    Identifica nível, dataset e período de um arquivo do data lake.
+
+    Args:
+        key (str): Caminho relativo à raiz (ex.: ano=2025/mes=08/dia=04/x_20250804.parquet)
+
+    Returns:
+        Optional[Tuple]: (nível, dataset, ano, mês ou None) ou None se não reconhecido
+    """
+    for level, pattern in _FILE_PATTERNS.items():
+        match = pattern.match(key)
+        if match:
+            month = match.groupdict().get('month')
+            return level, match.group('dataset'), int(match.group('year')), int(month) if month else None
+    return None
+
+
+def _is_hidden(key: str) -> bool:
+    # Prefixos "." e "_" são ignorados por Glue/Athena (temporários, manifesto)
+    return any(part.startswith(('.', '_')) for part in key.split('/'))
+
+
+def _format_period(period: Tuple[int, ...]) -> str:
+    return '-'.join(f"{value:02d}" for value in period)
+
+
+class LocalLakeStorage:
+    """Data lake no sistema de arquivos local."""
+
+    manifest_field = 'output'
+
+    def __init__(self, root: str = str(DataLakeConfig.LOCAL_BASE_PATH)):
+        self.root = Path(root)
+
+    def __str__(self) -> str:
+        return str(self.root)
+
+    def list_files(self) -> Dict[str, int]:
+        """Retorna {chave relativa: tamanho em bytes} dos arquivos Parquet."""
+        files = {}
+        for path in self.root.rglob('*.parquet'):
+            key = path.relative_to(self.root).as_posix()
+            if not _is_hidden(key):
+                files[key] = path.stat().st_size
+        return files
+
+    def read_bytes(self, key: str) -> bytes:
+        return (self.root / key).read_bytes()
+
+    def write(self, key: str, data: pa.Buffer) -> None:
+        """Grava em arquivo temporário oculto e troca com os.replace (atômico)."""
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def promote(self, source: str, key: str) -> None:
+        """Move um arquivo do staging para a chave final (os.replace, atômico)."""
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(self.root / source, path)
+        self.delete([source])
+
+    def delete(self, keys: List[str]) -> None:
+        """Remove os arquivos e as partições que ficarem vazias."""
+        for key in keys:
+            path = self.root / key
+            path.unlink(missing_ok=True)
+            parent = path.parent
+            while parent != self.root and parent.exists() and not any(parent.iterdir()):
+                parent.rmdir()
+                parent = parent.parent
+
+    def locate(self, key: str) -> str:
+        """Caminho do arquivo como registrado no manifesto ('output')."""
+        return str(self.root / key)
+
+
+class S3LakeStorage:
+    """Data lake em um bucket S3 (prefixo data_lake/)."""
+
+    manifest_field = 's3_key'
+
+    def __init__(self, s3_client, bucket: str, prefix: str = "data_lake/",
+                 uploader: Optional[S3Uploader] = None):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.rstrip('/') + '/'
+        self.uploader = uploader or S3Uploader(s3_client, bucket)
+
+    def __str__(self) -> str:
+        return f"s3://{self.bucket}/{self.prefix}"
+
+    def list_files(self) -> Dict[str, int]:
+        files = {}
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get('Contents', []):
+                key = obj['Key'][len(self.prefix):]
+                if key.endswith('.parquet') and not _is_hidden(key):
+                    files[key] = obj['Size']
+        return files
+
+    def read_bytes(self, key: str) -> bytes:
+        response = self.s3_client.get_object(Bucket=self.bucket, Key=self.prefix + key)
+        return response['Body'].read()
+
+    def write(self, key: str, data: pa.Buffer) -> None:
+        """O objeto só fica visível depois do upload completo (PUT/multipart)."""
+        record = self.uploader.upload_bytes(data, self.prefix + key)
+        if not record['success']:
+            raise IOError(f"Falha no upload de {key}: {record['error']}")
+
+    def promote(self, source: str, key: str) -> None:
+        """Copia o objeto do staging para a chave final (cópia no servidor) e remove o original."""
+        self.s3_client.copy(
+            {'Bucket': self.bucket, 'Key': self.prefix + source}, self.bucket, self.prefix + key,
+            ExtraArgs=self.uploader.extra_args, Config=self.uploader.transfer_config
+        )
+        self.delete([source])
+
+    def delete(self, keys: List[str]) -> None:
+        batch_size = CompactionConfig.S3_DELETE_BATCH
+        for start in range(0, len(keys), batch_size):
+            batch = keys[start:start + batch_size]
+            response = self.s3_client.delete_objects(
+                Bucket=self.bucket,
+                Delete={'Objects': [{'Key': self.prefix + key} for key in batch], 'Quiet': True}
+            )
+            if response.get('Errors'):
+                raise IOError(f"Falha ao remover objetos: {response['Errors'][:3]}")
+
+    def locate(self, key: str) -> str:
+        """Chave do objeto como registrada no manifesto ('s3_key')."""
+        return self.prefix + key
+
+
+class LakeCompactor:
+    """
+    Junta os arquivos diários de cada dataset em arquivos mensais ou anuais.
+    """
+
+    def __init__(self, storage, granularity: str = CompactionConfig.GRANULARITY,
+                 target_file_size_mb: float = CompactionConfig.TARGET_FILE_SIZE_MB,
+                 manifest: Optional[ProcessingManifest] = None,
+                 write_options: Optional[Dict] = None):
+        """
+        Args:
+            storage: LocalLakeStorage ou S3LakeStorage
+            granularity (str): "month" ou "year"
+            target_file_size_mb (float): Tamanho alvo de cada arquivo compactado
+            manifest (Optional[ProcessingManifest]): Manifesto a ser atualizado
+            write_options (Optional[Dict]): Opções que substituem as de DataLakeConfig
+        """
+        if granularity not in (MONTH, YEAR):
+            raise ValueError(f"Granularidade inválida: {granularity} (use 'month' ou 'year')")
+        self.storage = storage
+        self.granularity = granularity
+        self.target_bytes = int(target_file_size_mb * 1024 * 1024)
+        self.manifest = manifest
+        self.write_options = DataLakeConfig.parquet_write_options(**(write_options or {}))
+
+    def _period(self, year: int, month: Optional[int]) -> Tuple[int, ...]:
+        return (year, month) if self.granularity == MONTH else (year,)
+
+    def plan(self, until: Optional[date] = None) -> Dict[Tuple, Dict[str, Tuple[str, int]]]:
+        """
+        Agrupa os arquivos do data lake por dataset e período.
+
+        O período em andamento (o de `until`, padrão hoje) e os seguintes
+        não são compactados, pois ainda recebem arquivos diários.
+
+        Args:
+            until (Optional[date]): Data de referência do período em aberto
+
+        Returns:
+            Dict: {(dataset, período): {chave: (nível, tamanho)}}
+        """
+        until = until or date.today()
+        open_period = self._period(until.year, until.month)
+        groups = {}
+        for key, size in sorted(self.storage.list_files().items()):
+            info = classify_lake_file(key)
+            if not info:
+                continue
+            level, dataset, year, month = info
+            if level == YEAR and self.granularity == MONTH:
+                continue
+            period = self._period(year, month)
+            if period >= open_period:
+                continue
+            groups.setdefault((dataset, period), {})[key] = (level, size)
+        return groups
+
+    def _output_key(self, dataset: str, period: Tuple[int, ...], part: int, parts: int) -> str:
+        suffix = f"_part{part + 1:02d}" if parts > 1 else ""
+        if self.granularity == MONTH:
+            year, month = period
+            return f"ano={year:04d}/mes={month:02d}/{dataset}_{year:04d}{month:02d}{suffix}.parquet"
+        return f"ano={period[0]:04d}/{dataset}_{period[0]:04d}{suffix}.parquet"
+
+    def _load_members(self, files: Dict[str, Tuple[str, int]]) -> Tuple[Dict[str, Dict], List[str], List[str]]:
+        """
+        Decompõe as entradas do grupo em membros (um por arquivo diário de origem).
+
+        Returns:
+            Tuple: (membros por nome, arquivos diários novos/alterados, diários já incorporados)
+        """
+        members = {}
+        for key, (level, size) in files.items():
+            if level == DAY:
+                continue
+            table = pq.read_table(pa.BufferReader(self.storage.read_bytes(key)))
+            metadata = (table.schema.metadata or {}).get(CompactionConfig.METADATA_KEY)
+            provenance = json.loads(metadata) if metadata else [
+                {'name': key, 'hash': None, 'rows': table.num_rows}
+            ]
+            offset = 0
+            for member in provenance:
+                members[member['name']] = {
+                    'hash': member['hash'],
+                    'table': table.slice(offset, member['rows']),
+                    'size': size * member['rows'] / max(table.num_rows, 1)
+                }
+                offset += member['rows']
+
+        fresh, leftovers = [], []
+        for key, (level, size) in files.items():
+            if level != DAY:
+                continue
+            content = self.storage.read_bytes(key)
+            content_hash = f"sha256:{hashlib.sha256(content).hexdigest()}"
+            existing = members.get(key)
+            if existing and existing['hash'] == content_hash:
+                # Troca interrompida: o arquivo já está no compactado
+                leftovers.append(key)
+                continue
+            members[key] = {
+                'hash': content_hash,
+                'table': pq.read_table(pa.BufferReader(content)),
+                'size': size
+            }
+            fresh.append(key)
+
+        return members, fresh, leftovers
+
+    def _split(self, members: Dict[str, Dict]) -> List[List[Tuple[str, Dict]]]:
+        """Distribui os membros (em ordem cronológica) em partes de até target_bytes."""
+        parts, current, current_size = [], [], 0
+        for name, member in sorted(members.items()):
+            if current and current_size + member['size'] > self.target_bytes:
+                parts.append(current)
+                current, current_size = [], 0
+            current.append((name, member))
+            current_size += member['size']
+        if current:
+            parts.append(current)
+        return parts
+
+    def _build_output(self, part: List[Tuple[str, Dict]]) -> Tuple[pa.Buffer, int]:
+        table = pa.concat_tables(
+            [conform_to_stock_schema(member['table']) for _, member in part],
+            promote_options='default'
+        )
+        provenance = [{'name': name, 'hash': member['hash'], 'rows': member['table'].num_rows}
+                      for name, member in part]
+        table = table.replace_schema_metadata({CompactionConfig.METADATA_KEY: json.dumps(provenance)})
+
+        sink = pa.BufferOutputStream()
+        pq.write_table(table, sink, **resolve_parquet_write_options(self.write_options, table.schema))
+        return sink.getvalue(), table.num_rows
+
+    def compact_group(self, dataset: str, period: Tuple[int, ...],
+                      files: Dict[str, Tuple[str, int]]) -> Tuple[Dict, Dict[str, str]]:
+        """
+        Compacta um grupo (dataset, período) e troca as entradas pelo resultado.
+
+        Args:
+            dataset (str): Nome do dataset (ex.: ibov_consolidado)
+            period (Tuple[int, ...]): (ano, mês) ou (ano,)
+            files (Dict): {chave: (nível, tamanho)} do grupo
+
+        Returns:
+            Tuple[Dict, Dict[str, str]]: Relatório do grupo e {diário: compactado}
+                para o manifesto
+        """
+        members, fresh, leftovers = self._load_members(files)
+        report = {
+            'dataset': dataset,
+            'period': _format_period(period),
+            'inputs': len(files),
+            'outputs': [],
+            'rows': 0,
+            'bytes_before': sum(size for _, size in files.values()),
+            'bytes_after': 0,
+            'rewritten': False,
+            'deleted': 0
+        }
+        compacted_inputs = [key for key, (level, _) in files.items() if level != DAY]
+
+        if not fresh and all(files[key][0] == self.granularity for key in compacted_inputs):
+            # Nada novo: apenas remove diários que ficaram de uma troca interrompida
+            self.storage.delete(leftovers)
+            report['outputs'] = compacted_inputs
+            report['bytes_after'] = report['bytes_before'] - sum(files[k][1] for k in leftovers)
+            report['deleted'] = len(leftovers)
+            return report, {}
+
+        # 1. Gravar todos os arquivos compactados no staging (invisível aos leitores)
+        parts = self._split(members)
+        moved = {}
+        staged = []
+        try:
+            for index, part in enumerate(parts):
+                output_key = self._output_key(dataset, period, index, len(parts))
+                buffer, rows = self._build_output(part)
+                staged.append(CompactionConfig.STAGING_PREFIX + output_key)
+                self.storage.write(staged[-1], buffer)
+                report['outputs'].append(output_key)
+                report['rows'] += rows
+                report['bytes_after'] += buffer.size
+                for name, _ in part:
+                    moved[name] = output_key
+        except Exception:
+            self.storage.delete(staged)
+            raise
+
+        # 2. Promover para a partição final
+        for staged_key, output_key in zip(staged, report['outputs']):
+            self.storage.promote(staged_key, output_key)
+
+        # 3. Só então remover as entradas substituídas
+        obsolete = [key for key in files if key not in report['outputs']]
+        self.storage.delete(obsolete)
+        report['rewritten'] = True
+        report['deleted'] = len(obsolete)
+
+        logger.info(f"🗜️ {dataset} {report['period']}: {len(files)} → {len(parts)} arquivo(s), "
+                    f"{report['rows']} registros")
+        return report, moved
+
+    def run(self, until: Optional[date] = None, dry_run: bool = False) -> Dict:
+        """
+        Compacta todos os grupos com arquivos pendentes.
+
+        Args:
+            until (Optional[date]): Data de referência do período em aberto (padrão: hoje)
+            dry_run (bool): Apenas lista os grupos que seriam compactados
+
+        Returns:
+            Dict: Relatório da compactação
+        """
+        logger.info(f"🗜️ Compactação {self.granularity} em {self.storage}")
+        results = {
+            'storage': str(self.storage),
+            'granularity': self.granularity,
+            'dry_run': dry_run,
+            'groups': [],
+            'files_before': 0,
+            'files_after': 0,
+            'files_deleted': 0,
+            'manifest_entries_updated': 0,
+            'errors': []
+        }
+
+        pending = {
+            group: files for group, files in self.plan(until).items()
+            if any(level != self.granularity for level, _ in files.values())
+        }
+        if self.manifest and not dry_run:
+            self.manifest.load()
+
+        replacements = {}
+        for (dataset, period), files in pending.items():
+            results['files_before'] += len(files)
+            if dry_run:
+                results['groups'].append({'dataset': dataset, 'period': _format_period(period),
+                                          'inputs': sorted(files)})
+                continue
+            try:
+                report, moved = self.compact_group(dataset, period, files)
+            except Exception as e:
+                logger.error(f"❌ Erro ao compactar {dataset} {period}: {e}")
+                results['errors'].append({'dataset': dataset, 'period': _format_period(period),
+                                          'error': str(e)})
+                continue
+            results['groups'].append(report)
+            results['files_after'] += len(report['outputs'])
+            results['files_deleted'] += report['deleted']
+            for name, output_key in moved.items():
+                replacements[os.path.normpath(self.storage.locate(name))] = self.storage.locate(output_key)
+
+        if self.manifest and replacements:
+            results['manifest_entries_updated'] = self.manifest.mark_compacted(
+                replacements, field=self.storage.manifest_field
+            )
+            self.manifest.save()
+
+        logger.info(f"✅ Compactação concluída: {results['files_before']} → "
+                    f"{results['files_after']} arquivos ({len(results['errors'])} erros)")
+        return results
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    Executa a compactação do data lake local ou do bucket (BOVESPA_S3_BUCKET).
+    """
+    parser = argparse.ArgumentParser(description="Compacta os arquivos diários do data lake")
+    parser.add_argument('--path', default=str(DataLakeConfig.LOCAL_BASE_PATH),
+                        help="raiz do data lake local (e do manifesto)")
+    parser.add_argument('--s3', action='store_true',
+                        help="compacta o bucket BOVESPA_S3_BUCKET em vez do disco local")
+    parser.add_argument('--granularity', choices=[MONTH, YEAR], default=CompactionConfig.GRANULARITY)
+    parser.add_argument('--target-size-mb', type=float, default=CompactionConfig.TARGET_FILE_SIZE_MB)
+    parser.add_argument('--compression', default=None,
+                        help="codec Parquet dos compactados (padrão: DataLakeConfig.PARQUET_COMPRESSION)")
+    parser.add_argument('--compression-level', type=int, default=None)
+    parser.add_argument('--until', type=date.fromisoformat, default=None,
+                        help="data (AAAA-MM-DD) do período em aberto, que não é compactado")
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args(argv)
+
+    manifest_path = Path(args.path) / ProcessingConfig.MANIFEST_FILENAME
+    if args.s3:
+        bucket = os.getenv('BOVESPA_S3_BUCKET')
+        if not bucket:
+            raise ValueError("BOVESPA_S3_BUCKET não configurado no ambiente")
+        s3_client = boto3.client('s3')
+        storage = S3LakeStorage(s3_client, bucket)
+        manifest = ProcessingManifest(manifest_path, s3_client=s3_client, s3_bucket=bucket,
+                                      s3_key=ProcessingConfig.MANIFEST_S3_KEY)
+    else:
+        storage = LocalLakeStorage(args.path)
+        manifest = ProcessingManifest(manifest_path)
+
+    write_options = {key: value for key, value in (('compression', args.compression),
+                                                   ('compression_level', args.compression_level))
+                     if value is not None}
+    compactor = LakeCompactor(storage, args.granularity, args.target_size_mb, manifest, write_options)
+    results = compactor.run(until=args.until, dry_run=args.dry_run)
+
+    print(f"\n🗜️ Compactação ({results['granularity']}) em {results['storage']}")
+    for group in results['groups']:
+        if args.dry_run:
+            print(f"  📦 {group['dataset']} {group['period']}: {len(group['inputs'])} arquivos")
+        else:
+            print(f"  📦 {group['dataset']} {group['period']}: {group['inputs']} → "
+                  f"{len(group['outputs'])} arquivo(s), {group['bytes_before'] / 1024:.1f} KB → "
+                  f"{group['bytes_after'] / 1024:.1f} KB")
+    print(f"📁 Arquivos: {results['files_before']} → {results['files_after']}")
+    if results['manifest_entries_updated']:
+        print(f"📝 Entradas do manifesto atualizadas: {results['manifest_entries_updated']}")
+    for error in results['errors']:
+        print(f"❌ {error['dataset']} {error['period']}: {error['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,8 @@ Contém URLs, headers HTTP, configurações de logging e constantes.
 """
 
 import logging
-from typing import Dict
+from pathlib import Path
+from typing import Dict, Optional
 
 # =============================================================================
 # CONFIGURAÇÕES DE LOGGING
@@ -24,6 +25,12 @@ class B3Endpoints:
     Classe para organizar todos os endpoints da B3 com seus payloads.
     """
     
+    # Base da API de índices e métodos disponíveis
+    BASE_URL = "https://sistemaswebb3-listados.b3.com.br/indexProxy/indexCall"
+    METHOD_PORTFOLIO_DAY = "GetPortfolioDay"
+    METHOD_THEORICAL_PORTFOLIO = "GetTheoricalPortfolio"
+    METHOD_QUARTELY_PREVIEW = "GetQuartelyPreview"
+    
     # Carteira do dia (Daily Portfolio)
     # Segment 1 payload: {"language":"pt-br","pageNumber":1,"pageSize":120,"index":"IBOV","segment":"1"}
     CARTEIRA_DIA_SETOR = "https://sistemaswebb3-listados.b3.com.br/indexProxy/indexCall/GetPortfolioDay/eyJsYW5ndWFnZSI6InB0LWJyIiwicGFnZU51bWJlciI6MSwicGFnZVNpemUiOjEyMCwiaW5kZXgiOiJJQk9WIiwic2VnbWVudCI6IjEifQ=="
@@ -43,25 +50,69 @@ class B3Endpoints:
 # CONFIGURAÇÕES DE ENDPOINTS
 # =============================================================================
 
+# 'method' e 'payload' permitem reconstruir a URL de qualquer página
+# (ver utils.build_endpoint_url); 'url' corresponde sempre à página 1.
 ENDPOINTS_CONFIG = {
     'carteira_dia_setor': {
         'url': B3Endpoints.CARTEIRA_DIA_SETOR,
-        'description': 'Carteira do Dia - Segmento 1 (Setor)'
+        'description': 'Carteira do Dia - Segmento 1 (Setor)',
+        'method': B3Endpoints.METHOD_PORTFOLIO_DAY,
+        'payload': {"language": "pt-br", "pageNumber": 1, "pageSize": 120, "index": "IBOV", "segment": "1"}
     },
     'carteira_dia_codigo': {
         'url': B3Endpoints.CARTEIRA_DIA_CODIGO,
-        'description': 'Carteira do Dia - Segmento 2 (Código)'
+        'description': 'Carteira do Dia - Segmento 2 (Código)',
+        'method': B3Endpoints.METHOD_PORTFOLIO_DAY,
+        'payload': {"language": "pt-br", "pageNumber": 1, "pageSize": 120, "index": "IBOV", "segment": "2"}
     },
     'carteira_teorica': {
         'url': B3Endpoints.CARTEIRA_TEORICA,
-        'description': 'Carteira Teórica - Mai. a Ago. 2025'
+        'description': 'Carteira Teórica - Mai. a Ago. 2025',
+        'method': B3Endpoints.METHOD_THEORICAL_PORTFOLIO,
+        'payload': {"pageNumber": 1, "pageSize": 120, "language": "pt-br", "index": "IBOV"}
     },
     'previa_quadrimestral': {
         'url': B3Endpoints.PREVIA_QUADRIMESTRAL,
-        'description': 'Prévia Quadrimestral - Set. a Dez. 2025'
+        'description': 'Prévia Quadrimestral - Set. a Dez. 2025',
+        'method': B3Endpoints.METHOD_QUARTELY_PREVIEW,
+        'payload': {"pageNumber": 1, "pageSize": 120, "language": "pt-br", "index": "IBOV"}
     }
 }
 
+# =============================================================================
+# CONFIGURAÇÕES DE ÍNDICES
+# =============================================================================
+
+class IndexConfig:
+    """
+    Índices da B3 disponíveis para coleta (campo 'index' do payload).
+    """
+    
+    # Índice padrão (ENDPOINTS_CONFIG)
+    DEFAULT_INDEX = 'IBOV'
+    
+    # Índices coletados no modo multi-índice
+    DEFAULT_INDICES = [
+        'IBOV',  # Ibovespa
+        'IBXX',  # IBrX 100
+        'IBXL',  # IBrX 50
+        'IBRA',  # Índice Brasil Amplo
+        'SMLL',  # Small Cap
+        'MLCX',  # Mid-Large Cap
+        'IDIV',  # Dividendos
+        'ICON',  # Consumo
+        'IEEX',  # Energia Elétrica
+        'IFNC',  # Financeiro
+        'IMAT',  # Materiais Básicos
+        'INDX',  # Industrial
+        'IMOB',  # Imobiliário
+        'UTIL',  # Utilidade Pública
+        'IGCX',  # Governança Corporativa
+        'ITAG',  # Tag Along
+        'ISEE',  # Sustentabilidade Empresarial
+        'ICO2'   # Carbono Eficiente
+    ]
+
 # =============================================================================
 # HEADERS HTTP
 # =============================================================================
@@ -97,6 +148,115 @@ class FileConfig:
     
     # Nome do arquivo consolidado
     CONSOLIDATED_FILENAME = 'b3_dados_consolidados.json'
+    
+    # Padrão de nome para o modo multi-índice (um arquivo por índice/endpoint)
+    INDEX_FILENAME_PATTERN = 'b3_{index}_{endpoint}.json'
+    
+    # Formato da captura bruta: 'ndjson' (cabeçalho + um registro por linha,
+    # comprimido) ou 'json' (legado, indentado). Os nomes lógicos seguem '.json'.
+    RAW_FORMAT = 'ndjson'
+    
+    # Compressão do formato ndjson: 'gzip' ou 'zstd' (requer o pacote zstandard)
+    RAW_COMPRESSION = 'gzip'
+    RAW_SUFFIXES = {
+        'gzip': '.ndjson.gz',
+        'zstd': '.ndjson.zst'
+    }
+
+# =============================================================================
+# CONFIGURAÇÕES DE REQUISIÇÃO (RETRY E RATE LIMIT)
+# =============================================================================
+
+# Arquivo de configuração da aplicação (config/app_config.yml na raiz do projeto)
+APP_CONFIG_PATH = Path(__file__).resolve().parents[2] / 'config' / 'app_config.yml'
+
+
+def load_app_config(config_path: Optional[Path] = None) -> Dict:
+    """
+    Carrega o app_config.yml. PyYAML é opcional: sem ele (ou sem o arquivo),
+    retorna um dicionário vazio e os padrões de RequestConfig são usados.
+    
+    Args:
+        config_path (Optional[Path]): Caminho do YAML (padrão: APP_CONFIG_PATH)
+        
+    Returns:
+        Dict: Configurações carregadas
+    """
+    config_path = Path(config_path or APP_CONFIG_PATH)
+    try:
+        import yaml
+    except ImportError:
+        logging.getLogger(__name__).info("PyYAML não instalado, usando configurações padrão")
+        return {}
+    
+    if not config_path.exists():
+        return {}
+    
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f) or {}
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"Erro ao ler {config_path}: {e}")
+        return {}
+
+
+class RequestConfig:
+    """
+    Política de retry e rate limit das requisições à B3.
+    Os padrões espelham config/app_config.yml.
+    """
+    
+    # Total de tentativas por requisição e atraso base do backoff (segundos)
+    RETRY_ATTEMPTS = 3
+    RETRY_DELAY = 5
+    MAX_RETRY_DELAY = 60
+    
+    # Requisições por segundo (token bucket) e rajada máxima permitida
+    RATE_LIMIT = 1
+    RATE_LIMIT_BURST = 4
+    
+    @classmethod
+    def from_app_config(cls, config_path: Optional[Path] = None) -> Dict:
+        """
+        Retorna a política efetiva, combinando app_config.yml com os padrões.
+        
+        Args:
+            config_path (Optional[Path]): Caminho do YAML (padrão: APP_CONFIG_PATH)
+            
+        Returns:
+            Dict: timeout, retry_attempts, retry_delay, max_retry_delay,
+                rate_limit, rate_limit_burst
+        """
+        app_config = load_app_config(config_path)
+        scraping = app_config.get('scraping') or {}
+        endpoints = app_config.get('endpoints') or {}
+        
+        return {
+            'timeout': scraping.get('timeout', Constants.REQUEST_TIMEOUT),
+            'retry_attempts': scraping.get('retry_attempts', cls.RETRY_ATTEMPTS),
+            'retry_delay': scraping.get('retry_delay', cls.RETRY_DELAY),
+            'max_retry_delay': scraping.get('max_retry_delay', cls.MAX_RETRY_DELAY),
+            'rate_limit': endpoints.get('rate_limit', cls.RATE_LIMIT),
+            'rate_limit_burst': endpoints.get('rate_limit_burst', cls.RATE_LIMIT_BURST)
+        }
+
+# =============================================================================
+# CONFIGURAÇÕES DE CACHE HTTP
+# =============================================================================
+
+class CacheConfig:
+    """
+    Configurações do cache persistente de respostas HTTP.
+    """
+    
+    # Diretório das entradas do cache
+    CACHE_DIR = "data/cache/http"
+    
+    # Tempo (segundos) em que uma resposta é reutilizada sem revalidação
+    TTL_SECONDS = 6 * 60 * 60
+    
+    # Tamanho máximo do cache (MB) antes da evicção LRU
+    MAX_SIZE_MB = 50
 
 # =============================================================================
 # CONSTANTES GERAIS
@@ -111,6 +271,14 @@ class Constants:
     REQUEST_TIMEOUT = 30
     PAGE_SIZE = 120
     
+    # Configurações de concorrência (máximo de requisições simultâneas)
+    MAX_CONCURRENT_REQUESTS = 4
+    # Máximo de conexões abertas por host no pool HTTP compartilhado
+    MAX_CONNECTIONS_PER_HOST = 4
+    
+    # Tamanho dos blocos lidos no parsing em streaming (bytes)
+    STREAM_CHUNK_SIZE = 64 * 1024
+    
     # Configurações de dados
     DEFAULT_ENCODING = 'utf-8'
     JSON_INDENT = 2
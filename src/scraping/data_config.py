@@ -18,9 +18,43 @@ class DataLakeConfig:
     PARTITION_PATTERN = "ano={year}/mes={month:02d}/dia={day:02d}"
     
     # Configurações de arquivo
-    PARQUET_COMPRESSION = "snappy"  # Boa para S3
+    PARQUET_COMPRESSION = "snappy"  # Boa para S3 (ver benchmarks/bench_parquet_codecs.py)
+    PARQUET_COMPRESSION_LEVEL = None  # Ex.: zstd 1-22 (None = padrão do codec)
     PARQUET_ENGINE = "pyarrow"
     
+    # Layout do arquivo (None = padrão do pyarrow)
+    PARQUET_ROW_GROUP_SIZE = None  # Linhas por row group
+    PARQUET_DATA_PAGE_SIZE = None  # Bytes por página de dados (padrão: 1 MB)
+    
+    # Codificação por coluna
+    PARQUET_DICTIONARY_COLUMNS = None  # None = todas; lista = apenas essas colunas
+    PARQUET_BYTE_STREAM_SPLIT_COLUMNS = []  # Lista de colunas ou True (todas as float)
+    
+    @classmethod
+    def parquet_write_options(cls, **overrides) -> dict:
+        """
+        Monta os argumentos de pq.write_table a partir da configuração.
+        
+        Args:
+            **overrides: Opções que substituem as configuradas (mesmos nomes
+                de pq.write_table, ex.: compression='zstd', compression_level=9)
+            
+        Returns:
+            dict: Argumentos para pq.write_table
+        """
+        options = {
+            'compression': cls.PARQUET_COMPRESSION,
+            'compression_level': cls.PARQUET_COMPRESSION_LEVEL,
+            'row_group_size': cls.PARQUET_ROW_GROUP_SIZE,
+            'data_page_size': cls.PARQUET_DATA_PAGE_SIZE,
+            'use_dictionary': (True if cls.PARQUET_DICTIONARY_COLUMNS is None
+                               else list(cls.PARQUET_DICTIONARY_COLUMNS)),
+            'use_byte_stream_split': cls.PARQUET_BYTE_STREAM_SPLIT_COLUMNS or False,
+            'write_statistics': True
+        }
+        options.update(overrides)
+        return options
+    
     @classmethod
     def get_partition_path(cls, target_date: date, base_path: Path = None) -> Path:
         """
@@ -136,6 +170,57 @@ class FileNamingConfig:
         return f"{base_name}_{date_str}.parquet"
 
 
+class UploadConfig:
+    """Configurações do upload concorrente para o S3."""
+    
+    # Objetos enviados simultaneamente
+    MAX_WORKERS = 8
+    
+    # Multipart (por objeto): partes de 16 MB enviadas por até 8 threads
+    MULTIPART_THRESHOLD_MB = 16
+    MULTIPART_CHUNKSIZE_MB = 16
+    MAX_CONCURRENCY = 8
+    
+    # Menor parte aceita pelo S3 (exceto a última) no multipart em streaming
+    MIN_MULTIPART_CHUNKSIZE_MB = 5
+    
+    # Retry com backoff exponencial (full jitter)
+    RETRY_ATTEMPTS = 3
+    RETRY_DELAY = 1  # segundos
+    MAX_RETRY_DELAY = 20  # segundos
+    
+    # Códigos de erro do S3 repetidos (throttling e falhas temporárias), além
+    # de respostas 5xx e falhas de conexão. Os demais (AccessDenied,
+    # NoSuchBucket, validação de parâmetros) falham na primeira tentativa
+    RETRYABLE_ERROR_CODES = {
+        'SlowDown', 'Throttling', 'ThrottlingException', 'RequestLimitExceeded',
+        'TooManyRequestsException', 'RequestTimeout', 'InternalError', 'ServiceUnavailable'
+    }
+    
+    EXTRA_ARGS = {
+        'ServerSideEncryption': 'AES256',
+        'StorageClass': 'STANDARD'
+    }
+    
+    @classmethod
+    def build_transfer_config(cls):
+        """
+        Cria o TransferConfig do boto3 com os parâmetros acima.
+        
+        Returns:
+            TransferConfig: Configuração de transferência multipart
+        """
+        from boto3.s3.transfer import TransferConfig
+        
+        mb = 1024 * 1024
+        return TransferConfig(
+            multipart_threshold=cls.MULTIPART_THRESHOLD_MB * mb,
+            multipart_chunksize=cls.MULTIPART_CHUNKSIZE_MB * mb,
+            max_concurrency=cls.MAX_CONCURRENCY,
+            use_threads=True
+        )
+
+
 class ProcessingConfig:
     """Configurações gerais de processamento."""
     
@@ -144,8 +229,20 @@ class ProcessingConfig:
     LOG_LEVEL = "INFO"
     
     # Performance
-    CHUNK_SIZE = 10000  # Para processamento em lotes grandes
-    MAX_MEMORY_USAGE_MB = 512  # Limite de memória por arquivo
+    CHUNK_SIZE = 10000  # Registros por lote (arquivos maiores são processados em streaming)
+    MIN_CHUNK_SIZE = 1000  # Menor lote ao reduzir o tamanho por falta de memória
+    MAX_MEMORY_USAGE_MB = 512  # Limite de memória (RSS) do processo, ex.: Lambda de 512 MB
+    
+    # Paralelismo do processamento de vários arquivos (backfills)
+    MAX_WORKERS = 1  # Processos para limpeza/escrita (1 = sequencial, ex.: Lambda)
+    
+    # Cópia local do Parquet no data lake (False = escrita direto no S3, da memória)
+    KEEP_LOCAL_COPY = True
+    
+    # Manifesto de processamento incremental (prefixo "_" é ignorado por Glue/Athena)
+    MANIFEST_FILENAME = "_processing_manifest.json"
+    MANIFEST_S3_KEY = "data_lake/_processing_manifest.json"
+    MANIFEST_SYNC_TO_S3 = True  # Cópia no bucket (o /tmp do Lambda é efêmero)
     
     # Metadados
     METADATA_FIELDS = [
@@ -160,6 +257,26 @@ class ProcessingConfig:
     MAX_NULL_PERCENTAGE = 0.5  # Máximo 50% de valores nulos
 
 
+class CompactionConfig:
+    """Configurações da compactação de arquivos pequenos do data lake."""
+    
+    # Período de agrupamento dos arquivos diários: "month" ou "year"
+    GRANULARITY = "month"
+    
+    # Tamanho alvo de cada arquivo compactado (estimado pelos arquivos de entrada)
+    TARGET_FILE_SIZE_MB = 128
+    
+    # Chave dos metadados Parquet com a origem de cada faixa de linhas
+    METADATA_KEY = b"b3:compaction"
+    
+    # Lote máximo de chaves por chamada DeleteObjects
+    S3_DELETE_BATCH = 1000
+    
+    # Prefixo oculto (ignorado por Glue/Athena e pelo ETL) onde os arquivos
+    # compactados são gravados antes de irem para a partição final
+    STAGING_PREFIX = "_staging/"
+
+
 # Exemplo de uso das configurações
 if __name__ == "__main__":
     from datetime import date
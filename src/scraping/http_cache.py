@@ -0,0 +1,267 @@
+"""
+Cache persistente de respostas HTTP para o scraping da B3.
+
+Armazena o corpo e os validadores (ETag/Last-Modified) de cada URL em disco,
+permitindo reutilizar respostas dentro do TTL e revalidar com GET condicional
+(If-None-Match/If-Modified-Since) depois dele. O tamanho total é limitado
+por evicção LRU.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+try:
+    from .config import CacheConfig, Constants, setup_logger
+except ImportError:
+    # Fallback para execução direta
+    from config import CacheConfig, Constants, setup_logger
+
+# Configurar logger
+logger = setup_logger(__name__)
+
+
+class ResponseCache:
+    """
+    Cache em disco de respostas HTTP, indexado pela URL.
+
+    Cada entrada ocupa dois arquivos: `<hash>.body` (conteúdo bruto) e
+    `<hash>.json` (URL, validadores, horário de armazenamento e último acesso).
+    """
+
+    def __init__(self, cache_dir: str = CacheConfig.CACHE_DIR,
+                 ttl_seconds: int = CacheConfig.TTL_SECONDS,
+                 max_size_mb: float = CacheConfig.MAX_SIZE_MB):
+        """
+        Inicializa o cache.
+
+        Args:
+            cache_dir (str): Diretório onde as entradas são gravadas
+            ttl_seconds (int): Tempo em que uma entrada é usada sem revalidação
+            max_size_mb (float): Tamanho máximo dos corpos armazenados (LRU)
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+
+        logger.info(f"ResponseCache inicializado em {self.cache_dir} (TTL: {ttl_seconds}s)")
+
+    def _entry_paths(self, url: str):
+        key = hashlib.sha256(url.encode(Constants.DEFAULT_ENCODING)).hexdigest()
+        return self.cache_dir / f"{key}.json", self.cache_dir / f"{key}.body"
+
+    def _read_meta(self, meta_path: Path) -> Optional[Dict]:
+        try:
+            with open(meta_path, 'r', encoding=Constants.DEFAULT_ENCODING) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, meta_path: Path, meta: Dict) -> None:
+        # Escrita atômica para não deixar metadados corrompidos
+        tmp_path = meta_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding=Constants.DEFAULT_ENCODING) as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def get(self, url: str) -> Optional[Dict]:
+        """
+        Retorna a entrada armazenada para a URL, atualizando o último acesso.
+
+        Args:
+            url (str): URL da requisição
+
+        Returns:
+            Optional[Dict]: Metadados da entrada com o corpo em 'content', ou None
+        """
+        meta_path, body_path = self._entry_paths(url)
+        with self._lock:
+            meta = self._read_meta(meta_path)
+            if not meta or meta.get('url') != url or not body_path.exists():
+                return None
+
+            meta['last_access'] = time.time()
+            self._write_meta(meta_path, meta)
+
+            entry = dict(meta)
+            entry['content'] = body_path.read_bytes()
+            return entry
+
+    def is_fresh(self, entry: Dict) -> bool:
+        """
+        Indica se a entrada ainda está dentro do TTL.
+
+        Args:
+            entry (Dict): Entrada retornada por get()
+
+        Returns:
+            bool: True se pode ser usada sem revalidar
+        """
+        return (time.time() - entry.get('stored_at', 0)) < self.ttl_seconds
+
+    def conditional_headers(self, entry: Optional[Dict]) -> Dict[str, str]:
+        """
+        Monta os headers de GET condicional a partir dos validadores da entrada.
+
+        Args:
+            entry (Optional[Dict]): Entrada retornada por get()
+
+        Returns:
+            Dict[str, str]: Headers If-None-Match/If-Modified-Since (pode ser vazio)
+        """
+        headers = {}
+        if not entry:
+            return headers
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url: str, response: requests.Response) -> None:
+        """
+        Armazena uma resposta 200 e aplica a evicção LRU se necessário.
+
+        Respostas abertas com stream=True não são lidas aqui: o corpo é gravado
+        à medida que o consumidor percorre iter_content (ver _tee_stream), e a
+        entrada só é registrada quando o stream é consumido por completo.
+
+        Args:
+            url (str): URL da requisição
+            response (requests.Response): Resposta recebida
+        """
+        if response._content_consumed is False:
+            self._tee_stream(url, response)
+            return
+
+        content = response.content
+        with self._lock:
+            self._entry_paths(url)[1].write_bytes(content)
+            self._commit(url, response, len(content))
+
+    def _tee_stream(self, url: str, response: requests.Response) -> None:
+        """
+        Substitui response.iter_content por um gerador que copia cada bloco
+        para um arquivo temporário, promovido a `.body` ao final do stream.
+
+        Se o stream for interrompido (erro de parsing, fechamento antecipado),
+        o arquivo temporário é descartado e nada é armazenado.
+
+        Args:
+            url (str): URL da requisição
+            response (requests.Response): Resposta aberta com stream=True
+        """
+        iter_content = response.iter_content
+        _, body_path = self._entry_paths(url)
+        part_path = body_path.with_suffix(f'.{threading.get_ident()}.part')
+
+        def tee(chunk_size: int = 1, decode_unicode: bool = False):
+            if decode_unicode:
+                # Blocos decodificados não correspondem aos bytes originais
+                yield from iter_content(chunk_size, decode_unicode)
+                return
+
+            size = 0
+            completed = False
+            try:
+                with open(part_path, 'wb') as f:
+                    for chunk in iter_content(chunk_size):
+                        f.write(chunk)
+                        size += len(chunk)
+                        yield chunk
+                completed = True
+            finally:
+                if completed:
+                    with self._lock:
+                        os.replace(part_path, body_path)
+                        self._commit(url, response, size)
+                else:
+                    part_path.unlink(missing_ok=True)
+
+        response.iter_content = tee
+
+    def _commit(self, url: str, response: requests.Response, size: int) -> None:
+        """Grava os metadados de um corpo já salvo e aplica a evicção (com o lock adquirido)."""
+        meta_path, _ = self._entry_paths(url)
+        now = time.time()
+        meta = {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'content_type': response.headers.get('Content-Type'),
+            'encoding': response.encoding,
+            'stored_at': now,
+            'last_access': now,
+            'size': size
+        }
+        self._write_meta(meta_path, meta)
+        self._evict()
+
+    def refresh(self, url: str) -> None:
+        """
+        Renova o TTL de uma entrada após uma resposta 304 (Not Modified).
+
+        Args:
+            url (str): URL da requisição
+        """
+        meta_path, _ = self._entry_paths(url)
+        with self._lock:
+            meta = self._read_meta(meta_path)
+            if meta:
+                meta['stored_at'] = meta['last_access'] = time.time()
+                self._write_meta(meta_path, meta)
+
+    def _evict(self) -> None:
+        """Remove as entradas menos usadas até caber em max_size_bytes."""
+        entries = []
+        for meta_path in self.cache_dir.glob('*.json'):
+            meta = self._read_meta(meta_path)
+            if meta:
+                entries.append((meta.get('last_access', 0), meta.get('size', 0), meta_path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, meta_path in sorted(entries):
+            if total_size <= self.max_size_bytes:
+                break
+            meta_path.with_suffix('.body').unlink(missing_ok=True)
+            meta_path.unlink(missing_ok=True)
+            total_size -= size
+            logger.info(f"Cache: entrada removida por LRU ({meta_path.stem[:12]})")
+
+    def build_response(self, entry: Dict) -> requests.Response:
+        """
+        Reconstrói um requests.Response a partir de uma entrada do cache.
+
+        O atributo `from_cache` é True, sinalizando que o conteúdo não mudou
+        desde o último download.
+
+        Args:
+            entry (Dict): Entrada retornada por get()
+
+        Returns:
+            requests.Response: Resposta equivalente à original
+        """
+        response = requests.Response()
+        response.status_code = 200
+        response.url = entry['url']
+        response._content = entry['content']
+        response._content_consumed = True
+        response.encoding = entry.get('encoding')
+        response.headers = CaseInsensitiveDict({
+            key: value for key, value in (
+                ('ETag', entry.get('etag')),
+                ('Last-Modified', entry.get('last_modified')),
+                ('Content-Type', entry.get('content_type'))
+            ) if value
+        })
+        response.from_cache = True
+        return response
@@ -6,30 +6,721 @@ Converte dados brutos JSON para formato Parquet otimizado
 seguindo estrutura: data_lake/ano=YYYY/mes=MM/dia=DD/arquivo.parquet
 """
 
-import json
+import numpy as np
 import pandas as pd
 import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
 from datetime import datetime, date
-from typing import Dict, Optional, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from pathlib import Path
+import argparse
 import boto3
+import gc
+import io
 import os
+import random
+import sys
+import time
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dotenv import load_dotenv
-from botocore.exceptions import ClientError
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, HTTPClientError
 
 # Carregar variáveis de ambiente do .env
 load_dotenv()
 
 try:
-    from .config import setup_logger
+    from .config import FileConfig, setup_logger
+    from .data_config import DataLakeConfig, DataValidationConfig, ProcessingConfig, UploadConfig
+    from .processing_manifest import ProcessingManifest, compute_file_hash
+    from .utils import (
+        read_raw_file, get_logical_filename, is_raw_capture, read_raw_capture_header,
+        iter_raw_capture_records
+    )
 except ImportError:
     # Fallback para execução direta
-    from config import setup_logger
+    from config import FileConfig, setup_logger
+    from data_config import DataLakeConfig, DataValidationConfig, ProcessingConfig, UploadConfig
+    from processing_manifest import ProcessingManifest, compute_file_hash
+    from utils import (
+        read_raw_file, get_logical_filename, is_raw_capture, read_raw_capture_header,
+        iter_raw_capture_records
+    )
 
 # Configurar logger
 logger = setup_logger(__name__)
 
+# Versão da lógica de limpeza/escrita: alterá-la invalida o manifesto e
+# força o reprocessamento de todos os arquivos
+PROCESSOR_VERSION = "2.1.0"
+
+# Tipos das colunas de metadados (ProcessingConfig.METADATA_FIELDS)
+_METADATA_TYPES = {
+    'processed_at': pa.timestamp('us'),
+    'partition_date': pa.date32(),
+    'source_file': pa.string(),
+    'record_hash': pa.uint64()
+}
+
+
+def build_stock_schema() -> pa.Schema:
+    """
+    Monta o schema Arrow canônico da tabela de ações a partir de
+    DataValidationConfig: campos obrigatórios e categóricos como texto,
+    opcionais com o tipo do valor padrão e, por fim, os metadados.
+    
+    Returns:
+        pa.Schema: Schema usado em todas as escritas Parquet
+    """
+    default_types = {str: pa.string(), float: pa.float64(), int: pa.int64()}
+    fields = {name: pa.string() for name in DataValidationConfig.REQUIRED_FIELDS}
+    for name, default in DataValidationConfig.OPTIONAL_FIELDS.items():
+        fields[name] = default_types[type(default)]
+    for name in DataValidationConfig.CATEGORICAL_FIELDS:
+        fields.setdefault(name, pa.string())
+    for name in ProcessingConfig.METADATA_FIELDS:
+        fields.setdefault(name, _METADATA_TYPES[name])
+    
+    required = set(DataValidationConfig.REQUIRED_FIELDS)
+    return pa.schema([pa.field(name, type_, nullable=name not in required)
+                      for name, type_ in fields.items()])
+
+
+# Schema canônico (montado uma única vez por processo)
+STOCK_SCHEMA = build_stock_schema()
+
+
+def _normalize_extra_type(type_: pa.DataType) -> pa.DataType:
+    """Tipo estável para colunas fora do schema (sem dicionário/large_string)."""
+    if pa.types.is_dictionary(type_):
+        type_ = type_.value_type
+    if pa.types.is_null(type_):
+        # Coluna só com nulos no lote: texto, para aceitar os lotes seguintes
+        return pa.string()
+    if pa.types.is_large_string(type_):
+        return pa.string()
+    return type_
+
+
+def conform_to_stock_schema(table: pa.Table) -> pa.Table:
+    """
+    Converte uma tabela Arrow para o schema canônico (STOCK_SCHEMA).
+    
+    As colunas do schema vêm primeiro, na ordem e nos tipos definidos (as
+    ausentes recebem o padrão de DataValidationConfig ou nulo); colunas
+    extras são mantidas ao final. Metadados do schema são descartados.
+    
+    Args:
+        table (pa.Table): Tabela de origem
+        
+    Returns:
+        pa.Table: Tabela no schema canônico
+    """
+    columns, fields = [], []
+    for field in STOCK_SCHEMA:
+        if field.name in table.column_names:
+            values = table.column(field.name).cast(field.type)
+        else:
+            default = DataValidationConfig.OPTIONAL_FIELDS.get(field.name)
+            if default is None:
+                values = pa.nulls(table.num_rows, field.type)
+            else:
+                values = pa.array([default] * table.num_rows, field.type)
+        columns.append(values)
+        fields.append(field)
+    
+    for name in table.column_names:
+        if name in STOCK_SCHEMA.names:
+            continue
+        column = table.column(name)
+        type_ = _normalize_extra_type(column.type)
+        columns.append(column.cast(type_))
+        fields.append(pa.field(name, type_))
+    
+    return pa.Table.from_arrays(columns, schema=pa.schema(fields))
+
+
+def align_to_schema(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """
+    Ajusta um lote ao schema do arquivo em escrita (ParquetWriter).
+    
+    Colunas ausentes viram nulos; colunas que não existiam no primeiro lote
+    são descartadas, pois o schema do arquivo já foi definido.
+    
+    Args:
+        table (pa.Table): Lote no schema canônico
+        schema (pa.Schema): Schema do arquivo
+        
+    Returns:
+        pa.Table: Lote no schema do arquivo
+    """
+    if table.schema.equals(schema):
+        return table
+    dropped = [name for name in table.column_names if name not in schema.names]
+    if dropped:
+        logger.warning(f"⚠️ Colunas ausentes do primeiro lote descartadas: {dropped}")
+    columns = [
+        table.column(field.name).cast(field.type) if field.name in table.column_names
+        else pa.nulls(table.num_rows, field.type)
+        for field in schema
+    ]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def current_rss_mb() -> float:
+    """
+    Memória residente (RSS) atual do processo em MB.
+    
+    Usa /proc no Linux (Lambda); nos demais sistemas, o pico via resource.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é KB no Linux e bytes no macOS
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+# Campos que identificam um registro no record_hash
+RECORD_HASH_FIELDS = ['codigo', 'acao', 'part_percent']
+
+# Linhas por fatia no cálculo do record_hash
+_HASH_SLICE_ROWS = 262_144
+
+
+def hash_records(df: pd.DataFrame, columns: List[str] = RECORD_HASH_FIELDS,
+                 slice_rows: int = _HASH_SLICE_ROWS) -> np.ndarray:
+    """
+    Calcula o record_hash (pd.util.hash_pandas_object sem índice) em fatias.
+    
+    O hash de cada linha só depende dos seus valores, então o resultado é
+    idêntico ao cálculo de uma vez; as fatias limitam as cópias temporárias
+    que o pandas faz ao converter colunas de texto para object.
+    
+    Args:
+        df (pd.DataFrame): DataFrame com as colunas do hash
+        columns (List[str]): Colunas que compõem o hash
+        slice_rows (int): Linhas por fatia
+        
+    Returns:
+        np.ndarray: Hashes uint64, um por linha
+    """
+    hashes = np.empty(len(df), dtype=np.uint64)
+    for start in range(0, len(df), slice_rows):
+        piece = df.iloc[start:start + slice_rows][columns]
+        hashes[start:start + len(piece)] = pd.util.hash_pandas_object(piece, index=False).to_numpy()
+    return hashes
+
+
+class MemoryBudget:
+    """
+    Acompanha o RSS do processo em relação ao limite configurado
+    (ProcessingConfig.MAX_MEMORY_USAGE_MB).
+    """
+    
+    def __init__(self, limit_mb: float = ProcessingConfig.MAX_MEMORY_USAGE_MB,
+                 rss_reader: Optional[Callable[[], float]] = None):
+        """
+        Args:
+            limit_mb (float): Limite de memória em MB
+            rss_reader (Optional[Callable]): Leitura do RSS atual (padrão: current_rss_mb)
+        """
+        self.limit_mb = limit_mb
+        self._rss_reader = rss_reader or current_rss_mb
+        self.peak_mb = 0.0
+    
+    def check(self) -> bool:
+        """
+        Mede o RSS atual e atualiza o pico.
+        
+        Returns:
+            bool: True se está dentro do limite
+        """
+        rss = self._rss_reader()
+        self.peak_mb = max(self.peak_mb, rss)
+        return rss <= self.limit_mb
+
+
+def resolve_parquet_write_options(options: Dict, schema: pa.Schema) -> Dict:
+    """
+    Ajusta as opções de escrita às colunas da tabela.
+    
+    Byte-stream-split só vale para colunas sem dicionário: as colunas com
+    BSS (True = todas as float) saem da lista de dicionário. Opções None
+    ficam com o padrão do pyarrow.
+    
+    Args:
+        options (Dict): Opções de DataLakeConfig.parquet_write_options()
+        schema (pa.Schema): Schema da tabela a ser gravada
+        
+    Returns:
+        Dict: Argumentos para pq.write_table
+    """
+    options = {key: value for key, value in options.items() if value is not None}
+    split = options.get('use_byte_stream_split')
+    if split is True:
+        split = [f.name for f in schema if pa.types.is_floating(f.type)]
+    if not split:
+        options.pop('use_byte_stream_split', None)
+        return options
+    
+    split = [name for name in split if name in schema.names]
+    dictionary = options.get('use_dictionary', True)
+    if dictionary is True:
+        dictionary = schema.names
+    options['use_dictionary'] = [name for name in (dictionary or []) if name not in split]
+    options['use_byte_stream_split'] = split
+    return options
+
+def is_retryable_s3_error(error: BaseException) -> bool:
+    """
+    Indica se uma falha do S3 é temporária (mesma regra do RequestExecutor:
+    repete throttling, 5xx e falhas de conexão; o resto falha na hora).
+    
+    O upload_file do boto3 troca o ClientError por S3UploadFailedError, então
+    a cadeia de exceções (__cause__/__context__) também é verificada.
+    
+    Args:
+        error (BaseException): Exceção levantada pelo upload
+        
+    Returns:
+        bool: True se vale uma nova tentativa
+    """
+    while error is not None:
+        if isinstance(error, ClientError):
+            code = error.response.get('Error', {}).get('Code')
+            status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode') or 0
+            return code in UploadConfig.RETRYABLE_ERROR_CODES or status == 429 or status >= 500
+        if isinstance(error, (BotoConnectionError, HTTPClientError, ConnectionError, TimeoutError)):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class S3Uploader:
+    """
+    Serviço de upload para o S3: multipart com TransferConfig ajustado,
+    vários objetos em paralelo e retry com backoff exponencial (full jitter)
+    apenas para falhas temporárias (ver is_retryable_s3_error).
+    
+    Cada upload gera um registro com tempo, tamanho, vazão e tentativas.
+    """
+    
+    def __init__(self, s3_client, bucket: str,
+                 transfer_config: Optional[TransferConfig] = None,
+                 max_workers: int = UploadConfig.MAX_WORKERS,
+                 retry_attempts: int = UploadConfig.RETRY_ATTEMPTS,
+                 retry_delay: float = UploadConfig.RETRY_DELAY,
+                 max_retry_delay: float = UploadConfig.MAX_RETRY_DELAY,
+                 extra_args: Optional[Dict] = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            s3_client: Cliente boto3 S3
+            bucket (str): Bucket de destino
+            transfer_config (Optional[TransferConfig]): Configuração multipart
+                (padrão: UploadConfig.build_transfer_config())
+            max_workers (int): Objetos enviados simultaneamente
+            retry_attempts (int): Total de tentativas por objeto
+            retry_delay (float): Atraso base do backoff (segundos)
+            max_retry_delay (float): Teto do atraso entre tentativas (segundos)
+            extra_args (Optional[Dict]): ExtraArgs do upload (padrão: UploadConfig.EXTRA_ARGS)
+            sleep (Callable): Função de espera (injetável para testes)
+        """
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.transfer_config = transfer_config or UploadConfig.build_transfer_config()
+        self.max_workers = max(1, max_workers)
+        self.retry_attempts = max(1, retry_attempts)
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.extra_args = dict(UploadConfig.EXTRA_ARGS if extra_args is None else extra_args)
+        self._sleep = sleep
+    
+    def backoff_delay(self, attempt: int) -> float:
+        """Atraso antes da próxima tentativa (backoff exponencial, full jitter)."""
+        ceiling = min(self.max_retry_delay, self.retry_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+    
+    def _new_record(self, s3_key: str, local_path: Optional[str] = None) -> Dict:
+        return {
+            'local_path': local_path,
+            's3_key': s3_key,
+            'success': False,
+            'size_bytes': 0,
+            'attempts': 0,
+            'seconds': 0.0,
+            'throughput_mb_s': 0.0,
+            'error': None
+        }
+    
+    def _upload_with_retry(self, record: Dict, send: Callable[[], None]) -> Dict:
+        """Executa `send` com retry/backoff, preenchendo tempo e vazão no registro."""
+        s3_key = record['s3_key']
+        started = time.perf_counter()
+        
+        for attempt in range(1, self.retry_attempts + 1):
+            record['attempts'] = attempt
+            try:
+                send()
+                record['success'] = True
+                record['error'] = None
+                break
+            except Exception as e:
+                record['error'] = str(e)
+                if not is_retryable_s3_error(e):
+                    logger.error(f"❌ Upload falhou ({s3_key}), erro não recuperável: {e}")
+                    break
+                if attempt == self.retry_attempts:
+                    logger.error(f"❌ Upload falhou após {attempt} tentativas ({s3_key}): {e}")
+                    break
+                logger.warning(f"⚠️ Falha no upload ({attempt}/{self.retry_attempts}) de {s3_key}: {e}")
+                self._sleep(self.backoff_delay(attempt))
+        
+        record['seconds'] = time.perf_counter() - started
+        if record['success'] and record['seconds'] > 0:
+            record['throughput_mb_s'] = record['size_bytes'] / 1024 / 1024 / record['seconds']
+            logger.info(f"✅ Upload concluído: s3://{self.bucket}/{s3_key} "
+                        f"({record['size_bytes'] / 1024 / 1024:.2f} MB, {record['seconds']:.2f}s)")
+        return record
+    
+    def upload_file(self, local_path: Path, s3_key: str) -> Dict:
+        """
+        Envia um arquivo com retry.
+        
+        Args:
+            local_path (Path): Arquivo local
+            s3_key (str): Chave de destino
+            
+        Returns:
+            Dict: 'local_path', 's3_key', 'success', 'size_bytes', 'attempts',
+                'seconds', 'throughput_mb_s' e 'error'
+        """
+        local_path = Path(local_path)
+        record = self._new_record(s3_key, str(local_path))
+        
+        if not local_path.exists():
+            record['error'] = 'arquivo não encontrado'
+            logger.error(f"❌ Arquivo não encontrado: {local_path}")
+            return record
+        
+        record['size_bytes'] = local_path.stat().st_size
+        return self._upload_with_retry(record, lambda: self.s3_client.upload_file(
+            str(local_path), self.bucket, s3_key,
+            ExtraArgs=self.extra_args, Config=self.transfer_config
+        ))
+    
+    def upload_bytes(self, data: pa.Buffer, s3_key: str) -> Dict:
+        """
+        Envia um buffer em memória com retry, sem arquivo local.
+        
+        Acima de multipart_threshold o boto3 envia o buffer em partes
+        (multipart em streaming), conforme o TransferConfig.
+        
+        Args:
+            data (pa.Buffer): Conteúdo do objeto (ou bytes)
+            s3_key (str): Chave de destino
+            
+        Returns:
+            Dict: Registro no mesmo formato de upload_file ('local_path' = None)
+        """
+        record = self._new_record(s3_key)
+        record['size_bytes'] = len(data)
+        
+        def send():
+            # Leitor novo a cada tentativa (posição do buffer volta ao início)
+            self.s3_client.upload_fileobj(
+                pa.BufferReader(data), self.bucket, s3_key,
+                ExtraArgs=self.extra_args, Config=self.transfer_config
+            )
+        
+        return self._upload_with_retry(record, send)
+    
+    def upload_many(self, items: List[Tuple[Path, str]]) -> Dict:
+        """
+        Envia vários arquivos em paralelo.
+        
+        Args:
+            items (List[Tuple[Path, str]]): Pares (arquivo local, chave S3)
+            
+        Returns:
+            Dict: 'objects' (registros na ordem de items), 'successful', 'failed',
+                'total_bytes', 'elapsed_seconds' e 'throughput_mb_s'
+        """
+        started = time.perf_counter()
+        if len(items) > 1 and self.max_workers > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as pool:
+                objects = list(pool.map(lambda item: self.upload_file(*item), items))
+        else:
+            objects = [self.upload_file(*item) for item in items]
+        elapsed = time.perf_counter() - started
+        
+        uploaded_bytes = sum(o['size_bytes'] for o in objects if o['success'])
+        report = {
+            'objects': objects,
+            'successful': sum(1 for o in objects if o['success']),
+            'failed': sum(1 for o in objects if not o['success']),
+            'total_bytes': uploaded_bytes,
+            'elapsed_seconds': elapsed,
+            'throughput_mb_s': uploaded_bytes / 1024 / 1024 / elapsed if elapsed > 0 else 0.0
+        }
+        if objects:
+            logger.info(f"📤 Uploads: {report['successful']}/{len(objects)} objetos, "
+                        f"{uploaded_bytes / 1024 / 1024:.2f} MB em {elapsed:.2f}s "
+                        f"({report['throughput_mb_s']:.2f} MB/s)")
+        return report
+
+
+class S3MultipartStream(io.RawIOBase):
+    """
+    Stream de escrita enviado ao S3 enquanto é gravado (ex.: pelo
+    ParquetWriter), sem arquivo local.
+    
+    O conteúdo acumula em memória até part_size bytes e segue como uma parte
+    do multipart upload; só a parte em formação fica em memória. Objetos
+    menores que uma parte são enviados com um PUT único em complete().
+    Cada parte tem o mesmo retry do S3Uploader.
+    """
+    
+    def __init__(self, uploader: S3Uploader, s3_key: str,
+                 part_size: int = UploadConfig.MULTIPART_CHUNKSIZE_MB * 1024 * 1024):
+        """
+        Args:
+            uploader (S3Uploader): Cliente, bucket, ExtraArgs e política de retry
+            s3_key (str): Chave de destino
+            part_size (int): Bytes por parte (mínimo UploadConfig.MIN_MULTIPART_CHUNKSIZE_MB)
+        """
+        super().__init__()
+        self.uploader = uploader
+        self.s3_key = s3_key
+        self.part_size = max(part_size, UploadConfig.MIN_MULTIPART_CHUNKSIZE_MB * 1024 * 1024)
+        self.upload_id = None
+        self.parts: List[Dict] = []
+        self._buffer = bytearray()
+        self._position = 0
+        self._attempts = 0
+        self._started = time.perf_counter()
+    
+    def writable(self) -> bool:
+        return True
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def write(self, data) -> int:
+        """Acrescenta bytes ao stream, enviando cada parte completa."""
+        size = len(memoryview(data).cast('B'))
+        self._buffer += data
+        self._position += size
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+        return size
+    
+    def _upload_part(self, body: bytes) -> None:
+        """Envia uma parte (iniciando o multipart na primeira), com retry."""
+        client = self.uploader.s3_client
+        if self.upload_id is None:
+            self.upload_id = client.create_multipart_upload(
+                Bucket=self.uploader.bucket, Key=self.s3_key, **self.uploader.extra_args
+            )['UploadId']
+        
+        number = len(self.parts) + 1
+        response = {}
+        
+        def send():
+            response.update(client.upload_part(
+                Bucket=self.uploader.bucket, Key=self.s3_key, UploadId=self.upload_id,
+                PartNumber=number, Body=body
+            ))
+        
+        record = self.uploader._new_record(f"{self.s3_key} (parte {number})")
+        record['size_bytes'] = len(body)
+        record = self.uploader._upload_with_retry(record, send)
+        self._attempts += record['attempts']
+        if not record['success']:
+            raise IOError(f"Falha no envio da parte {number} de {self.s3_key}: {record['error']}")
+        self.parts.append({'PartNumber': number, 'ETag': response['ETag']})
+    
+    def complete(self) -> Dict:
+        """
+        Envia o restante e conclui o upload.
+        
+        Returns:
+            Dict: Registro no mesmo formato de S3Uploader.upload_file
+                ('local_path' = None)
+        """
+        if self.upload_id is None:
+            # Menor que uma parte: PUT único
+            record = self.uploader.upload_bytes(bytes(self._buffer), self.s3_key)
+            self._buffer.clear()
+            return record
+        
+        if self._buffer:
+            self._upload_part(bytes(self._buffer))
+            self._buffer.clear()
+        self.uploader.s3_client.complete_multipart_upload(
+            Bucket=self.uploader.bucket, Key=self.s3_key, UploadId=self.upload_id,
+            MultipartUpload={'Parts': self.parts}
+        )
+        
+        record = self.uploader._new_record(self.s3_key)
+        record.update(success=True, size_bytes=self._position, attempts=self._attempts,
+                      seconds=time.perf_counter() - self._started)
+        if record['seconds'] > 0:
+            record['throughput_mb_s'] = record['size_bytes'] / 1024 / 1024 / record['seconds']
+        logger.info(f"✅ Upload concluído: s3://{self.uploader.bucket}/{self.s3_key} "
+                    f"({len(self.parts)} partes, {record['size_bytes'] / 1024 / 1024:.2f} MB, "
+                    f"{record['seconds']:.2f}s)")
+        return record
+    
+    def abort(self) -> None:
+        """Cancela o multipart (as partes enviadas são descartadas pelo S3)."""
+        self._buffer.clear()
+        if self.upload_id is None:
+            return
+        try:
+            self.uploader.s3_client.abort_multipart_upload(
+                Bucket=self.uploader.bucket, Key=self.s3_key, UploadId=self.upload_id
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Não foi possível cancelar o multipart de {self.s3_key}: {e}")
+        self.upload_id = None
+
+
+class LocalParquetSink:
+    """
+    Destino padrão: grava o Parquet na estrutura particionada local
+    (data_lake/ano=.../mes=.../dia=...). O upload, se habilitado, é feito
+    depois em lote a partir desses arquivos.
+    """
+    
+    uploads_directly = False
+    
+    def __init__(self, processor: 'B3ParquetProcessor'):
+        self.processor = processor
+    
+    def write(self, df: pd.DataFrame, target_date: date, filename: str) -> Optional[Dict]:
+        """
+        Grava o DataFrame como Parquet.
+        
+        Returns:
+            Optional[Dict]: 'output_file', 'size_bytes', 's3_uploaded' e 's3_key', ou None se erro
+        """
+        parquet_path = self.processor.create_partition_path(target_date, filename)
+        if not self.processor.save_to_parquet(df, parquet_path):
+            return None
+        return {
+            'output_file': str(parquet_path),
+            'size_bytes': parquet_path.stat().st_size,
+            's3_uploaded': False,
+            's3_key': None
+        }
+    
+    def write_chunks(self, tables: Iterable[pa.Table], target_date: date,
+                     filename: str) -> Optional[Dict]:
+        """
+        Grava lotes sucessivos em um único Parquet; o arquivo só aparece no
+        data lake (os.replace) depois do último lote.
+        
+        Returns:
+            Optional[Dict]: Mesmo formato de write(), ou None se erro
+        """
+        parquet_path = self.processor.create_partition_path(target_date, filename)
+        tmp_path = parquet_path.with_name(f".{parquet_path.name}.tmp")
+        try:
+            self.processor.write_parquet_chunks(tables, tmp_path)
+            os.replace(tmp_path, parquet_path)
+        except Exception as e:
+            logger.error(f"❌ Erro ao salvar Parquet {parquet_path}: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return None
+        logger.info(f"💾 Parquet salvo: {parquet_path}")
+        return {
+            'output_file': str(parquet_path),
+            'size_bytes': parquet_path.stat().st_size,
+            's3_uploaded': False,
+            's3_key': None
+        }
+
+
+class S3ParquetSink:
+    """
+    Destino sem cópia local: serializa o Parquet em memória e envia direto
+    para a chave final no S3 (arquivos em lotes seguem em multipart upload
+    à medida que são gravados, ver S3MultipartStream). Evita a escrita dupla
+    e o limite de /tmp no Lambda.
+    """
+    
+    uploads_directly = True
+    
+    def __init__(self, processor: 'B3ParquetProcessor'):
+        self.processor = processor
+    
+    def write(self, df: pd.DataFrame, target_date: date, filename: str) -> Optional[Dict]:
+        """
+        Serializa e envia o DataFrame como Parquet.
+        
+        Returns:
+            Optional[Dict]: 'output_file' (URI s3://), 'size_bytes', 's3_uploaded',
+                's3_key' e 'upload_seconds', ou None se erro
+        """
+        s3_key = self.processor.get_s3_key(target_date, filename)
+        try:
+            buffer = self.processor.serialize_parquet(df)
+        except Exception as e:
+            logger.error(f"❌ Erro ao serializar Parquet {filename}: {e}")
+            return None
+        
+        upload = self.processor.uploader.upload_bytes(buffer, s3_key)
+        if not upload['success']:
+            return None
+        return {
+            'output_file': f"s3://{self.processor.s3_bucket}/{s3_key}",
+            'size_bytes': upload['size_bytes'],
+            's3_uploaded': True,
+            's3_key': s3_key,
+            'upload_seconds': upload['seconds']
+        }
+    
+    def write_chunks(self, tables: Iterable[pa.Table], target_date: date,
+                     filename: str) -> Optional[Dict]:
+        """
+        Grava lotes sucessivos direto no S3: o ParquetWriter escreve em um
+        S3MultipartStream, que envia cada parte assim que completa. Só o lote
+        atual e a parte em formação ficam em memória; nada passa por /tmp.
+        
+        Returns:
+            Optional[Dict]: Mesmo formato de write(), ou None se erro
+        """
+        s3_key = self.processor.get_s3_key(target_date, filename)
+        stream = S3MultipartStream(self.processor.uploader, s3_key)
+        try:
+            self.processor.write_parquet_chunks(tables, stream)
+            upload = stream.complete()
+        except Exception as e:
+            logger.error(f"❌ Erro ao gravar Parquet {filename}: {e}")
+            stream.abort()
+            return None
+        
+        if not upload['success']:
+            return None
+        return {
+            'output_file': f"s3://{self.processor.s3_bucket}/{s3_key}",
+            'size_bytes': upload['size_bytes'],
+            's3_uploaded': True,
+            's3_key': s3_key,
+            'upload_seconds': upload['seconds']
+        }
+
 
 class B3ParquetProcessor:
     """
@@ -37,7 +728,9 @@ class B3ParquetProcessor:
     com estrutura de particionamento compatível com S3.
     """
     
-    def __init__(self, input_path: str = "data/raw", output_path: str = "data_lake", upload_to_s3: bool = True):
+    def __init__(self, input_path: str = "data/raw", output_path: str = "data_lake", upload_to_s3: bool = True,
+                 use_manifest: bool = True, keep_local_copy: bool = ProcessingConfig.KEEP_LOCAL_COPY,
+                 write_options: Optional[Dict] = None):
         """
         Inicializa o processador de Parquet.
         
@@ -45,11 +738,22 @@ class B3ParquetProcessor:
             input_path (str): Diretório com arquivos JSON de entrada
             output_path (str): Diretório base para estrutura particionada
             upload_to_s3 (bool): Se deve fazer upload automático para S3
+            use_manifest (bool): Se deve ignorar arquivos já processados
+                (ver ProcessingManifest)
+            keep_local_copy (bool): Se grava o Parquet no data lake local; False
+                envia direto da memória para o S3 (requer upload_to_s3)
+            write_options (Optional[Dict]): Opções de escrita Parquet que substituem
+                as de DataLakeConfig (codec, nível, row group, codificação)
         """
         self.input_path = Path(input_path)
         self.output_path = Path(output_path)
         self.processed_files = []
         self.upload_to_s3 = upload_to_s3
+        self.write_options = DataLakeConfig.parquet_write_options(**(write_options or {}))
+        
+        # Arquivos acima de chunk_size registros são processados em lotes
+        self.chunk_size = ProcessingConfig.CHUNK_SIZE
+        self.memory_limit_mb = ProcessingConfig.MAX_MEMORY_USAGE_MB
         
         # Configurar S3 se habilitado
         if self.upload_to_s3:
@@ -58,18 +762,41 @@ class B3ParquetProcessor:
                 raise ValueError("BOVESPA_S3_BUCKET não configurado no ambiente")
             try:
                 self.s3_client = boto3.client('s3')
+                self.uploader = S3Uploader(self.s3_client, self.s3_bucket)
                 logger.info(f"✅ Upload S3 habilitado para bucket: {self.s3_bucket}")
             except Exception as e:
                 logger.warning(f"⚠️ Erro ao configurar S3: {e}. Upload desabilitado.")
                 self.upload_to_s3 = False
         
+        # Destino do Parquet: data lake local (padrão) ou direto no S3
+        if keep_local_copy:
+            self.sink = LocalParquetSink(self)
+        elif self.upload_to_s3:
+            self.sink = S3ParquetSink(self)
+        elif upload_to_s3:
+            logger.warning("⚠️ S3 indisponível, gravando Parquet no data lake local")
+            self.sink = LocalParquetSink(self)
+        else:
+            raise ValueError("keep_local_copy=False requer upload_to_s3=True")
+        
+        # Manifesto local no data lake, com cópia no bucket quando há upload
+        self.manifest = None
+        if use_manifest:
+            sync_to_s3 = self.upload_to_s3 and ProcessingConfig.MANIFEST_SYNC_TO_S3
+            self.manifest = ProcessingManifest(
+                self.output_path / ProcessingConfig.MANIFEST_FILENAME,
+                s3_client=self.s3_client if sync_to_s3 else None,
+                s3_bucket=self.s3_bucket if sync_to_s3 else None,
+                s3_key=ProcessingConfig.MANIFEST_S3_KEY if sync_to_s3 else None
+            )
+        
         logger.info("B3ParquetProcessor inicializado")
         logger.info(f"Input: {self.input_path}")
         logger.info(f"Output: {self.output_path}")
     
     def upload_file_to_s3(self, local_file_path: Path, s3_key: str) -> bool:
         """
-        Faz upload de arquivo para S3.
+        Faz upload de arquivo para S3 (multipart com retry, via S3Uploader).
         
         Args:
             local_file_path (Path): Caminho local do arquivo
@@ -81,40 +808,75 @@ class B3ParquetProcessor:
         if not self.upload_to_s3:
             logger.info("🔄 Upload S3 desabilitado, pulando...")
             return False
+        
+        logger.info(f"🎯 Destino S3: s3://{self.s3_bucket}/{s3_key}")
+        return self.uploader.upload_file(local_file_path, s3_key)['success']
+    
+    def upload_results_to_s3(self, file_results: List[Optional[Dict]], target_date: date) -> Dict:
+        """
+        Envia em lote, de forma concorrente, os Parquet gerados em uma execução.
+        
+        Atualiza 's3_uploaded', 's3_key' e 'upload_seconds' de cada resultado
+        (e de processed_files).
+        
+        Args:
+            file_results (List[Optional[Dict]]): Resultados de process_dataframe (None = falha)
+            target_date (date): Data de particionamento
             
-        try:
-            # Verificar se arquivo existe
-            if not local_file_path.exists():
-                logger.error(f"❌ Arquivo não encontrado: {local_file_path}")
-                return False
-            
-            # Obter tamanho do arquivo para log
-            file_size = local_file_path.stat().st_size / (1024 * 1024)  # MB
-            
-            logger.info(f"📤 Fazendo upload: {local_file_path.name} ({file_size:.2f} MB)")
-            logger.info(f"🎯 Destino S3: s3://{self.s3_bucket}/{s3_key}")
-            
-            # Upload para S3
-            self.s3_client.upload_file(
-                str(local_file_path),
-                self.s3_bucket,
-                s3_key,
-                ExtraArgs={
-                    'ServerSideEncryption': 'AES256',
-                    'StorageClass': 'STANDARD'
-                }
-            )
-            
-            logger.info(f"✅ Upload concluído: s3://{self.s3_bucket}/{s3_key}")
-            return True
+        Returns:
+            Dict: Relatório do S3Uploader.upload_many
+        """
+        results = [result for result in file_results if result]
+        items = [
+            (Path(result['output_file']), self.get_s3_key(target_date, Path(result['output_file']).name))
+            for result in results
+        ]
+        report = self.uploader.upload_many(items)
+        
+        uploads = {obj['local_path']: obj for obj in report['objects']}
+        for result in results:
+            upload = uploads[str(Path(result['output_file']))]
+            result['s3_uploaded'] = upload['success']
+            result['s3_key'] = upload['s3_key']
+            result['upload_seconds'] = upload['seconds']
+        for entry in self.processed_files:
+            upload = uploads.get(entry['output'])
+            if upload:
+                entry['s3_uploaded'] = upload['success']
+                entry['s3_key'] = upload['s3_key']
+        
+        return report
+    
+    def get_s3_etag(self, s3_key: str) -> Optional[str]:
+        """
+        Consulta o ETag de um objeto enviado ao S3.
+        
+        Args:
+            s3_key (str): Chave do objeto
             
-        except ClientError as e:
-            error_code = e.response['Error']['Code']
-            logger.error(f"❌ Erro AWS S3 ({error_code}): {e}")
-            return False
+        Returns:
+            Optional[str]: ETag sem aspas, ou None se indisponível
+        """
+        try:
+            etag = self.s3_client.head_object(Bucket=self.s3_bucket, Key=s3_key).get('ETag')
         except Exception as e:
-            logger.error(f"❌ Erro inesperado no upload: {e}")
-            return False
+            logger.warning(f"⚠️ Não foi possível obter o ETag de {s3_key}: {e}")
+            return None
+        return etag.strip('"') if isinstance(etag, str) else None
+    
+    def _update_manifest(self, json_files: List[Path], file_results: List[Optional[Dict]],
+                         hashes: Dict[str, str], target_date: date) -> None:
+        """Registra no manifesto os arquivos processados com sucesso e o salva."""
+        for json_file, result in zip(json_files, file_results):
+            if not result:
+                continue
+            etag = self.get_s3_etag(result['s3_key']) if result.get('s3_uploaded') else None
+            self.manifest.record(
+                str(json_file), hashes[str(json_file)], PROCESSOR_VERSION,
+                result['output_file'], s3_key=result.get('s3_key'), etag=etag,
+                records=result['records_processed'], partition=self.get_partition_key(target_date)
+            )
+        self.manifest.save()
     
     def validate_stock_data(self, data: Dict) -> bool:
         """
@@ -163,34 +925,38 @@ class B3ParquetProcessor:
             'null_values_fixed': 0,
             'invalid_records_removed': 0,
             'data_type_corrections': 0,
+            'conversion_errors': 0,
             'final_records': 0
         }
         
         logger.info(f"Iniciando validação de {len(df)} registros...")
         
-        # 1. Remover registros completamente vazios
-        df = df.dropna(how='all')
+        # 1. Máscara única: registros não vazios, com campos obrigatórios e sem
+        #    código repetido (o DataFrame é filtrado uma única vez no final)
+        keep = df.notna().any(axis=1).to_numpy(copy=True)
         
-        # 2. Validar campos obrigatórios
-        required_fields = ['codigo', 'acao']
-        for field in required_fields:
+        for field in DataValidationConfig.REQUIRED_FIELDS:
             if field in df.columns:
-                before_count = len(df)
-                df = df.dropna(subset=[field])
-                removed = before_count - len(df)
+                missing = keep & df[field].isna().to_numpy()
+                removed = int(missing.sum())
                 if removed > 0:
+                    keep &= ~missing
                     validation_report['invalid_records_removed'] += removed
                     logger.warning(f"Removidos {removed} registros sem {field}")
         
-        # 3. Limpar e converter tipos de dados
-        df = self._clean_data_types(df, validation_report)
+        if 'codigo' in df.columns:
+            duplicated = keep & df['codigo'].where(keep).duplicated(keep='first').to_numpy()
+            removed_dup = int(duplicated.sum())
+            if removed_dup > 0:
+                keep &= ~duplicated
+                logger.info(f"Removidas {removed_dup} duplicatas")
+        
+        # 2. Filtrar (cópia única) ou, sem remoções, apenas uma cópia rasa para
+        #    não alterar o DataFrame do chamador
+        df = df.copy(deep=False) if keep.all() else df[keep]
         
-        # 4. Remover duplicatas
-        before_dup = len(df)
-        df = df.drop_duplicates(subset=['codigo'], keep='first')
-        removed_dup = before_dup - len(df)
-        if removed_dup > 0:
-            logger.info(f"Removidas {removed_dup} duplicatas")
+        # 3. Limpar e converter tipos de dados (colunas substituídas no lugar)
+        df = self._clean_data_types(df, validation_report)
         
         validation_report['final_records'] = len(df)
         
@@ -201,133 +967,199 @@ class B3ParquetProcessor:
         """
         Limpa e converte tipos de dados para otimização Parquet.
         
+        As colunas são substituídas no próprio DataFrame recebido (sem cópia
+        do DataFrame inteiro); clean_and_validate_dataframe já entrega um
+        DataFrame próprio.
+        
         Args:
-            df (pd.DataFrame): DataFrame original
+            df (pd.DataFrame): DataFrame filtrado
             report (Dict): Relatório de validação para atualizar
             
         Returns:
-            pd.DataFrame: DataFrame com tipos otimizados
+            pd.DataFrame: O mesmo DataFrame, com as colunas convertidas
         """
-        df = df.copy()
-        
         # Converter campos percentuais (formato brasileiro "0,503" -> 0.503)
         percentage_fields = ['part_percent', 'part_accumulated']
         for field in percentage_fields:
             if field in df.columns:
-                df[field] = self._convert_brazilian_decimal(df[field])
+                df[field] = self._convert_brazilian_decimal(df[field], report)
                 report['data_type_corrections'] += 1
         
         # Converter campos de quantidade
         quantity_fields = ['theoretical_qty']
         for field in quantity_fields:
             if field in df.columns:
-                df[field] = self._convert_brazilian_number(df[field])
+                df[field] = self._convert_brazilian_number(df[field], report)
                 report['data_type_corrections'] += 1
         
-        # Preencher valores nulos com padrões apropriados ANTES de converter para category
-        if 'setor' in df.columns:
-            df['setor'] = df['setor'].fillna('N/A')
-        if 'subsetor' in df.columns:
-            df['subsetor'] = df['subsetor'].fillna('N/A')
-        if 'segmento' in df.columns:
-            df['segmento'] = df['segmento'].fillna('N/A')
-        
-        # Otimizar strings para category (economia de espaço) APÓS preencher nulos
-        categorical_fields = ['codigo', 'acao', 'setor', 'subsetor', 'segmento', 
-                            'endpoint_name', 'endpoint_description']
-        for field in categorical_fields:
-            if field in df.columns:
-                df[field] = df[field].astype('category')
-        
-        report['null_values_fixed'] += df.isnull().sum().sum()
+        # Preencher valores nulos com padrões apropriados (só recria a coluna se houver nulos).
+        # Textos ficam como string: o schema canônico grava string e o Parquet já usa
+        # dicionário, então converter para category só duplicaria as colunas em memória.
+        for field in ['setor', 'subsetor', 'segmento']:
+            if field in df.columns and df[field].hasnans:
+                df[field] = df[field].fillna('N/A')
+
+        report['null_values_fixed'] += int(sum(df[column].isna().sum() for column in df.columns))
         
         return df
     
-    def _convert_brazilian_decimal(self, series: pd.Series) -> pd.Series:
+    # Textos aceitos pelo cast string -> float64 do Arrow (fallback com máscara de erros)
+    _NUMERIC_TEXT_PATTERN = r'^[+-]?(([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)?|(?i:nan|inf|infinity))$'
+    
+    def _cast_text_to_float(self, text: pa.Array) -> pa.Array:
         """
-        Converte números decimais do formato brasileiro (vírgula) para formato padrão.
+        Converte textos numéricos para float64; valores inválidos viram nulos.
         
         Args:
-            series (pd.Series): Série com números no formato brasileiro
+            text (pa.Array): Textos já normalizados
             
         Returns:
-            pd.Series: Série com números convertidos para float
+            pa.Array: Valores float64 (nulos para entradas nulas ou inválidas)
         """
-        def convert_value(value):
-            if pd.isna(value):
-                return 0.0
-            if isinstance(value, (int, float)):
-                return float(value)
-            
-            # Converter string brasileira para float
-            try:
-                # Remover espaços e converter vírgula para ponto
-                clean_value = str(value).strip().replace(',', '.')
-                # Remover pontos que não sejam o decimal (milhares)
-                parts = clean_value.split('.')
-                if len(parts) > 2:
-                    # Múltiplos pontos: último é decimal, anteriores são milhares
-                    clean_value = ''.join(parts[:-1]) + '.' + parts[-1]
-                return float(clean_value)
-            except (ValueError, AttributeError):
-                logger.warning(f"Não foi possível converter '{value}' para float")
-                return 0.0
-        
-        return series.apply(convert_value)
-    
-    def _convert_brazilian_number(self, series: pd.Series) -> pd.Series:
+        try:
+            return pc.cast(text, pa.float64())
+        except pa.ArrowInvalid:
+            valid = pc.match_substring_regex(text, self._NUMERIC_TEXT_PATTERN)
+            return pc.cast(pc.if_else(valid, text, pa.scalar(None, pa.string())), pa.float64())
+    
+    def _parse_brazilian_values(self, series: pd.Series, normalize) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Converte números inteiros do formato brasileiro.
+        Converte uma série para float64 de forma vetorizada.
+        
+        Valores já numéricos são mantidos; textos passam por `normalize`
+        (pyarrow.compute) e pelo cast para float64 do Arrow.
         
         Args:
-            series (pd.Series): Série com números no formato brasileiro
+            series (pd.Series): Série original
+            normalize (Callable): Recebe os textos (pa.Array) e retorna os textos normalizados
             
         Returns:
-            pd.Series: Série com números convertidos para int
+            Tuple[np.ndarray, np.ndarray]: Valores (NaN para nulos/falhas) e máscara de falhas
         """
-        def convert_value(value):
-            if pd.isna(value):
-                return 0
-            if isinstance(value, (int, float)):
-                return int(value)
-            
-            try:
-                # Remover pontos e espaços (separadores de milhares)
-                clean_value = str(value).replace('.', '').replace(' ', '')
-                return int(float(clean_value))
-            except (ValueError, AttributeError):
-                logger.warning(f"Não foi possível converter '{value}' para int")
-                return 0
+        if pd.api.types.is_numeric_dtype(series):
+            values = series.to_numpy(dtype='float64', na_value=np.nan, copy=True)
+            return values, np.zeros(len(series), dtype=bool)
         
-        return series.apply(convert_value)
-    
-    def add_processing_metadata(self, df: pd.DataFrame, source_file: str) -> pd.DataFrame:
+        present = series.notna().to_numpy()
+        kind = pd.api.types.infer_dtype(series, skipna=True)
+        if kind == 'string':
+            is_text = present
+        elif kind in ('integer', 'floating', 'mixed-integer-float', 'decimal', 'boolean', 'empty'):
+            is_text = np.zeros(len(series), dtype=bool)
+        else:
+            # Tipos misturados: único caminho elemento a elemento
+            is_text = series.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+        
+        values = np.full(len(series), np.nan)
+        if is_text.all():
+            text = pa.array(series, type=pa.string(), from_pandas=True)
+            values = self._cast_text_to_float(normalize(text)).to_numpy(zero_copy_only=False)
+            values = np.array(values, dtype='float64')
+        elif is_text.any():
+            text = pa.array(series[is_text], type=pa.string(), from_pandas=True)
+            values[is_text] = self._cast_text_to_float(normalize(text)).to_numpy(zero_copy_only=False)
+        
+        others = present & ~is_text
+        if others.any():
+            parsed = pd.to_numeric(series[others], errors='coerce')
+            values[others] = parsed.to_numpy(dtype='float64', na_value=np.nan)
+        
+        return values, present & np.isnan(values)
+    
+    def _report_conversion_failures(self, series: pd.Series, failed: np.ndarray,
+                                    target_type: str, report: Optional[Dict]) -> None:
+        """Registra as falhas de conversão em bloco (um aviso por coluna)."""
+        failures = int(failed.sum())
+        if not failures:
+            return
+        if report is not None:
+            report['conversion_errors'] = report.get('conversion_errors', 0) + failures
+        samples = series[failed].head(3).tolist()
+        logger.warning(f"Não foi possível converter {failures} valores de '{series.name}' "
+                       f"para {target_type} (ex.: {samples})")
+    
+    def _convert_brazilian_decimal(self, series: pd.Series, report: Optional[Dict] = None) -> pd.Series:
+        """
+        Converte números decimais do formato brasileiro (vírgula) para formato padrão.
+        
+        O último separador ('.' ou ',') é o decimal; os anteriores são de
+        milhares ("1.234,56" -> 1234.56). Nulos e falhas viram 0.0.
+        
+        Args:
+            series (pd.Series): Série com números no formato brasileiro
+            report (Optional[Dict]): Relatório de validação ('conversion_errors')
+            
+        Returns:
+            pd.Series: Série com números convertidos para float
+        """
+        def normalize(text: pa.Array) -> pa.Array:
+            text = pc.replace_substring(pc.utf8_trim_whitespace(text), ',', '.')
+            # Regex apenas nas linhas com separador de milhares
+            multiple = pc.fill_null(pc.greater(pc.count_substring(text, '.'), 1), False)
+            if pc.any(multiple).as_py():
+                subset = pc.replace_substring_regex(text.filter(multiple), r'\.([^.]*)$', r'|\1')
+                subset = pc.replace_substring(pc.replace_substring(subset, '.', ''), '|', '.')
+                text = pc.replace_with_mask(text, multiple, subset)
+            return text
+        
+        values, failed = self._parse_brazilian_values(series, normalize)
+        self._report_conversion_failures(series, failed, 'float', report)
+        
+        values[np.isnan(values)] = 0.0
+        return pd.Series(values, index=series.index, name=series.name)
+    
+    def _convert_brazilian_number(self, series: pd.Series, report: Optional[Dict] = None) -> pd.Series:
+        """
+        Converte números inteiros do formato brasileiro.
+        
+        Args:
+            series (pd.Series): Série com números no formato brasileiro
+            report (Optional[Dict]): Relatório de validação ('conversion_errors')
+            
+        Returns:
+            pd.Series: Série com números convertidos para int
+        """
+        def normalize(text: pa.Array) -> pa.Array:
+            # Remover pontos e espaços (separadores de milhares)
+            return pc.replace_substring(pc.replace_substring(text, '.', ''), ' ', '')
+        
+        values, failed = self._parse_brazilian_values(series, normalize)
+        self._report_conversion_failures(series, failed, 'int', report)
+        
+        values[np.isnan(values)] = 0
+        return pd.Series(np.trunc(values).astype('int64'), index=series.index, name=series.name)
+    
+    def add_processing_metadata(self, df: pd.DataFrame, source_file: str,
+                                processed_at: Optional[datetime] = None,
+                                target_date: Optional[date] = None) -> pd.DataFrame:
         """
         Adiciona metadados de processamento ao DataFrame.
         
         Args:
             df (pd.DataFrame): DataFrame original
             source_file (str): Nome do arquivo fonte
+            processed_at (Optional[datetime]): Horário do processamento (padrão: agora;
+                o processamento em lotes usa o mesmo valor para todos os lotes)
+            target_date (Optional[date]): Data da partição ano=/mes=/dia= do arquivo
+                (padrão: hoje); mantém o dia de referência depois da compactação
             
         Returns:
             pd.DataFrame: DataFrame com metadados adicionados
         """
-        df = df.copy()
+        # Cópia rasa: as novas colunas não alteram o DataFrame recebido
+        df = df.copy(deep=False)
         
         # Timestamp de processamento
-        df['processed_at'] = datetime.now()
+        df['processed_at'] = processed_at or datetime.now()
         
-        # Data de referência para particionamento
-        df['partition_date'] = date.today()
+        # Data de referência (a mesma do caminho ano=/mes=/dia=)
+        df['partition_date'] = target_date or date.today()
         
         # Arquivo fonte
         df['source_file'] = source_file
         
         # Hash para detecção de duplicatas futuras
-        df['record_hash'] = pd.util.hash_pandas_object(
-            df[['codigo', 'acao', 'part_percent']], 
-            index=False
-        )
+        df['record_hash'] = hash_records(df)
         
         return df
     
@@ -342,18 +1174,38 @@ class B3ParquetProcessor:
         Returns:
             Path: Caminho completo do arquivo
         """
-        partition_dir = (
-            self.output_path / 
-            f"ano={target_date.year}" / 
-            f"mes={target_date.month:02d}" / 
-            f"dia={target_date.day:02d}"
-        )
+        partition_dir = self.output_path / self.get_partition_key(target_date)
         
         # Criar diretório se não existir
         partition_dir.mkdir(parents=True, exist_ok=True)
         
         return partition_dir / filename
     
+    def get_partition_key(self, target_date: date) -> str:
+        """
+        Gera o caminho relativo da partição diária (local e no S3).
+        
+        Args:
+            target_date (date): Data para particionamento
+            
+        Returns:
+            str: Partição no formato ano=YYYY/mes=MM/dia=DD
+        """
+        return f"ano={target_date.year}/mes={target_date.month:02d}/dia={target_date.day:02d}"
+    
+    def get_s3_key(self, target_date: date, filename: str) -> str:
+        """
+        Gera a chave S3 mantendo a estrutura particionada.
+        
+        Args:
+            target_date (date): Data para particionamento
+            filename (str): Nome do arquivo Parquet
+            
+        Returns:
+            str: Chave S3 completa
+        """
+        return f"data_lake/{self.get_partition_key(target_date)}/{filename}"
+    
     def save_to_parquet(self, df: pd.DataFrame, filepath: Path) -> bool:
         """
         Salva DataFrame em formato Parquet otimizado.
@@ -366,19 +1218,7 @@ class B3ParquetProcessor:
             bool: True se salvou com sucesso
         """
         try:
-            # Configurações de otimização para Parquet
-            table = pa.Table.from_pandas(df)
-            
-            pq.write_table(
-                table, 
-                filepath,
-                # Compressão SNAPPY é boa para AWS S3
-                compression='snappy',
-                # Usar engine pyarrow para melhor performance
-                use_dictionary=True,
-                # Metadados para compatibilidade
-                write_statistics=True
-            )
+            self.write_parquet(df, filepath)
             
             file_size = filepath.stat().st_size / 1024 / 1024  # MB
             logger.info(f"✅ Arquivo Parquet salvo: {filepath} ({file_size:.2f} MB)")
@@ -388,13 +1228,267 @@ class B3ParquetProcessor:
             logger.error(f"❌ Erro ao salvar Parquet {filepath}: {e}")
             return False
     
-    def process_json_file(self, json_file: Path, target_date: Optional[date] = None) -> Optional[Dict]:
+    def to_arrow_table(self, df: pd.DataFrame) -> pa.Table:
         """
-        Processa um arquivo JSON específico e converte para Parquet.
+        Converte o DataFrame para uma tabela Arrow no schema canônico.
+        
+        O índice e os metadados do pandas não são gravados.
         
         Args:
-            json_file (Path): Caminho do arquivo JSON
+            df (pd.DataFrame): DataFrame processado
+            
+        Returns:
+            pa.Table: Tabela pronta para escrita
+        """
+        return conform_to_stock_schema(pa.Table.from_pandas(df, preserve_index=False))
+    
+    def parquet_write_options(self, schema: pa.Schema = STOCK_SCHEMA) -> Dict:
+        """
+        Opções de escrita Parquet compartilhadas por todos os destinos.
+        
+        Args:
+            schema (pa.Schema): Schema da tabela a ser gravada
+            
+        Returns:
+            Dict: Argumentos para pq.write_table
+        """
+        return resolve_parquet_write_options(self.write_options, schema)
+    
+    def write_parquet(self, df: pd.DataFrame, where) -> None:
+        """
+        Grava o DataFrame no schema canônico com as opções configuradas.
+        
+        Args:
+            df (pd.DataFrame): DataFrame processado
+            where: Caminho ou stream de destino (pq.write_table)
+        """
+        table = self.to_arrow_table(df)
+        pq.write_table(table, where, **self.parquet_write_options(table.schema))
+    
+    def write_parquet_chunks(self, tables: Iterable[pa.Table], where) -> int:
+        """
+        Grava lotes sucessivos em um único Parquet com ParquetWriter.
+        
+        O schema do arquivo é o do primeiro lote; cada lote vira um ou mais
+        row groups.
+        
+        Args:
+            tables (Iterable[pa.Table]): Lotes no schema canônico
+            where: Caminho ou stream de destino
+            
+        Returns:
+            int: Total de registros gravados
+        """
+        writer, rows = None, 0
+        try:
+            for table in tables:
+                if writer is None:
+                    schema = table.schema
+                    options = self.parquet_write_options(schema)
+                    row_group_size = options.pop('row_group_size', None)
+                    writer = pq.ParquetWriter(where, schema, **options)
+                writer.write_table(align_to_schema(table, schema), row_group_size=row_group_size)
+                rows += table.num_rows
+        finally:
+            if writer is not None:
+                writer.close()
+        
+        if writer is None:
+            pq.write_table(STOCK_SCHEMA.empty_table(), where, **self.parquet_write_options())
+        return rows
+    
+    def serialize_parquet(self, df: pd.DataFrame) -> pa.Buffer:
+        """
+        Serializa o DataFrame como Parquet em um buffer em memória.
+        
+        Args:
+            df (pd.DataFrame): DataFrame para serializar
+            
+        Returns:
+            pa.Buffer: Conteúdo do arquivo Parquet
+        """
+        sink = pa.BufferOutputStream()
+        self.write_parquet(df, sink)
+        return sink.getvalue()
+    
+    def get_parquet_filename(self, source_name: str, index: Optional[str], target_date: date) -> str:
+        """
+        Define o nome do arquivo Parquet a partir do arquivo de origem.
+        
+        O prefixo do índice evita colisões entre arquivos do modo multi-índice.
+        
+        Args:
+            source_name (str): Nome do arquivo bruto (físico ou lógico)
+            index (Optional[str]): Código do índice (padrão: IBOV)
+            target_date (date): Data de particionamento
+            
+        Returns:
+            str: Nome do arquivo Parquet
+        """
+        index_prefix = str(index or 'IBOV').lower()
+        date_suffix = target_date.strftime('%Y%m%d')
+        source_name = get_logical_filename(source_name).lower()
+        if 'consolidados' in source_name:
+            return f"{index_prefix}_consolidado_{date_suffix}.parquet"
+        if 'carteira_dia_codigo' in source_name:
+            return f"{index_prefix}_carteira_codigo_{date_suffix}.parquet"
+        if 'carteira_dia_setor' in source_name:
+            return f"{index_prefix}_carteira_setor_{date_suffix}.parquet"
+        if 'carteira_teorica' in source_name:
+            return f"{index_prefix}_carteira_teorica_{date_suffix}.parquet"
+        if 'previa_quadrimestral' in source_name:
+            return f"{index_prefix}_previa_quadrimestral_{date_suffix}.parquet"
+        # Fallback para nomes genéricos
+        base_name = Path(source_name).stem.replace('b3_', '').replace('_', '-')
+        return f"{index_prefix}_{base_name}_{date_suffix}.parquet"
+    
+    def process_dataframe(self, df: pd.DataFrame, source_name: str, index: Optional[str] = None,
+                          target_date: Optional[date] = None,
+                          source: Optional[str] = None, upload: bool = True) -> Optional[Dict]:
+        """
+        Executa as etapas de limpeza, validação, escrita Parquet e upload
+        para um DataFrame já carregado (de arquivo ou da memória).
+        
+        Args:
+            df (pd.DataFrame): Dados brutos das ações
+            source_name (str): Nome do arquivo de origem (metadados e nome do Parquet)
+            index (Optional[str]): Código do índice dos dados
+            target_date (Optional[date]): Data para particionamento (padrão: hoje)
+            source (Optional[str]): Referência da origem no relatório (padrão: source_name)
+            upload (bool): Se deve enviar ao S3 agora (False = upload em lote
+                posterior via upload_results_to_s3)
+            
+        Returns:
+            Optional[Dict]: Relatório do processamento ou None se erro
+        """
+        if not target_date:
+            target_date = date.today()
+        
+        try:
+            # 1. Validar e limpar dados do DataFrame
+            df_clean, validation_report = self.clean_and_validate_dataframe(df)
+            
+            # 2. Adicionar metadados
+            df_final = self.add_processing_metadata(df_clean, source_name, target_date=target_date)
+            
+            # 3. Definir nome do arquivo e gravar no destino (local ou S3)
+            parquet_filename = self.get_parquet_filename(source_name, index, target_date)
+            output = self.sink.write(df_final, target_date, parquet_filename)
+            if not output:
+                return None
+            
+            # 4. Upload e registro do resultado
+            return self._finish_processing(output, source_name, target_date, parquet_filename,
+                                           len(df_final), validation_report, source, upload)
+            
+        except Exception as e:
+            logger.error(f"❌ Erro ao processar {source_name}: {e}")
+            return None
+    
+    def _finish_processing(self, output: Dict, source_name: str, target_date: date,
+                           parquet_filename: str, records: int, validation_report: Dict,
+                           source: Optional[str], upload: bool) -> Dict:
+        """Envia a cópia local ao S3 (se habilitado) e monta o relatório do arquivo."""
+        s3_upload_success = output['s3_uploaded']
+        s3_key = output['s3_key']
+        if self.upload_to_s3 and upload and not self.sink.uploads_directly:
+            s3_key = self.get_s3_key(target_date, parquet_filename)
+            s3_upload_success = self.upload_file_to_s3(Path(output['output_file']), s3_key)
+        
+        self.processed_files.append({
+            'source': source or source_name,
+            'output': output['output_file'],
+            'records': records,
+            'validation_report': validation_report,
+            's3_uploaded': s3_upload_success,
+            's3_key': s3_key
+        })
+        
+        result = {
+            'source_file': source_name,
+            'output_file': output['output_file'],
+            'records_processed': records,
+            'validation_report': validation_report,
+            'file_size_mb': output['size_bytes'] / 1024 / 1024,
+            's3_uploaded': s3_upload_success,
+            's3_key': s3_key
+        }
+        if 'upload_seconds' in output:
+            result['upload_seconds'] = output['upload_seconds']
+        return result
+    
+    def _iter_clean_tables(self, records: Iterable[Dict], source_name: str, report: Dict,
+                           budget: MemoryBudget, target_date: Optional[date] = None) -> Iterator[pa.Table]:
+        """
+        Limpa e converte os registros em lotes de até chunk_size linhas.
+        
+        Após cada lote o RSS é comparado ao limite; acima dele, a memória
+        livre é devolvida e, se ainda necessário, o lote é reduzido à metade
+        (até ProcessingConfig.MIN_CHUNK_SIZE).
+        
+        Args:
+            records (Iterable[Dict]): Registros brutos
+            source_name (str): Nome do arquivo de origem (metadados)
+            report (Dict): Relatório de validação acumulado ('chunks' incluso)
+            budget (MemoryBudget): Limite de memória
+            target_date (Optional[date]): Data de particionamento (partition_date)
+            
+        Yields:
+            pa.Table: Lote limpo no schema canônico
+        """
+        iterator = iter(records)
+        chunk_rows = self.chunk_size
+        processed_at = datetime.now()
+        seen_codes = set()
+        
+        while True:
+            chunk = list(islice(iterator, chunk_rows))
+            if not chunk:
+                return
+            df, chunk_report = self.clean_and_validate_dataframe(pd.DataFrame(chunk))
+            del chunk
+            
+            # drop_duplicates só enxerga o lote atual (consulta ao set: O(lote))
+            if 'codigo' in df.columns:
+                codes = df['codigo'].tolist()
+                duplicated = np.fromiter((code in seen_codes for code in codes), bool, len(codes))
+                if duplicated.any():
+                    df = df[~duplicated]
+                    chunk_report['final_records'] = len(df)
+                seen_codes.update(codes)
+            
+            for key, value in chunk_report.items():
+                report[key] += value
+            report['chunks'] += 1
+            
+            yield self.to_arrow_table(self.add_processing_metadata(df, source_name, processed_at, target_date))
+            del df
+            
+            if not budget.check():
+                gc.collect()
+                pa.default_memory_pool().release_unused()
+                if not budget.check() and chunk_rows > ProcessingConfig.MIN_CHUNK_SIZE:
+                    chunk_rows = max(ProcessingConfig.MIN_CHUNK_SIZE, chunk_rows // 2)
+                    logger.warning(f"⚠️ Memória acima de {budget.limit_mb} MB "
+                                   f"({budget.peak_mb:.0f} MB), lotes reduzidos para {chunk_rows} registros")
+    
+    def process_records_chunked(self, records: Iterable[Dict], source_name: str,
+                                index: Optional[str] = None, target_date: Optional[date] = None,
+                                source: Optional[str] = None, upload: bool = True) -> Optional[Dict]:
+        """
+        Processa registros em lotes (limpeza → metadados → ParquetWriter),
+        mantendo em memória apenas o lote atual.
+        
+        Usado para arquivos acima de chunk_size registros; o resultado tem o
+        mesmo formato de process_dataframe, com 'chunks' e 'peak_rss_mb'.
+        
+        Args:
+            records (Iterable[Dict]): Registros brutos (ex.: iter_raw_capture_records)
+            source_name (str): Nome do arquivo de origem (metadados e nome do Parquet)
+            index (Optional[str]): Código do índice dos dados
             target_date (Optional[date]): Data para particionamento (padrão: hoje)
+            source (Optional[str]): Referência da origem no relatório (padrão: source_name)
+            upload (bool): Se deve enviar ao S3 agora (ver process_dataframe)
             
         Returns:
             Optional[Dict]: Relatório do processamento ou None se erro
@@ -402,12 +1496,64 @@ class B3ParquetProcessor:
         if not target_date:
             target_date = date.today()
         
+        report = {
+            'original_records': 0,
+            'null_values_fixed': 0,
+            'invalid_records_removed': 0,
+            'data_type_corrections': 0,
+            'conversion_errors': 0,
+            'final_records': 0,
+            'chunks': 0
+        }
+        budget = MemoryBudget(self.memory_limit_mb)
+        
+        try:
+            parquet_filename = self.get_parquet_filename(source_name, index, target_date)
+            tables = self._iter_clean_tables(records, source_name, report, budget, target_date)
+            output = self.sink.write_chunks(tables, target_date, parquet_filename)
+            if not output:
+                return None
+            
+            logger.info(f"📦 {source_name}: {report['final_records']} registros em "
+                        f"{report['chunks']} lotes (pico de memória: {budget.peak_mb:.0f} MB)")
+            result = self._finish_processing(output, source_name, target_date, parquet_filename,
+                                             report['final_records'], report, source, upload)
+            result['chunks'] = report['chunks']
+            result['peak_rss_mb'] = budget.peak_mb
+            return result
+            
+        except Exception as e:
+            logger.error(f"❌ Erro ao processar {source_name}: {e}")
+            return None
+    
+    def process_json_file(self, json_file: Path, target_date: Optional[date] = None,
+                          upload: bool = True) -> Optional[Dict]:
+        """
+        Processa um arquivo JSON específico e converte para Parquet.
+        
+        Args:
+            json_file (Path): Caminho do arquivo JSON
+            target_date (Optional[date]): Data para particionamento (padrão: hoje)
+            upload (bool): Se deve enviar ao S3 ao final (ver process_dataframe)
+            
+        Returns:
+            Optional[Dict]: Relatório do processamento ou None se erro
+        """
         logger.info(f"Processando arquivo: {json_file.name}")
         
         try:
+            # Capturas grandes são lidas em streaming e processadas em lotes
+            if is_raw_capture(json_file):
+                header = read_raw_capture_header(json_file)
+                if header.get('records_count', 0) > self.chunk_size:
+                    return self.process_records_chunked(
+                        iter_raw_capture_records(json_file), json_file.name,
+                        header['data'].get('index'), target_date, str(json_file), upload
+                    )
+            
             # 1. Carregar dados JSON
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            # Captura ndjson comprimida ou JSON legado, conforme a extensão
+            data = read_raw_file(json_file)
             
             # 2. Validar estrutura JSON primeiro
             if not self.validate_stock_data(data):
@@ -423,76 +1569,156 @@ class B3ParquetProcessor:
                 logger.warning(f"Nenhum dado de ação encontrado em {json_file.name}")
                 return None
             
+            if len(stocks_data) > self.chunk_size:
+                return self.process_records_chunked(stocks_data, json_file.name, data.get('index'),
+                                                    target_date, str(json_file), upload)
+            
             # 4. Converter para DataFrame
             df = pd.DataFrame(stocks_data)
             
-            # 5. Validar e limpar dados do DataFrame
-            df_clean, validation_report = self.clean_and_validate_dataframe(df)
+        except Exception as e:
+            logger.error(f"❌ Erro ao processar {json_file.name}: {e}")
+            return None
+        
+        # 5. Limpar, validar, salvar e enviar
+        return self.process_dataframe(df, json_file.name, data.get('index'), target_date, str(json_file), upload)
+    
+    def process_stock_batch(self, batch: Dict, target_date: Optional[date] = None,
+                            upload: bool = True) -> Optional[Dict]:
+        """
+        Processa um lote colunar recebido diretamente do scraper, sem
+        passar por arquivos JSON em disco.
+        
+        Args:
+            batch (Dict): Lote gerado por build_columnar_batches
+                ('source_file', 'index', 'columns', 'num_rows'); 'columns' pode
+                ser um dict de listas ou um RecordBatch/Table Arrow
+            target_date (Optional[date]): Data para particionamento (padrão: hoje)
+            upload (bool): Se deve enviar ao S3 ao final (ver process_dataframe)
             
-            # 6. Adicionar metadados
-            df_final = self.add_processing_metadata(df_clean, json_file.name)
-            
-            # 7. Definir nome do arquivo Parquet baseado no tipo de dados
-            if 'consolidados' in json_file.name.lower():
-                parquet_filename = f"ibov_consolidado_{target_date.strftime('%Y%m%d')}.parquet"
-            elif 'carteira_dia_codigo' in json_file.name.lower():
-                parquet_filename = f"ibov_carteira_codigo_{target_date.strftime('%Y%m%d')}.parquet"
-            elif 'carteira_dia_setor' in json_file.name.lower():
-                parquet_filename = f"ibov_carteira_setor_{target_date.strftime('%Y%m%d')}.parquet"
-            elif 'carteira_teorica' in json_file.name.lower():
-                parquet_filename = f"ibov_carteira_teorica_{target_date.strftime('%Y%m%d')}.parquet"
-            elif 'previa_quadrimestral' in json_file.name.lower():
-                parquet_filename = f"ibov_previa_quadrimestral_{target_date.strftime('%Y%m%d')}.parquet"
-            else:
-                # Fallback para nomes genéricos
-                base_name = json_file.stem.replace('b3_', '').replace('_', '-')
-                parquet_filename = f"ibov_{base_name}_{target_date.strftime('%Y%m%d')}.parquet"
-            
-            # 8. Criar caminho particionado
-            parquet_path = self.create_partition_path(target_date, parquet_filename)
-            
-            # 9. Salvar arquivo Parquet
-            success = self.save_to_parquet(df_final, parquet_path)
-            
-            if success:
-                # 10. Upload para S3 (se habilitado)
-                s3_upload_success = False
-                if self.upload_to_s3:
-                    # Definir chave S3 mantendo estrutura particionada
-                    s3_key = f"data_lake/ano={target_date.year}/mes={target_date.month:02d}/dia={target_date.day:02d}/{parquet_filename}"
-                    s3_upload_success = self.upload_file_to_s3(parquet_path, s3_key)
-                
+        Returns:
+            Optional[Dict]: Relatório do processamento ou None se erro
+        """
+        source_name = batch['source_file']
+        logger.info(f"Processando lote em memória: {source_name} ({batch.get('num_rows', 0)} registros)")
+        
+        if not batch.get('num_rows'):
+            logger.warning(f"Nenhum dado de ação encontrado em {source_name}")
+            return None
+        
+        columns = batch['columns']
+        if isinstance(columns, (pa.RecordBatch, pa.Table)):
+            df = columns.to_pandas()
+        else:
+            df = pd.DataFrame(columns)
+        return self.process_dataframe(df, source_name, batch.get('index'), target_date,
+                                      f"memory://{source_name}", upload)
+    
+    def _new_results_report(self, target_date: date, input_directory: str,
+                            total_files: int, skipped_files: List[str]) -> Dict:
+        return {
+            'processing_date': target_date.isoformat(),
+            'input_directory': input_directory,
+            'output_directory': str(self.output_path),
+            'files_processed': [],
+            'files_failed': [],
+            'files_skipped': skipped_files,
+            'summary': {
+                'total_files': total_files,
+                'successful': 0,
+                'failed': 0,
+                'total_records': 0
+            }
+        }
+    
+    def _record_result(self, results: Dict, name: str, result: Optional[Dict]) -> None:
+        if result:
+            results['files_processed'].append(result)
+            results['summary']['successful'] += 1
+            results['summary']['total_records'] += result['records_processed']
+            logger.info(f"✅ {name}: {result['records_processed']} registros")
+        else:
+            results['files_failed'].append(name)
+            results['summary']['failed'] += 1
+            logger.error(f"❌ Falha ao processar: {name}")
+    
+    def _log_results_summary(self, results: Dict) -> None:
+        logger.info("🎯 Processamento concluído!")
+        logger.info(f"📊 Arquivos processados: {results['summary']['successful']}/{results['summary']['total_files']}")
+        logger.info(f"📈 Total de registros: {results['summary']['total_records']}")
+        
+        if results['summary']['successful'] > 0:
+            logger.info(f"📁 Estrutura criada em: {self.output_path}")
+    
+    def find_raw_files(self) -> List[Path]:
+        """
+        Lista os arquivos brutos do diretório de entrada em todos os formatos
+        suportados (JSON legado e captura ndjson comprimida).
+        
+        Returns:
+            List[Path]: Arquivos encontrados, em ordem alfabética
+        """
+        patterns = ["*.json"] + [f"*{suffix}" for suffix in FileConfig.RAW_SUFFIXES.values()]
+        return sorted(path for pattern in patterns for path in self.input_path.glob(pattern))
+    
+    def _process_files_parallel(self, json_files: List[Path], target_date: date,
+                                workers: int) -> List[Optional[Dict]]:
+        """
+        Processa arquivos em paralelo: limpeza e escrita Parquet em um pool
+        de processos (CPU). O upload é feito depois, em lote, pelo S3Uploader.
+        
+        Args:
+            json_files (List[Path]): Arquivos a processar
+            target_date (date): Data para particionamento
+            workers (int): Número de processos
+            
+        Returns:
+            List[Optional[Dict]]: Resultados na mesma ordem de json_files
+        """
+        logger.info(f"Modo paralelo: {workers} processos")
+        
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(str(self.input_path), str(self.output_path),
+                                           not self.sink.uploads_directly,
+                                           self.write_options)) as pool:
+            futures = [pool.submit(_process_file_in_worker, str(f), target_date) for f in json_files]
+            
+            results = []
+            for json_file, future in zip(json_files, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    logger.error(f"❌ Erro ao processar {json_file.name}: {e}")
+                    results.append(None)
+        
+        # Registrar na ordem original (como no modo sequencial)
+        for json_file, result in zip(json_files, results):
+            if result:
                 self.processed_files.append({
                     'source': str(json_file),
-                    'output': str(parquet_path),
-                    'records': len(df_final),
-                    'validation_report': validation_report,
-                    's3_uploaded': s3_upload_success,
-                    's3_key': s3_key if self.upload_to_s3 else None
+                    'output': result['output_file'],
+                    'records': result['records_processed'],
+                    'validation_report': result['validation_report'],
+                    's3_uploaded': result['s3_uploaded'],
+                    's3_key': result['s3_key']
                 })
-                
-                return {
-                    'source_file': json_file.name,
-                    'output_file': str(parquet_path),
-                    'records_processed': len(df_final),
-                    'validation_report': validation_report,
-                    'file_size_mb': parquet_path.stat().st_size / 1024 / 1024,
-                    's3_uploaded': s3_upload_success,
-                    's3_key': s3_key if self.upload_to_s3 else None
-                }
-            
-            return None
-            
-        except Exception as e:
-            logger.error(f"❌ Erro ao processar {json_file.name}: {e}")
-            return None
+        
+        return results
     
-    def process_all_json_files(self, target_date: Optional[date] = None) -> Dict:
+    def process_all_json_files(self, target_date: Optional[date] = None,
+                               skip_files: Optional[List[str]] = None,
+                               max_workers: Optional[int] = None,
+                               force: bool = False) -> Dict:
         """
         Processa todos os arquivos JSON do diretório de entrada.
         
         Args:
             target_date (Optional[date]): Data para particionamento
+            skip_files (Optional[List[str]]): Nomes de arquivos a ignorar
+                (ex.: endpoints sem alterações segundo o cache HTTP)
+            max_workers (Optional[int]): Processos para limpeza/escrita
+                (padrão: ProcessingConfig.MAX_WORKERS; 1 = sequencial)
+            force (bool): Reprocessa todos os arquivos, ignorando o manifesto
             
         Returns:
             Dict: Relatório completo do processamento
@@ -503,62 +1729,151 @@ class B3ParquetProcessor:
         logger.info("Iniciando processamento de todos os arquivos JSON...")
         logger.info(f"Data de particionamento: {target_date}")
         
-        # Encontrar todos os arquivos JSON
-        json_files = list(self.input_path.glob("*.json"))
+        # Encontrar todos os arquivos brutos (JSON legado e captura ndjson)
+        json_files = self.find_raw_files()
         
         if not json_files:
             logger.warning(f"Nenhum arquivo JSON encontrado em {self.input_path}")
             return {'error': 'Nenhum arquivo JSON encontrado'}
         
-        results = {
-            'processing_date': target_date.isoformat(),
-            'input_directory': str(self.input_path),
-            'output_directory': str(self.output_path),
-            'files_processed': [],
-            'files_failed': [],
-            'summary': {
-                'total_files': len(json_files),
-                'successful': 0,
-                'failed': 0,
-                'total_records': 0
-            }
-        }
+        # Ignorar arquivos inalterados (sem regravar Parquet nem reenviar ao S3)
+        skipped_files = []
+        if skip_files:
+            skipped_files = sorted(f.name for f in json_files if get_logical_filename(f.name) in skip_files)
+            json_files = [f for f in json_files if get_logical_filename(f.name) not in skip_files]
+            if skipped_files:
+                logger.info(f"♻️ Arquivos sem alterações ignorados: {len(skipped_files)}")
         
-        # Processar cada arquivo
-        for json_file in json_files:
-            result = self.process_json_file(json_file, target_date)
-            
-            if result:
-                results['files_processed'].append(result)
-                results['summary']['successful'] += 1
-                results['summary']['total_records'] += result['records_processed']
-                logger.info(f"✅ {json_file.name}: {result['records_processed']} registros")
+        # Ignorar arquivos com mesmo conteúdo e versão do processador (manifesto)
+        hashes = {}
+        if self.manifest is not None:
+            self.manifest.load()
+            hashes = {str(f): compute_file_hash(f) for f in json_files}
+            if not force:
+                # Só é ignorado o arquivo já gravado na partição desta data
+                partition = self.get_partition_key(target_date)
+                unchanged = [
+                    f for f in json_files
+                    if self.manifest.is_unchanged(str(f), hashes[str(f)], PROCESSOR_VERSION,
+                                                  require_upload=self.upload_to_s3, partition=partition)
+                ]
+                if unchanged:
+                    logger.info(f"♻️ Arquivos já processados (manifesto): {len(unchanged)}")
+                    skipped_files = sorted(skipped_files + [f.name for f in unchanged])
+                    json_files = [f for f in json_files if f not in unchanged]
             else:
-                results['files_failed'].append(json_file.name)
-                results['summary']['failed'] += 1
-                logger.error(f"❌ Falha ao processar: {json_file.name}")
+                logger.info("🔁 Reprocessamento completo (manifesto ignorado)")
         
-        # Log do resumo final
-        logger.info("🎯 Processamento concluído!")
-        logger.info(f"📊 Arquivos processados: {results['summary']['successful']}/{results['summary']['total_files']}")
-        logger.info(f"📈 Total de registros: {results['summary']['total_records']}")
+        results = self._new_results_report(target_date, str(self.input_path), len(json_files), skipped_files)
         
-        if results['summary']['successful'] > 0:
-            logger.info(f"📁 Estrutura criada em: {self.output_path}")
+        # Processar cada arquivo (em sequência ou em paralelo)
+        workers = max_workers or ProcessingConfig.MAX_WORKERS
+        if workers > 1 and len(json_files) > 1:
+            file_results = self._process_files_parallel(json_files, target_date, min(workers, len(json_files)))
+        else:
+            file_results = [self.process_json_file(json_file, target_date, upload=False)
+                            for json_file in json_files]
+        
+        # Upload concorrente de todos os Parquet gerados
+        if self.upload_to_s3 and not self.sink.uploads_directly and any(file_results):
+            results['upload_report'] = self.upload_results_to_s3(file_results, target_date)
+        
+        for json_file, result in zip(json_files, file_results):
+            self._record_result(results, json_file.name, result)
+        
+        if self.manifest is not None and json_files:
+            self._update_manifest(json_files, file_results, hashes, target_date)
         
+        self._log_results_summary(results)
+        return results
+    
+    def process_batches(self, batches: List[Dict], target_date: Optional[date] = None) -> Dict:
+        """
+        Processa os lotes colunares entregues pelo scraper em memória.
+        
+        Equivalente a process_all_json_files, mas sem a ida e volta pelo
+        disco: os dados seguem direto para limpeza, validação e escrita.
+        
+        Args:
+            batches (List[Dict]): Lotes gerados por build_columnar_batches
+            target_date (Optional[date]): Data para particionamento
+            
+        Returns:
+            Dict: Relatório completo do processamento (mesma estrutura de process_all_json_files)
+        """
+        if not target_date:
+            target_date = date.today()
+        
+        logger.info(f"Iniciando processamento em memória de {len(batches)} lotes...")
+        logger.info(f"Data de particionamento: {target_date}")
+        
+        if not batches:
+            logger.warning("Nenhum lote recebido do scraper")
+            return {'error': 'Nenhum lote recebido'}
+        
+        results = self._new_results_report(target_date, 'memory', len(batches), [])
+        
+        batch_results = [self.process_stock_batch(batch, target_date, upload=False) for batch in batches]
+        
+        # Upload concorrente de todos os Parquet gerados
+        if self.upload_to_s3 and not self.sink.uploads_directly and any(batch_results):
+            results['upload_report'] = self.upload_results_to_s3(batch_results, target_date)
+        
+        for batch, result in zip(batches, batch_results):
+            self._record_result(results, batch['source_file'], result)
+        
+        self._log_results_summary(results)
         return results
 
 
-def main():
+# Processador de cada processo do pool (com cópia local, o upload é feito pelo processo principal)
+_worker_processor: Optional[B3ParquetProcessor] = None
+
+
+def _init_worker(input_path: str, output_path: str, keep_local_copy: bool = True,
+                 write_options: Optional[Dict] = None) -> None:
+    global _worker_processor
+    # Sem cópia local, cada worker envia direto ao S3 (cliente próprio)
+    _worker_processor = B3ParquetProcessor(input_path, output_path, upload_to_s3=not keep_local_copy,
+                                           use_manifest=False, keep_local_copy=keep_local_copy,
+                                           write_options=write_options)
+
+
+def _process_file_in_worker(json_file: str, target_date: date) -> Optional[Dict]:
+    return _worker_processor.process_json_file(Path(json_file), target_date)
+
+
+def main(argv: Optional[List[str]] = None):
     """
     Função principal para executar o processamento Parquet.
     """
+    parser = argparse.ArgumentParser(description="Converte os dados brutos da B3 para Parquet")
+    parser.add_argument('--force', action='store_true',
+                        help="reprocessa todos os arquivos, ignorando o manifesto")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="processos para limpeza/escrita (padrão: ProcessingConfig.MAX_WORKERS)")
+    parser.add_argument('--compression', default=None,
+                        help="codec Parquet (padrão: DataLakeConfig.PARQUET_COMPRESSION)")
+    parser.add_argument('--compression-level', type=int, default=None,
+                        help="nível do codec (ex.: zstd 1-22)")
+    parser.add_argument('--row-group-size', type=int, default=None,
+                        help="linhas por row group")
+    args = parser.parse_args(argv)
+    
+    write_options = {
+        key: value for key, value in (
+            ('compression', args.compression),
+            ('compression_level', args.compression_level),
+            ('row_group_size', args.row_group_size)
+        ) if value is not None
+    }
+    
     try:
         # Inicializar processador
-        processor = B3ParquetProcessor()
+        processor = B3ParquetProcessor(write_options=write_options)
         
         # Processar todos os arquivos
-        results = processor.process_all_json_files()
+        results = processor.process_all_json_files(max_workers=args.workers, force=args.force)
         
         # Exibir resumo
         if 'error' not in results:
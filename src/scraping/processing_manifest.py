@@ -0,0 +1,225 @@
+"""
+Manifesto de processamento incremental do B3ParquetProcessor.
+
+Registra, para cada arquivo bruto processado, o hash do conteúdo, a versão
+do processador, o Parquet gerado e o objeto enviado ao S3 (chave e ETag).
+Arquivos com o mesmo conteúdo e a mesma versão do processador podem ser
+ignorados nas execuções seguintes. O manifesto fica no diretório do data
+lake e, opcionalmente, também no bucket (útil no Lambda, cujo /tmp é efêmero).
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    from .config import Constants, setup_logger
+except ImportError:
+    # Fallback para execução direta
+    from config import Constants, setup_logger
+
+# Configurar logger
+logger = setup_logger(__name__)
+
+MANIFEST_VERSION = 1
+
+
+def compute_file_hash(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Calcula o hash SHA-256 do conteúdo de um arquivo, lendo em blocos.
+    
+    Args:
+        path (Path): Arquivo a ser lido
+        chunk_size (int): Tamanho de cada bloco em bytes
+        
+    Returns:
+        str: Hash no formato 'sha256:<hex>'
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return f"sha256:{digest.hexdigest()}"
+
+
+class ProcessingManifest:
+    """
+    Manifesto persistente (JSON) indexado pelo caminho do arquivo de origem.
+    """
+    
+    def __init__(self, path: Path, s3_client=None, s3_bucket: Optional[str] = None,
+                 s3_key: Optional[str] = None):
+        """
+        Inicializa o manifesto (vazio até load()).
+        
+        Args:
+            path (Path): Arquivo local do manifesto
+            s3_client: Cliente boto3 para a cópia no bucket (opcional)
+            s3_bucket (Optional[str]): Bucket da cópia remota
+            s3_key (Optional[str]): Chave da cópia remota
+        """
+        self.path = Path(path)
+        self.s3_client = s3_client
+        self.s3_bucket = s3_bucket
+        self.s3_key = s3_key
+        self.entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+    
+    @property
+    def syncs_to_s3(self) -> bool:
+        return bool(self.s3_client and self.s3_bucket and self.s3_key)
+    
+    def _parse(self, content: bytes) -> Dict[str, Dict]:
+        data = json.loads(content)
+        if not isinstance(data, dict) or data.get('manifest_version') != MANIFEST_VERSION:
+            logger.warning("Manifesto em versão desconhecida, ignorado")
+            return {}
+        return data.get('entries', {})
+    
+    def load(self) -> 'ProcessingManifest':
+        """
+        Carrega o manifesto local ou, se não existir, a cópia do S3.
+        
+        Returns:
+            ProcessingManifest: O próprio manifesto
+        """
+        self.entries = {}
+        try:
+            if self.path.exists():
+                self.entries = self._parse(self.path.read_bytes())
+            elif self.syncs_to_s3:
+                response = self.s3_client.get_object(Bucket=self.s3_bucket, Key=self.s3_key)
+                self.entries = self._parse(response['Body'].read())
+                logger.info(f"Manifesto carregado de s3://{self.s3_bucket}/{self.s3_key}")
+        except Exception as e:
+            # Manifesto ausente ou corrompido: processa tudo novamente
+            logger.warning(f"⚠️ Manifesto indisponível ({e}), reprocessando todos os arquivos")
+            self.entries = {}
+        
+        return self
+    
+    def save(self) -> bool:
+        """
+        Grava o manifesto localmente (escrita atômica) e no S3, se configurado.
+        
+        Returns:
+            bool: True se todas as gravações foram bem-sucedidas
+        """
+        with self._lock:
+            content = json.dumps(
+                {'manifest_version': MANIFEST_VERSION, 'entries': self.entries},
+                ensure_ascii=False, indent=2, sort_keys=True
+            ).encode(Constants.DEFAULT_ENCODING)
+        
+        success = True
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            tmp_path.write_bytes(content)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            # Disco local somente leitura não impede a cópia no S3
+            logger.error(f"❌ Erro ao salvar manifesto local: {e}")
+            success = False
+        
+        if self.syncs_to_s3:
+            try:
+                self.s3_client.put_object(Bucket=self.s3_bucket, Key=self.s3_key, Body=content,
+                                          ContentType='application/json')
+            except Exception as e:
+                logger.error(f"❌ Erro ao salvar manifesto no S3: {e}")
+                success = False
+        
+        return success
+    
+    def get(self, source: str) -> Optional[Dict]:
+        """Retorna a entrada de um arquivo de origem, se existir."""
+        return self.entries.get(source)
+    
+    def is_unchanged(self, source: str, content_hash: str, processor_version: str,
+                     require_upload: bool = False, partition: Optional[str] = None) -> bool:
+        """
+        Indica se o arquivo já foi processado com o mesmo conteúdo e versão.
+        
+        Args:
+            source (str): Caminho do arquivo de origem
+            content_hash (str): Hash atual do conteúdo
+            processor_version (str): Versão atual do processador
+            require_upload (bool): Exige o objeto no S3 (ETag registrado) em vez
+                do Parquet local
+            partition (Optional[str]): Partição de destino desta execução
+                (ex.: ano=2025/mes=08/dia=04); se informada, só ignora o arquivo
+                já gravado nessa mesma partição
+            
+        Returns:
+            bool: True se o arquivo pode ser ignorado
+        """
+        entry = self.get(source)
+        if not entry:
+            return False
+        if entry.get('content_hash') != content_hash or entry.get('processor_version') != processor_version:
+            return False
+        if partition is not None and entry.get('partition') != partition:
+            return False
+        if require_upload:
+            return bool(entry.get('etag'))
+        return Path(entry.get('output', '')).exists()
+    
+    def record(self, source: str, content_hash: str, processor_version: str, output: str,
+               s3_key: Optional[str] = None, etag: Optional[str] = None,
+               records: Optional[int] = None, partition: Optional[str] = None) -> Dict:
+        """
+        Registra (ou substitui) a entrada de um arquivo processado.
+        
+        A partição de destino (ex.: ano=2025/mes=08/dia=04) é registrada para
+        que o mesmo arquivo processado para outra data não seja ignorado.
+        
+        Returns:
+            Dict: Entrada gravada
+        """
+        entry = {
+            'source': source,
+            'content_hash': content_hash,
+            'processor_version': processor_version,
+            'partition': partition,
+            'output': output,
+            's3_key': s3_key,
+            'etag': etag,
+            'records': records,
+            'processed_at': datetime.now().isoformat()
+        }
+        with self._lock:
+            self.entries[source] = entry
+        return entry
+    
+    def mark_compacted(self, replacements: Dict[str, str], field: str = 'output') -> int:
+        """
+        Aponta as entradas cujos Parquets diários foram compactados para o novo arquivo.
+        
+        O valor diário original fica em '<field>_daily', usado nas compactações
+        seguintes (ex.: mensal → anual).
+        
+        Args:
+            replacements (Dict[str, str]): {caminho/chave diária: arquivo compactado}
+            field (str): 'output' (data lake local) ou 's3_key' (bucket)
+            
+        Returns:
+            int: Número de entradas atualizadas
+        """
+        updated = 0
+        compacted_at = datetime.now().isoformat()
+        with self._lock:
+            for entry in self.entries.values():
+                daily = entry.get(f'{field}_daily') or entry.get(field)
+                target = replacements.get(os.path.normpath(daily)) if daily else None
+                if target is None:
+                    continue
+                entry[f'{field}_daily'] = daily
+                entry[field] = target
+                entry['compacted_at'] = compacted_at
+                updated += 1
+        return updated
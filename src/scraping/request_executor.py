@@ -0,0 +1,226 @@
+"""
+Camada de execução de requisições HTTP para a B3.
+
+Combina um rate limiter (token bucket) compartilhado entre os workers
+concorrentes com retry por backoff exponencial com jitter, aplicado apenas
+a respostas 5xx e timeouts. Registra a latência de cada tentativa.
+"""
+
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+try:
+    from .config import Constants, RequestConfig, setup_logger
+except ImportError:
+    # Fallback para execução direta
+    from config import Constants, RequestConfig, setup_logger
+
+# Configurar logger
+logger = setup_logger(__name__)
+
+
+class TokenBucket:
+    """
+    Rate limiter thread-safe no modelo token bucket.
+
+    Os tokens são repostos a `rate` por segundo até `capacity` (rajada).
+    Cada acquire() reserva um token; se não houver saldo, o chamador
+    aguarda o tempo necessário para a reposição.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            rate (float): Tokens (requisições) por segundo; <= 0 desabilita o limite
+            capacity (float): Máximo de tokens acumulados (tamanho da rajada)
+            clock (Callable): Relógio monotônico (injetável para testes)
+            sleep (Callable): Função de espera (injetável para testes)
+        """
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._last_refill = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Reserva um token, aguardando se necessário.
+
+        Returns:
+            float: Tempo aguardado em segundos
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        with self._lock:
+            now = self._clock()
+            elapsed = now - self._last_refill
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._last_refill = now
+
+            # Saldo negativo = reserva; a espera acontece fora do lock
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+
+class RequestExecutor:
+    """
+    Executa requisições GET com rate limit, retry e estatísticas por tentativa.
+    """
+
+    def __init__(self, session: requests.Session,
+                 rate_limiter: Optional[TokenBucket] = None,
+                 timeout: float = Constants.REQUEST_TIMEOUT,
+                 retry_attempts: int = RequestConfig.RETRY_ATTEMPTS,
+                 retry_delay: float = RequestConfig.RETRY_DELAY,
+                 max_retry_delay: float = RequestConfig.MAX_RETRY_DELAY,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            session (requests.Session): Sessão HTTP compartilhada
+            rate_limiter (Optional[TokenBucket]): Limiter compartilhado (None = sem limite)
+            timeout (float): Timeout de cada tentativa (segundos)
+            retry_attempts (int): Total de tentativas por requisição
+            retry_delay (float): Atraso base do backoff exponencial (segundos)
+            max_retry_delay (float): Teto do atraso entre tentativas (segundos)
+            sleep (Callable): Função de espera (injetável para testes)
+        """
+        self.session = session
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout
+        self.retry_attempts = max(1, retry_attempts)
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._sleep = sleep
+        self._attempts: List[Dict] = []
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_app_config(cls, session: requests.Session) -> 'RequestExecutor':
+        """
+        Cria o executor com a política definida em config/app_config.yml.
+
+        Args:
+            session (requests.Session): Sessão HTTP compartilhada
+
+        Returns:
+            RequestExecutor: Executor configurado
+        """
+        settings = RequestConfig.from_app_config()
+        return cls(
+            session,
+            rate_limiter=TokenBucket(settings['rate_limit'], settings['rate_limit_burst']),
+            timeout=settings['timeout'],
+            retry_attempts=settings['retry_attempts'],
+            retry_delay=settings['retry_delay'],
+            max_retry_delay=settings['max_retry_delay']
+        )
+
+    def backoff_delay(self, attempt: int) -> float:
+        """
+        Calcula a espera antes da próxima tentativa (backoff exponencial, full jitter).
+
+        Args:
+            attempt (int): Número da tentativa que falhou (1-based)
+
+        Returns:
+            float: Atraso em segundos
+        """
+        ceiling = min(self.max_retry_delay, self.retry_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+    def _record(self, url: str, attempt: int, started: float, throttle_wait: float,
+                status_code: Optional[int] = None, error: Optional[str] = None) -> None:
+        with self._stats_lock:
+            self._attempts.append({
+                'url': url,
+                'attempt': attempt,
+                'status_code': status_code,
+                'latency_ms': (time.perf_counter() - started) * 1000,
+                'throttle_wait_ms': throttle_wait * 1000,
+                'error': error
+            })
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None,
+            stream: bool = False) -> requests.Response:
+        """
+        Executa um GET com rate limit e retry em 5xx/timeouts.
+
+        Outros erros (4xx, falhas de conexão) são propagados imediatamente.
+
+        Args:
+            url (str): URL da requisição
+            headers (Optional[Dict[str, str]]): Headers adicionais
+            stream (bool): Se o corpo deve ser lido sob demanda (iter_content)
+
+        Returns:
+            requests.Response: Resposta bem-sucedida (ou 304)
+
+        Raises:
+            requests.exceptions.RequestException: Após esgotar as tentativas
+        """
+        for attempt in range(1, self.retry_attempts + 1):
+            throttle_wait = self.rate_limiter.acquire() if self.rate_limiter else 0.0
+            started = time.perf_counter()
+            last_attempt = attempt == self.retry_attempts
+
+            try:
+                response = self.session.get(url, timeout=self.timeout, headers=headers, stream=stream)
+            except requests.exceptions.Timeout as e:
+                self._record(url, attempt, started, throttle_wait, error=type(e).__name__)
+                if last_attempt:
+                    raise
+                logger.warning(f"Timeout na tentativa {attempt}/{self.retry_attempts}: {url}")
+            else:
+                self._record(url, attempt, started, throttle_wait, status_code=response.status_code)
+                if response.status_code < 500 or last_attempt:
+                    response.raise_for_status()
+                    return response
+                logger.warning(f"HTTP {response.status_code} na tentativa "
+                               f"{attempt}/{self.retry_attempts}: {url}")
+                response.close()
+
+            self._sleep(self.backoff_delay(attempt))
+
+    def get_stats(self) -> Dict:
+        """
+        Resume as tentativas registradas (latência, retries e espera do limiter).
+
+        Returns:
+            Dict: Estatísticas agregadas e a lista de tentativas
+        """
+        with self._stats_lock:
+            attempts = list(self._attempts)
+
+        latencies = sorted(a['latency_ms'] for a in attempts)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(round(p * (len(latencies) - 1))))]
+
+        return {
+            'total_attempts': len(attempts),
+            'retries': sum(1 for a in attempts if a['attempt'] > 1),
+            'errors': sum(1 for a in attempts if a['error'] or (a['status_code'] or 0) >= 500),
+            'latency_ms': {
+                'avg': sum(latencies) / len(latencies) if latencies else 0.0,
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'max': latencies[-1] if latencies else 0.0
+            },
+            'throttle_wait_ms_total': sum(a['throttle_wait_ms'] for a in attempts),
+            'attempts': attempts
+        }
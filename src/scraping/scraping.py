@@ -6,24 +6,34 @@ Versão modular simplificada para projeto educacional.
 import sys
 import os
 import requests
-from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional
 
 # Adicionar o diretório pai ao path para imports relativos funcionarem
 if __name__ == "__main__":
     sys.path.insert(0, os.path.dirname(__file__))
 
 try:
-    from .config import ENDPOINTS_CONFIG, HTTP_HEADERS, Constants, setup_logger
+    from .config import ENDPOINTS_CONFIG, HTTP_HEADERS, Constants, IndexConfig, setup_logger
+    from .http_cache import ResponseCache
+    from .request_executor import RequestExecutor
     from .utils import (
         validate_json_response, extract_stocks_from_response, create_base_data_structure,
-        save_json_data, get_filename_for_endpoint, format_timestamp
+        save_json_data, load_json_data, get_filename_for_endpoint, format_timestamp,
+        build_endpoint_url, calculate_total_pages, build_index_endpoints,
+        extract_stocks_from_stream
     )
 except ImportError:
     # Fallback para execução direta
-    from config import ENDPOINTS_CONFIG, HTTP_HEADERS, Constants, setup_logger
+    from config import ENDPOINTS_CONFIG, HTTP_HEADERS, Constants, IndexConfig, setup_logger
+    from http_cache import ResponseCache
+    from request_executor import RequestExecutor
     from utils import (
         validate_json_response, extract_stocks_from_response, create_base_data_structure,
-        save_json_data, get_filename_for_endpoint, format_timestamp
+        save_json_data, load_json_data, get_filename_for_endpoint, format_timestamp,
+        build_endpoint_url, calculate_total_pages, build_index_endpoints,
+        extract_stocks_from_stream
     )
 
 # Configurar logger
@@ -36,37 +46,88 @@ class B3Scraper:
     Refatorada para usar configurações e utilitários modulares.
     """
     
-    def __init__(self):
+    def __init__(self, cache: Optional[ResponseCache] = None,
+                 executor: Optional[RequestExecutor] = None,
+                 persist_raw: bool = True):
         """
         Inicializa o scraper com configurações da config.py
+        
+        Args:
+            cache (Optional[ResponseCache]): Cache de respostas HTTP (desabilitado se None)
+            executor (Optional[RequestExecutor]): Camada de retry/rate limit
+                (padrão: política de config/app_config.yml sobre a sessão do scraper)
+            persist_raw (bool): Se os dados brutos são gravados em FileConfig.DATA_DIR;
+                False mantém tudo em memória (ver build_columnar_batches)
         """
+        self.cache = cache
+        self.persist_raw = persist_raw
         self.session = requests.Session()
         self.session.headers.update(HTTP_HEADERS)
+        
+        # Pool de conexões compartilhado: pool_block limita as conexões
+        # simultâneas por host, mesmo com vários workers concorrentes
+        adapter = HTTPAdapter(pool_maxsize=Constants.MAX_CONNECTIONS_PER_HOST, pool_block=True)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        # Retry com backoff e rate limit compartilhado por todos os workers
+        self.executor = executor or RequestExecutor.from_app_config(self.session)
         logger.info("B3Scraper inicializado com configurações modulares")
     
-    def make_request(self, url: str) -> Optional[requests.Response]:
+    def make_request(self, url: str, stream: bool = False) -> Optional[requests.Response]:
         """
         Faz a requisição HTTP para o site da B3.
         
+        Usa o cache (se configurado) e o executor de requisições, que aplica
+        rate limit e retry com backoff em respostas 5xx e timeouts.
+        
         Args:
             url (str): URL para fazer a requisição
+            stream (bool): Se o corpo deve ser lido sob demanda (ver parse_json_stream)
             
         Returns:
             Optional[requests.Response]: Resposta da requisição ou None se houver erro
         """
+        cached = self.cache.get(url) if self.cache else None
+        if cached and self.cache.is_fresh(cached):
+            logger.info(f"Cache válido (TTL) para: {url}")
+            return self.cache.build_response(cached)
+        
         try:
             logger.info(f"Fazendo requisição para: {url}")
             
-            response = self.session.get(url, timeout=Constants.REQUEST_TIMEOUT)
+            response = self.executor.get(
+                url,
+                headers=self.cache.conditional_headers(cached) if self.cache else None,
+                stream=stream
+            )
+            
+            if cached and response.status_code == 304:
+                logger.info("Conteúdo não modificado (304), usando cache")
+                self.cache.refresh(url)
+                return self.cache.build_response(cached)
+            
             response.raise_for_status()
             
+            if self.cache:
+                self.cache.store(url, response)
+            
             logger.info(f"Requisição bem-sucedida. Status: {response.status_code}")
             return response
             
         except requests.exceptions.RequestException as e:
-            logger.error(f"Erro na requisição: {e}")
+            logger.error(f"Erro na requisição (após retries): {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Erro inesperado na requisição: {e}")
             return None
     
+    def get_request_stats(self) -> Dict:
+        """
+        Retorna estatísticas de latência e retries das requisições realizadas.
+        """
+        return self.executor.get_stats()
+    
     def parse_json_content(self, json_content: str, source_url: str) -> Dict:
         """
         Faz o parsing do conteúdo JSON e extrai dados estruturados.
@@ -98,7 +159,132 @@ class B3Scraper:
             logger.error(f"Erro no parsing do JSON: {e}")
             return {}
     
-    def save_endpoint_data(self, endpoint_name: str, endpoint_data: Dict) -> bool:
+    def parse_json_stream(self, response: requests.Response, source_url: str) -> Dict:
+        """
+        Faz o parsing em streaming de uma resposta aberta com stream=True.
+        
+        Os itens de `results` são decodificados incrementalmente a partir dos
+        bytes da resposta, sem materializar response.text nem o JSON completo.
+        
+        Apenas as ações já padronizadas são acumuladas em `stocks_data`: a lista
+        é necessária porque os registros são lidos mais de uma vez depois do
+        parsing (agregação das páginas 2..N, contagens do metadata, lote do
+        endpoint e do consolidado em build_columnar_batches, gravação do JSON
+        bruto) e porque a resposta é fechada aqui, antes desses consumidores.
+        
+        Args:
+            response (requests.Response): Resposta HTTP (stream=True)
+            source_url (str): URL de origem dos dados
+            
+        Returns:
+            Dict: Mesma estrutura de parse_json_content ({} se houver erro)
+        """
+        try:
+            envelope = {}
+            data = create_base_data_structure(source_url)
+            # Materializado uma única vez: os registros são reutilizados por
+            # vários consumidores após o fechamento da resposta (ver docstring)
+            data['stocks_data'] = list(extract_stocks_from_stream(
+                response.iter_content(chunk_size=Constants.STREAM_CHUNK_SIZE), envelope
+            ))
+            
+            # Metadata simples ('page' pode aparecer depois de 'results')
+            page_info = envelope.get('page') or {}
+            data['metadata'] = {
+                'total_records': page_info.get('totalRecords', len(data['stocks_data'])),
+                'page_size': page_info.get('pageSize', Constants.PAGE_SIZE),
+                'stocks_count': len(data['stocks_data'])
+            }
+            
+            logger.info(f"Dados extraídos: {len(data['stocks_data'])} ações")
+            return data
+            
+        except Exception as e:
+            logger.error(f"Erro no parsing do JSON: {e}")
+            return {}
+        finally:
+            response.close()
+    
+    def fetch_page_stocks(self, url: str) -> Optional[List[Dict]]:
+        """
+        Busca uma página adicional e extrai apenas a lista de ações.
+        
+        Args:
+            url (str): URL da página
+            
+        Returns:
+            Optional[List[Dict]]: Ações da página ou None se houver erro
+        """
+        response = self.make_request(url, stream=True)
+        if not response:
+            return None
+        
+        page_data = self.parse_json_stream(response, url)
+        if not page_data:
+            return None
+        
+        return page_data['stocks_data']
+    
+    def fetch_remaining_pages(self, endpoint_name: str, endpoint_info: Dict, endpoint_data: Dict) -> Dict:
+        """
+        Busca em paralelo as páginas 2..N de um endpoint e as agrega em stocks_data.
+        
+        O número de páginas é derivado de `page.totalRecords` e `page.pageSize`
+        da primeira resposta. As URLs são montadas a partir do payload do endpoint.
+        
+        Args:
+            endpoint_name (str): Nome do endpoint
+            endpoint_info (Dict): Informações do endpoint (method/payload)
+            endpoint_data (Dict): Dados já extraídos da primeira página
+            
+        Returns:
+            Dict: endpoint_data com as páginas restantes agregadas
+        """
+        metadata = endpoint_data.setdefault('metadata', {})
+        page_size = metadata.get('page_size') or Constants.PAGE_SIZE
+        total_pages = calculate_total_pages(metadata.get('total_records', 0), page_size)
+        
+        metadata['total_pages'] = total_pages
+        metadata['pages_fetched'] = 1
+        
+        if total_pages <= 1:
+            return endpoint_data
+        
+        method = endpoint_info.get('method')
+        payload = endpoint_info.get('payload')
+        if not method or not payload:
+            logger.warning(
+                f"{endpoint_name}: {total_pages} páginas disponíveis, mas o endpoint não "
+                f"possui payload configurado. Apenas a primeira página será utilizada."
+            )
+            return endpoint_data
+        
+        page_numbers = list(range(2, total_pages + 1))
+        urls = [build_endpoint_url(method, payload, page_number) for page_number in page_numbers]
+        logger.info(f"{endpoint_name}: buscando {len(urls)} páginas adicionais...")
+        
+        workers = min(Constants.MAX_CONCURRENT_REQUESTS, len(urls))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pages = list(executor.map(self.fetch_page_stocks, urls))
+        
+        # Agregar na ordem das páginas
+        failed_pages = []
+        for page_number, page_stocks in zip(page_numbers, pages):
+            if page_stocks is None:
+                failed_pages.append(page_number)
+                continue
+            endpoint_data['stocks_data'].extend(page_stocks)
+            metadata['pages_fetched'] += 1
+        
+        metadata['stocks_count'] = len(endpoint_data['stocks_data'])
+        if failed_pages:
+            metadata['pages_failed'] = failed_pages
+            logger.warning(f"⚠️ {endpoint_name}: falha nas páginas {failed_pages}, dados incompletos")
+        
+        return endpoint_data
+    
+    def save_endpoint_data(self, endpoint_name: str, endpoint_data: Dict,
+                           filename: Optional[str] = None) -> bool:
         """
         Salva os dados de um endpoint em arquivo JSON.
         """
@@ -106,7 +292,7 @@ class B3Scraper:
             logger.error(f"Dados inválidos para endpoint {endpoint_name}")
             return False
         
-        filename = get_filename_for_endpoint(endpoint_name)
+        filename = filename or get_filename_for_endpoint(endpoint_name)
         return save_json_data(endpoint_data, filename)
     
     def process_single_endpoint(self, endpoint_name: str, endpoint_info: Dict) -> Optional[Dict]:
@@ -122,27 +308,49 @@ class B3Scraper:
         """
         logger.info(f"Processando {endpoint_info['description']}...")
         
-        # Fazer requisição
-        response = self.make_request(endpoint_info['url'])
+        # Fazer requisição (corpo lido em streaming)
+        response = self.make_request(endpoint_info['url'], stream=True)
         if not response:
             logger.warning(f"Falha na requisição para {endpoint_name}")
             return None
         
-        # Fazer parsing dos dados JSON
-        endpoint_data = self.parse_json_content(response.text, endpoint_info['url'])
+        # Conteúdo inalterado: reutilizar o arquivo já salvo, sem parsing nem regravação
+        if getattr(response, 'from_cache', False) is True:
+            filename = endpoint_info.get('filename') or get_filename_for_endpoint(endpoint_name)
+            previous_data = load_json_data(filename)
+            if previous_data and previous_data.get('stocks_data'):
+                previous_data['not_modified'] = True
+                logger.info(f"♻️ {endpoint_name}: sem alterações desde a última coleta")
+                return previous_data
+        
+        # Fazer parsing dos dados JSON em streaming
+        endpoint_data = self.parse_json_stream(response, endpoint_info['url'])
         
         if not endpoint_data:
             logger.warning(f"Nenhum dado extraído para {endpoint_name}")
             return None
         
+        # Buscar páginas restantes quando totalRecords excede a primeira página
+        self.fetch_remaining_pages(endpoint_name, endpoint_info, endpoint_data)
+        
         # Adicionar informações do endpoint
         endpoint_data['endpoint_description'] = endpoint_info['description']
+        if 'index' in endpoint_info:
+            endpoint_data['index'] = endpoint_info['index']
+        
+        stocks_count = len(endpoint_data.get('stocks_data', []))
+        
+        # Pipeline em memória: nada é gravado em disco
+        if not self.persist_raw:
+            logger.info(f"✅ {endpoint_name}: {stocks_count} ações mantidas em memória")
+            return endpoint_data
         
         # Salvar dados do endpoint em arquivo individual
-        save_success = self.save_endpoint_data(endpoint_name, endpoint_data)
+        save_success = self.save_endpoint_data(
+            endpoint_name, endpoint_data, endpoint_info.get('filename')
+        )
         
         # Log simples do resultado
-        stocks_count = len(endpoint_data.get('stocks_data', []))
         if save_success:
             logger.info(f"✅ {endpoint_name}: {stocks_count} ações salvas")
         else:
@@ -150,10 +358,49 @@ class B3Scraper:
         
         return endpoint_data
     
-    def run_scraping(self) -> Dict:
+    def fetch_all_endpoints(self, concurrent: bool = False,
+                            max_workers: Optional[int] = None) -> Dict[str, Optional[Dict]]:
+        """
+        Processa todos os endpoints configurados, em sequência ou em paralelo.
+        
+        No modo concorrente as requisições compartilham a mesma sessão HTTP
+        (e seu pool de conexões), limitadas a `max_workers` simultâneas.
+        
+        Args:
+            concurrent (bool): Se deve processar os endpoints em paralelo
+            max_workers (Optional[int]): Máximo de requisições simultâneas
+                (padrão: Constants.MAX_CONCURRENT_REQUESTS)
+            
+        Returns:
+            Dict[str, Optional[Dict]]: Dados de cada endpoint, na ordem de ENDPOINTS_CONFIG
+        """
+        endpoints = list(ENDPOINTS_CONFIG.items())
+        
+        if not concurrent:
+            return {
+                name: self.process_single_endpoint(name, info)
+                for name, info in endpoints
+            }
+        
+        workers = max_workers or Constants.MAX_CONCURRENT_REQUESTS
+        logger.info(f"Modo concorrente: até {workers} requisições simultâneas")
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # map preserva a ordem dos endpoints, mantendo o resultado idêntico ao sequencial
+            results = executor.map(lambda item: self.process_single_endpoint(*item), endpoints)
+            return {name: data for (name, _), data in zip(endpoints, results)}
+    
+    def run_scraping(self, concurrent: bool = False, max_workers: Optional[int] = None) -> Dict:
         """
         Executa o processo completo de scraping para todos os endpoints disponíveis.
         
+        Com persist_raw=False nenhum arquivo é gravado; o resultado pode ser
+        entregue ao processador Parquet via build_columnar_batches.
+        
+        Args:
+            concurrent (bool): Se deve buscar os endpoints em paralelo
+            max_workers (Optional[int]): Máximo de requisições simultâneas no modo concorrente
+        
         Returns:
             Dict: Dados extraídos de todas as páginas
         """
@@ -166,12 +413,16 @@ class B3Scraper:
             'metadata': {}
         }
         
-        # Lista para armazenar nomes dos arquivos salvos
+        # Listas de arquivos salvos e de endpoints sem alterações (cache HTTP)
         saved_files = []
+        unchanged_files = []
+        
+        # Buscar todos os endpoints (sequencial ou concorrente)
+        endpoints_results = self.fetch_all_endpoints(concurrent, max_workers)
         
-        # Processar cada endpoint
-        for endpoint_name, endpoint_info in ENDPOINTS_CONFIG.items():
-            endpoint_data = self.process_single_endpoint(endpoint_name, endpoint_info)
+        # Consolidar na ordem de ENDPOINTS_CONFIG
+        for endpoint_name, endpoint_data in endpoints_results.items():
+            endpoint_info = ENDPOINTS_CONFIG[endpoint_name]
             
             if endpoint_data:
                 all_data['endpoints'][endpoint_name] = endpoint_data
@@ -183,9 +434,12 @@ class B3Scraper:
                     stock['endpoint_description'] = endpoint_info['description']
                 all_data['combined_stocks'].extend(endpoint_stocks)
                 
-                # Adicionar arquivo à lista de salvos
+                # Adicionar arquivo à lista de salvos (ou de inalterados)
                 filename = get_filename_for_endpoint(endpoint_name)
-                saved_files.append(filename)
+                if endpoint_data.get('not_modified'):
+                    unchanged_files.append(filename)
+                elif self.persist_raw:
+                    saved_files.append(filename)
         
         # Metadata consolidada simples
         all_data['metadata'] = {
@@ -194,18 +448,25 @@ class B3Scraper:
             'extraction_date': format_timestamp()[:10],  # Só a data YYYY-MM-DD
             'pageSize_used': Constants.PAGE_SIZE,
             'individual_files_saved': saved_files,
+            'unchanged_files': unchanged_files,
             'endpoints_summary': {
                 name: len(data.get('stocks_data', []))
                 for name, data in all_data['endpoints'].items()
             }
         }
         
-        # Salvar dados consolidados
+        # Salvar dados consolidados (apenas se algum endpoint mudou)
         if all_data['combined_stocks']:
             from .config import FileConfig
-            consolidated_success = save_json_data(all_data, FileConfig.CONSOLIDATED_FILENAME)
-            if consolidated_success:
-                saved_files.append(FileConfig.CONSOLIDATED_FILENAME)
+            if not self.persist_raw:
+                logger.info("Consolidado mantido em memória (persist_raw=False)")
+            elif saved_files:
+                consolidated_success = save_json_data(all_data, FileConfig.CONSOLIDATED_FILENAME)
+                if consolidated_success:
+                    saved_files.append(FileConfig.CONSOLIDATED_FILENAME)
+            else:
+                unchanged_files.append(FileConfig.CONSOLIDATED_FILENAME)
+                logger.info("♻️ Nenhum endpoint alterado, consolidado mantido")
             
             logger.info("Scraping concluído com sucesso!")
             logger.info(f"📁 Arquivos salvos: {len(saved_files)} arquivos")
@@ -214,6 +475,80 @@ class B3Scraper:
         
         return all_data
 
+    
+    def run_multi_index_scraping(self, indices: Optional[List[str]] = None,
+                                 max_workers: Optional[int] = None) -> Dict:
+        """
+        Executa o scraping de vários índices da B3 em uma única execução.
+        
+        Todas as combinações índice × endpoint são agendadas no mesmo pool de
+        threads, compartilhando a sessão HTTP (conexões limitadas por host).
+        Cada combinação é salva em um arquivo próprio em FileConfig.DATA_DIR.
+        
+        Args:
+            indices (Optional[List[str]]): Códigos dos índices (padrão: IndexConfig.DEFAULT_INDICES)
+            max_workers (Optional[int]): Máximo de tarefas simultâneas
+                (padrão: Constants.MAX_CONCURRENT_REQUESTS)
+            
+        Returns:
+            Dict: Dados extraídos agrupados por índice e endpoint
+        """
+        indices = [index.upper() for index in (indices or IndexConfig.DEFAULT_INDICES)]
+        workers = max_workers or Constants.MAX_CONCURRENT_REQUESTS
+        
+        tasks = [
+            (index, endpoint_name, endpoint_info)
+            for index in indices
+            for endpoint_name, endpoint_info in build_index_endpoints(index).items()
+        ]
+        logger.info(f"Iniciando scraping multi-índice: {len(indices)} índices, "
+                    f"{len(tasks)} requisições, até {workers} simultâneas")
+        
+        all_data = {
+            'timestamp': format_timestamp(),
+            'indices': {},
+            'metadata': {}
+        }
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lambda task: self.process_single_endpoint(task[1], task[2]), tasks))
+        
+        saved_files = []
+        unchanged_files = []
+        failed = []
+        for (index, endpoint_name, endpoint_info), endpoint_data in zip(tasks, results):
+            index_entry = all_data['indices'].setdefault(index, {'endpoints': {}, 'stocks_count': 0})
+            
+            if not endpoint_data:
+                failed.append(f"{index}/{endpoint_name}")
+                continue
+            
+            index_entry['endpoints'][endpoint_name] = endpoint_data
+            index_entry['stocks_count'] += len(endpoint_data.get('stocks_data', []))
+            if endpoint_data.get('not_modified'):
+                unchanged_files.append(endpoint_info['filename'])
+            elif self.persist_raw:
+                saved_files.append(endpoint_info['filename'])
+        
+        all_data['metadata'] = {
+            'total_indices': len(indices),
+            'total_endpoints_processed': len(tasks) - len(failed),
+            'total_endpoints_failed': len(failed),
+            'failed_endpoints': failed,
+            'total_stocks': sum(entry['stocks_count'] for entry in all_data['indices'].values()),
+            'extraction_date': format_timestamp()[:10],
+            'individual_files_saved': saved_files,
+            'unchanged_files': unchanged_files,
+            'indices_summary': {
+                index: {name: len(data.get('stocks_data', [])) for name, data in entry['endpoints'].items()}
+                for index, entry in all_data['indices'].items()
+            }
+        }
+        
+        logger.info(f"Scraping multi-índice concluído: {all_data['metadata']['total_stocks']} registros, "
+                    f"{len(failed)} falhas")
+        return all_data
+
 
 def display_summary(data: Dict) -> None:
     """
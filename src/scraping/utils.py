@@ -3,15 +3,213 @@ Funções auxiliares para o scraping dos dados da B3.
 Contém helpers para parsing, validação, manipulação de arquivos e formatação.
 """
 
+import base64
+import codecs
+import dataclasses
+import gzip
+import io
 import json
+import math
 import os
 from datetime import datetime
-from typing import Dict, List, Optional, Any
-from .config import FileConfig, Constants, setup_logger
+from typing import Dict, Iterable, Iterator, List, Optional, Any, Union
+
+import pyarrow as pa
+from .config import B3Endpoints, ENDPOINTS_CONFIG, FileConfig, Constants, setup_logger
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 # Configurar logger
 logger = setup_logger(__name__)
 
+# =============================================================================
+# CODEC JSON (BACKEND RÁPIDO OPCIONAL)
+# =============================================================================
+
+class StdlibJsonCodec:
+    """
+    Codec JSON baseado na biblioteca padrão (sempre disponível).
+    """
+    
+    name = 'json'
+    
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return json.loads(data)
+    
+    def dumps(self, obj: Any, pretty: bool = False) -> bytes:
+        indent = Constants.JSON_INDENT if pretty else None
+        separators = None if pretty else (',', ':')
+        return json.dumps(obj, ensure_ascii=False, indent=indent,
+                          separators=separators).encode(Constants.DEFAULT_ENCODING)
+
+
+class OrjsonCodec(StdlibJsonCodec):
+    """
+    Codec JSON baseado em orjson (saída UTF-8, indentação fixa de 2 espaços).
+    """
+    
+    name = 'orjson'
+    
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return orjson.loads(data)
+    
+    def dumps(self, obj: Any, pretty: bool = False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+
+
+class MsgspecCodec(StdlibJsonCodec):
+    """
+    Codec JSON baseado em msgspec.
+    """
+    
+    name = 'msgspec'
+    
+    def __init__(self):
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+    
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return self._decoder.decode(data)
+    
+    def dumps(self, obj: Any, pretty: bool = False) -> bytes:
+        encoded = self._encoder.encode(obj)
+        return msgspec.json.format(encoded, indent=Constants.JSON_INDENT) if pretty else encoded
+
+
+# Ordem de preferência na seleção automática
+JSON_BACKENDS = {
+    'orjson': (OrjsonCodec, lambda: orjson is not None),
+    'msgspec': (MsgspecCodec, lambda: msgspec is not None),
+    'json': (StdlibJsonCodec, lambda: True)
+}
+
+_json_codec = None
+
+def get_json_codec(backend: Optional[str] = None) -> StdlibJsonCodec:
+    """
+    Retorna o codec JSON a ser usado no parsing e na serialização.
+    
+    Sem `backend`, usa a variável B3_JSON_BACKEND ou seleciona automaticamente
+    o backend mais rápido instalado (orjson > msgspec > json).
+    Todos os codecs lançam ValueError para JSON inválido.
+    
+    Args:
+        backend (Optional[str]): Nome do backend ('orjson', 'msgspec' ou 'json')
+        
+    Returns:
+        StdlibJsonCodec: Codec selecionado
+    """
+    global _json_codec
+    
+    if backend is None and _json_codec is not None:
+        return _json_codec
+    
+    requested = backend or os.getenv('B3_JSON_BACKEND')
+    candidates = [requested] if requested else list(JSON_BACKENDS)
+    
+    codec = None
+    for name in candidates:
+        codec_class, available = JSON_BACKENDS.get(name, (None, lambda: False))
+        if available():
+            codec = codec_class()
+            break
+    
+    if codec is None:
+        logger.warning(f"Backend JSON '{requested}' indisponível, usando json da biblioteca padrão")
+        codec = StdlibJsonCodec()
+    
+    if backend is None:
+        _json_codec = codec
+        logger.info(f"Backend JSON selecionado: {codec.name}")
+    return codec
+
+# =============================================================================
+# DECODIFICAÇÃO TIPADA DO SCHEMA DE AÇÕES DA B3
+# =============================================================================
+
+if msgspec is not None:
+    class B3StockRecord(msgspec.Struct):
+        """Registro de ação da B3 decodificado diretamente do JSON da API."""
+        codigo: Optional[str] = msgspec.field(name='cod', default='')
+        acao: Optional[str] = msgspec.field(name='asset', default='')
+        setor: Optional[str] = msgspec.field(name='sectorName', default='')
+        subsetor: Optional[str] = msgspec.field(name='subSectorName', default='')
+        segmento: Optional[str] = msgspec.field(name='segment', default='')
+        part_percent: Union[str, float, None] = msgspec.field(name='part', default=0)
+        part_accumulated: Union[str, float, None] = msgspec.field(name='partAcum', default=0)
+        theoretical_qty: Union[str, float, None] = msgspec.field(name='theoricalQty', default=0)
+    
+    class _B3Response(msgspec.Struct):
+        results: List[B3StockRecord] = []
+    
+    _b3_response_decoder = msgspec.json.Decoder(_B3Response)
+else:
+    @dataclasses.dataclass
+    class B3StockRecord:
+        """Registro de ação da B3 (fallback sem msgspec)."""
+        codigo: Optional[str] = ''
+        acao: Optional[str] = ''
+        setor: Optional[str] = ''
+        subsetor: Optional[str] = ''
+        segmento: Optional[str] = ''
+        part_percent: Union[str, float, None] = 0
+        part_accumulated: Union[str, float, None] = 0
+        theoretical_qty: Union[str, float, None] = 0
+    
+    _b3_response_decoder = None
+
+def decode_stock_records(content: Union[str, bytes]) -> List[B3StockRecord]:
+    """
+    Decodifica o array `results` de uma resposta da B3 direto em B3StockRecord.
+    
+    Com msgspec, a conversão e a validação de tipos acontecem no próprio
+    decoder, sem dicionários intermediários; sem ele, usa o codec padrão
+    e parse_stock_data.
+    
+    Args:
+        content (Union[str, bytes]): Corpo da resposta
+        
+    Returns:
+        List[B3StockRecord]: Registros tipados
+        
+    Raises:
+        ValueError: Se o conteúdo for inválido
+    """
+    if _b3_response_decoder is not None:
+        return _b3_response_decoder.decode(content).results
+    
+    data = get_json_codec().loads(content)
+    if not isinstance(data, dict):
+        raise ValueError("Resposta JSON não é um objeto")
+    return [B3StockRecord(**parse_stock_data(stock)) for stock in data.get('results', [])]
+
+def stock_record_to_dict(record: B3StockRecord) -> Dict[str, Any]:
+    """
+    Converte um B3StockRecord no dicionário padronizado de parse_stock_data.
+    
+    Args:
+        record (B3StockRecord): Registro tipado
+        
+    Returns:
+        Dict[str, Any]: Dados padronizados da ação
+    """
+    if msgspec is not None:
+        return msgspec.structs.asdict(record)
+    return dataclasses.asdict(record)
+
 # =============================================================================
 # FUNÇÕES DE PARSING E VALIDAÇÃO
 # =============================================================================
@@ -37,6 +235,88 @@ def parse_stock_data(stock: Dict) -> Dict[str, Any]:
         'theoretical_qty': stock.get('theoricalQty', 0)
     }
 
+# Campos padronizados: (coluna, chave na API, valor padrão, tipo numérico)
+# Os campos numéricos ('decimal' ou 'integer'; None = texto) chegam como
+# texto no formato brasileiro ("8,123", "1.234.567") e são convertidos pelo
+# processador Parquet.
+STOCK_FIELDS = (
+    ('codigo', 'cod', '', None),
+    ('acao', 'asset', '', None),
+    ('setor', 'sectorName', '', None),
+    ('subsetor', 'subSectorName', '', None),
+    ('segmento', 'segment', '', None),
+    ('part_percent', 'part', None, 'decimal'),
+    ('part_accumulated', 'partAcum', None, 'decimal'),
+    ('theoretical_qty', 'theoricalQty', None, 'integer')
+)
+
+# Schema fixo dos lotes Arrow gerados por extract_stocks_to_record_batch
+STOCK_RECORD_BATCH_SCHEMA = pa.schema([(name, pa.string()) for name, _, _, _ in STOCK_FIELDS])
+
+def _format_stock_number(value: Any, integer: bool = False) -> str:
+    """
+    Converte um valor numérico da API em texto que o processador Parquet
+    interpreta com o mesmo valor numérico.
+    
+    O processador trata '.' como separador de milhares nos campos inteiros,
+    então floats inteiros (e qualquer float de campo inteiro, truncado como
+    no processador) são escritos sem ponto decimal: 1000.0 -> "1000".
+    
+    Args:
+        value (Any): Valor não textual (int, float...)
+        integer (bool): Se o campo de destino é inteiro
+        
+    Returns:
+        str: Valor formatado
+    """
+    if isinstance(value, float) and math.isfinite(value) and (integer or value.is_integer()):
+        return str(math.trunc(value))
+    return str(value)
+
+def extract_stocks_to_record_batch(data_response: Dict) -> pa.RecordBatch:
+    """
+    Extrai as ações da resposta da API diretamente para um RecordBatch Arrow.
+    
+    Preenche um array por campo em uma única passada sobre `results`, sem
+    criar um dict por ação. Alternativa colunar a extract_stocks_from_response:
+    os campos de texto são idênticos; os numéricos são mantidos como texto
+    (valores não textuais são formatados por _format_stock_number) e ausentes
+    viram nulos, que o processador trata como 0.
+    
+    Args:
+        data_response (Dict): Resposta completa da API
+        
+    Returns:
+        pa.RecordBatch: Ações no schema STOCK_RECORD_BATCH_SCHEMA
+    """
+    columns = [[] for _ in STOCK_FIELDS]
+    
+    if 'results' not in data_response:
+        logger.warning("Campo 'results' não encontrado na resposta")
+        return pa.RecordBatch.from_arrays(
+            [pa.array([], type=pa.string()) for _ in columns], schema=STOCK_RECORD_BATCH_SCHEMA
+        )
+    
+    text_fields = [(column.append, key, default)
+                   for column, (_, key, default, kind) in zip(columns, STOCK_FIELDS) if kind is None]
+    numeric_fields = [(column.append, key, kind == 'integer')
+                      for column, (_, key, _, kind) in zip(columns, STOCK_FIELDS) if kind is not None]
+    
+    for stock in data_response['results']:
+        if not isinstance(stock, dict):
+            logger.warning(f"Erro ao processar ação: registro inválido ({type(stock).__name__})")
+            continue
+        get = stock.get
+        for append, key, default in text_fields:
+            append(get(key, default))
+        for append, key, integer in numeric_fields:
+            value = get(key)
+            append(value if value is None or value.__class__ is str else _format_stock_number(value, integer))
+    
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=pa.string()) for values in columns], schema=STOCK_RECORD_BATCH_SCHEMA
+    )
+
 def validate_json_response(json_content: str) -> Optional[Dict]:
     """
     Valida e converte conteúdo JSON.
@@ -48,25 +328,31 @@ def validate_json_response(json_content: str) -> Optional[Dict]:
         Optional[Dict]: Dados JSON parseados ou None se inválido
     """
     try:
-        data = json.loads(json_content)
+        data = get_json_codec().loads(json_content)
         if not isinstance(data, dict):
             logger.warning("JSON response is not a dictionary")
             return None
         return data
-    except json.JSONDecodeError as e:
+    except ValueError as e:
         logger.error(f"Erro ao fazer parse do JSON: {e}")
         return None
 
-def extract_stocks_from_response(data_response: Dict) -> List[Dict]:
+def extract_stocks_from_response(data_response: Dict,
+                                 as_record_batch: bool = False) -> Union[List[Dict], pa.RecordBatch]:
     """
     Extrai lista de ações da resposta da API.
     
     Args:
         data_response (Dict): Resposta completa da API
+        as_record_batch (bool): Se deve retornar um RecordBatch Arrow
+            (ver extract_stocks_to_record_batch) em vez da lista de dicts
         
     Returns:
-        List[Dict]: Lista de ações extraídas e padronizadas
+        Union[List[Dict], pa.RecordBatch]: Ações extraídas e padronizadas
     """
+    if as_record_batch:
+        return extract_stocks_to_record_batch(data_response)
+    
     stocks_data = []
     
     if 'results' not in data_response:
@@ -84,6 +370,223 @@ def extract_stocks_from_response(data_response: Dict) -> List[Dict]:
     
     return stocks_data
 
+class _JsonStreamReader:
+    """
+    Leitor incremental de JSON sobre um iterável de bytes.
+    
+    Mantém apenas o trecho ainda não consumido em memória e usa
+    json.JSONDecoder.raw_decode para decodificar um valor por vez.
+    """
+    
+    _WHITESPACE = ' \t\n\r'
+    _DELIMITERS = _WHITESPACE + ',:]}'
+    
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder(Constants.DEFAULT_ENCODING)()
+        self._json = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+    
+    def _fill(self) -> bool:
+        """Lê o próximo bloco; retorna False no fim do stream."""
+        if self._eof:
+            return False
+        # Descartar o trecho já consumido para manter a memória constante
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+        for chunk in self._chunks:
+            if chunk:
+                self._buffer += self._decoder.decode(chunk)
+                return True
+        self._buffer += self._decoder.decode(b'', final=True)
+        self._eof = True
+        return False
+    
+    def peek(self) -> str:
+        """Retorna o próximo caractere não-branco (sem consumir) ou '' no fim."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in self._WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+    
+    def expect(self, chars: str) -> str:
+        """Consome o próximo caractere, que deve estar em `chars`."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"JSON inválido: esperado um de {chars!r}, encontrado {char!r}")
+        self._pos += 1
+        return char
+    
+    def value(self) -> Any:
+        """Decodifica o próximo valor JSON completo."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buffer, self._pos)
+                # Um valor só está completo se seguido de um delimitador
+                # (números no fim do buffer podem continuar no próximo bloco)
+                if self._eof or (end < len(self._buffer) and self._buffer[end] in self._DELIMITERS):
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            if not self._fill() and self._pos >= len(self._buffer):
+                raise ValueError("JSON inválido: fim inesperado do conteúdo")
+
+
+def iter_json_results(chunks: Iterable[bytes], envelope: Dict, field: str = 'results') -> Iterator[Dict]:
+    """
+    Decodifica incrementalmente os itens do array `field` de uma resposta JSON.
+    
+    Os demais campos de primeiro nível (ex.: 'page') são gravados em `envelope`
+    à medida que aparecem, e `envelope[field]` recebe a quantidade de itens;
+    após o consumo completo, o envelope está completo.
+    O conteúdo nunca é materializado inteiro em memória.
+    
+    Args:
+        chunks (Iterable[bytes]): Blocos de bytes (ex.: response.iter_content())
+        envelope (Dict): Dicionário que recebe os campos de primeiro nível
+        field (str): Campo do array a ser transmitido item a item
+        
+    Yields:
+        Dict: Cada item do array
+        
+    Raises:
+        ValueError: Se o conteúdo não for um objeto JSON válido
+    """
+    reader = _JsonStreamReader(chunks)
+    reader.expect('{')
+    if reader.peek() == '}':
+        reader.expect('}')
+        return
+    
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        
+        if key == field and reader.peek() == '[':
+            envelope[field] = 0
+            reader.expect('[')
+            if reader.peek() != ']':
+                while True:
+                    yield reader.value()
+                    envelope[field] += 1
+                    if reader.expect(',]') == ']':
+                        break
+            else:
+                reader.expect(']')
+        else:
+            envelope[key] = reader.value()
+        
+        if reader.expect(',}') == '}':
+            break
+
+def extract_stocks_from_stream(chunks: Iterable[bytes], envelope: Dict) -> Iterator[Dict]:
+    """
+    Versão em streaming de extract_stocks_from_response.
+    
+    Args:
+        chunks (Iterable[bytes]): Blocos de bytes da resposta
+        envelope (Dict): Recebe os campos de primeiro nível (ex.: 'page')
+        
+    Yields:
+        Dict: Dados padronizados de cada ação
+    """
+    for stock in iter_json_results(chunks, envelope):
+        try:
+            yield parse_stock_data(stock)
+        except Exception as e:
+            logger.warning(f"Erro ao processar ação: {e}")
+    
+    if 'results' not in envelope:
+        logger.warning("Campo 'results' não encontrado na resposta")
+
+# =============================================================================
+# FUNÇÕES DE PAYLOAD E PAGINAÇÃO
+# =============================================================================
+
+def encode_payload(payload: Dict) -> str:
+    """
+    Codifica o payload JSON no formato base64 esperado pela API da B3.
+    
+    Args:
+        payload (Dict): Payload da requisição (a ordem das chaves é preservada)
+        
+    Returns:
+        str: Payload serializado em JSON compacto e codificado em base64
+    """
+    payload_json = json.dumps(payload, separators=(',', ':'), ensure_ascii=False)
+    return base64.b64encode(payload_json.encode(Constants.DEFAULT_ENCODING)).decode('ascii')
+
+def build_endpoint_url(method: str, payload: Dict, page_number: Optional[int] = None) -> str:
+    """
+    Monta a URL de um endpoint da B3 a partir do método e do payload.
+    
+    Args:
+        method (str): Método da API (ex.: GetPortfolioDay)
+        payload (Dict): Payload base da requisição
+        page_number (Optional[int]): Página desejada (padrão: a do payload)
+        
+    Returns:
+        str: URL completa com o payload codificado
+    """
+    if page_number is not None:
+        payload = {**payload, 'pageNumber': page_number}
+    return f"{B3Endpoints.BASE_URL}/{method}/{encode_payload(payload)}"
+
+def build_index_endpoints(index: str, endpoints_config: Optional[Dict] = None) -> Dict[str, Dict]:
+    """
+    Gera a configuração dos endpoints para um índice específico da B3.
+    
+    Substitui o campo 'index' do payload de cada endpoint e reconstrói a URL,
+    o nome do arquivo e a descrição correspondentes.
+    
+    Args:
+        index (str): Código do índice (ex.: IBOV, SMLL, IDIV)
+        endpoints_config (Optional[Dict]): Configuração base (padrão: ENDPOINTS_CONFIG)
+        
+    Returns:
+        Dict[str, Dict]: Endpoints configurados para o índice
+    """
+    if endpoints_config is None:
+        endpoints_config = ENDPOINTS_CONFIG
+    
+    index = index.upper()
+    index_endpoints = {}
+    for endpoint_name, endpoint_info in endpoints_config.items():
+        payload = {**endpoint_info['payload'], 'index': index}
+        index_endpoints[endpoint_name] = {
+            **endpoint_info,
+            'url': build_endpoint_url(endpoint_info['method'], payload),
+            'payload': payload,
+            'index': index,
+            'description': f"{index} - {endpoint_info['description']}",
+            'filename': get_filename_for_index_endpoint(index, endpoint_name)
+        }
+    
+    return index_endpoints
+
+def calculate_total_pages(total_records: int, page_size: int) -> int:
+    """
+    Calcula o número de páginas necessárias para cobrir todos os registros.
+    
+    Args:
+        total_records (int): Total de registros informado pela API
+        page_size (int): Tamanho de página utilizado
+        
+    Returns:
+        int: Número total de páginas (mínimo 1)
+    """
+    if not total_records or not page_size or page_size <= 0:
+        return 1
+    return max(1, math.ceil(total_records / page_size))
+
 # =============================================================================
 # FUNÇÕES DE MANIPULAÇÃO DE ARQUIVOS
 # =============================================================================
@@ -118,22 +621,213 @@ def get_full_file_path(filename: str) -> str:
     ensure_directory_exists(FileConfig.DATA_DIR)
     return os.path.join(FileConfig.DATA_DIR, filename)
 
+# =============================================================================
+# FORMATO DE CAPTURA BRUTA (NDJSON COMPRIMIDO)
+# =============================================================================
+
+RAW_CAPTURE_FORMAT = 'b3-raw-ndjson'
+RAW_CAPTURE_VERSION = 1
+
+def get_raw_compression() -> str:
+    """
+    Retorna a compressão efetiva da captura bruta (zstd exige zstandard).
+    
+    Returns:
+        str: 'gzip' ou 'zstd'
+    """
+    if FileConfig.RAW_COMPRESSION == 'zstd' and zstandard is None:
+        logger.warning("zstandard não instalado, usando gzip na captura bruta")
+        return 'gzip'
+    return FileConfig.RAW_COMPRESSION
+
+def get_raw_filename(filename: str) -> str:
+    """
+    Converte um nome lógico ('.json') no nome físico do formato configurado.
+    
+    Args:
+        filename (str): Nome lógico do arquivo
+        
+    Returns:
+        str: Nome do arquivo gravado em disco
+    """
+    if FileConfig.RAW_FORMAT != 'ndjson' or not filename.endswith('.json'):
+        return filename
+    return filename[:-len('.json')] + FileConfig.RAW_SUFFIXES[get_raw_compression()]
+
+def get_logical_filename(filename: str) -> str:
+    """
+    Converte um nome físico de captura bruta de volta ao nome lógico '.json'.
+    
+    Args:
+        filename (str): Nome do arquivo em disco
+        
+    Returns:
+        str: Nome lógico do arquivo
+    """
+    for suffix in FileConfig.RAW_SUFFIXES.values():
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)] + '.json'
+    return filename
+
+def _open_raw_capture(path: str, mode: str):
+    """Abre um arquivo de captura bruta com a compressão indicada pelo sufixo."""
+    if path.endswith(FileConfig.RAW_SUFFIXES['zstd']):
+        if zstandard is None:
+            raise ImportError("zstandard é necessário para arquivos .zst")
+        if mode == 'wb':
+            return zstandard.ZstdCompressor().stream_writer(open(path, 'wb'), closefd=True)
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True))
+    if mode == 'wb':
+        # mtime fixo: mesmo conteúdo gera arquivo byte a byte idêntico (hash do manifesto)
+        return gzip.GzipFile(path, mode, mtime=0)
+    return gzip.open(path, mode)
+
+def write_raw_capture(data: Dict, path: str) -> None:
+    """
+    Grava dados no formato de captura bruta: uma linha de cabeçalho seguida
+    de um registro de ação por linha, tudo comprimido.
+    
+    O cabeçalho guarda os campos não tabulares (source_url, timestamp,
+    metadata com informações de página, etc.). No consolidado, as ações de
+    cada endpoint não são repetidas: são reconstruídas a partir de
+    combined_stocks na leitura.
+    
+    Args:
+        data (Dict): Dados do endpoint ou consolidados
+        path (str): Caminho do arquivo (.ndjson.gz ou .ndjson.zst)
+    """
+    codec = get_json_codec()
+    records_field = 'combined_stocks' if 'combined_stocks' in data else 'stocks_data'
+    records = data.get(records_field) or []
+    
+    header_data = {key: value for key, value in data.items() if key != records_field}
+    endpoints_from_records = records_field == 'combined_stocks' and 'endpoints' in data
+    if endpoints_from_records:
+        header_data['endpoints'] = {
+            name: {key: value for key, value in endpoint.items() if key != 'stocks_data'}
+            for name, endpoint in data['endpoints'].items()
+        }
+    
+    header = {
+        'format': RAW_CAPTURE_FORMAT,
+        'format_version': RAW_CAPTURE_VERSION,
+        'records_field': records_field,
+        'records_count': len(records),
+        'endpoints_from_records': endpoints_from_records,
+        'data': header_data
+    }
+    
+    with _open_raw_capture(path, 'wb') as f:
+        f.write(codec.dumps(header) + b'\n')
+        for record in records:
+            f.write(codec.dumps(record) + b'\n')
+
+def is_raw_capture(path: str) -> bool:
+    """Indica se o caminho é uma captura bruta (.ndjson.gz/.ndjson.zst)."""
+    return any(str(path).endswith(suffix) for suffix in FileConfig.RAW_SUFFIXES.values())
+
+def _read_capture_header(f, path: str) -> Dict:
+    header = get_json_codec().loads(f.readline())
+    if not isinstance(header, dict) or header.get('format') != RAW_CAPTURE_FORMAT:
+        raise ValueError(f"Arquivo {path} não está no formato {RAW_CAPTURE_FORMAT}")
+    return header
+
+def read_raw_capture_header(path: str) -> Dict:
+    """
+    Lê apenas o cabeçalho de uma captura bruta (sem descomprimir os registros).
+    
+    Args:
+        path (str): Caminho do arquivo (.ndjson.gz ou .ndjson.zst)
+        
+    Returns:
+        Dict: Cabeçalho ('records_field', 'records_count', 'data', ...)
+    """
+    with _open_raw_capture(str(path), 'rb') as f:
+        return _read_capture_header(f, path)
+
+def iter_raw_capture_records(path: str) -> Iterator[Dict]:
+    """
+    Percorre os registros de uma captura bruta um a um, sem carregá-los
+    todos em memória.
+    
+    Args:
+        path (str): Caminho do arquivo (.ndjson.gz ou .ndjson.zst)
+        
+    Yields:
+        Dict: Cada registro de ação
+    """
+    codec = get_json_codec()
+    with _open_raw_capture(str(path), 'rb') as f:
+        _read_capture_header(f, path)
+        for line in f:
+            if line.strip():
+                yield codec.loads(line)
+
+def read_raw_capture(path: str) -> Dict:
+    """
+    Lê um arquivo de captura bruta e reconstrói a estrutura original.
+    
+    Args:
+        path (str): Caminho do arquivo (.ndjson.gz ou .ndjson.zst)
+        
+    Returns:
+        Dict: Mesma estrutura gravada por write_raw_capture
+        
+    Raises:
+        ValueError: Se o arquivo não estiver no formato esperado
+    """
+    codec = get_json_codec()
+    with _open_raw_capture(path, 'rb') as f:
+        header = _read_capture_header(f, path)
+        records = [codec.loads(line) for line in f if line.strip()]
+    
+    data = header['data']
+    data[header['records_field']] = records
+    
+    if header.get('endpoints_from_records'):
+        by_endpoint = {}
+        for record in records:
+            by_endpoint.setdefault(record.get('endpoint_name'), []).append(record)
+        for name, endpoint in data.get('endpoints', {}).items():
+            endpoint['stocks_data'] = by_endpoint.get(name, [])
+    
+    return data
+
+def read_raw_file(path: str) -> Dict:
+    """
+    Lê um arquivo bruto em qualquer formato suportado (captura ndjson ou JSON).
+    
+    Args:
+        path (str): Caminho do arquivo
+        
+    Returns:
+        Dict: Dados carregados
+    """
+    if is_raw_capture(path):
+        return read_raw_capture(str(path))
+    
+    with open(path, 'rb') as f:
+        return get_json_codec().loads(f.read())
+
 def save_json_data(data: Dict, filename: str) -> bool:
     """
-    Salva dados em formato JSON.
+    Salva dados no formato bruto configurado (FileConfig.RAW_FORMAT).
     
     Args:
         data (Dict): Dados a serem salvos
-        filename (str): Nome do arquivo
+        filename (str): Nome lógico do arquivo ('.json')
         
     Returns:
         bool: True se salvou com sucesso
     """
     try:
-        full_path = get_full_file_path(filename)
+        full_path = get_full_file_path(get_raw_filename(filename))
         
-        with open(full_path, 'w', encoding=Constants.DEFAULT_ENCODING) as f:
-            json.dump(data, f, ensure_ascii=False, indent=Constants.JSON_INDENT)
+        if FileConfig.RAW_FORMAT == 'ndjson':
+            write_raw_capture(data, full_path)
+        else:
+            with open(full_path, 'wb') as f:
+                f.write(get_json_codec().dumps(data, pretty=True))
         
         logger.info(f"Dados salvos em: {full_path}")
         return True
@@ -144,23 +838,23 @@ def save_json_data(data: Dict, filename: str) -> bool:
 
 def load_json_data(filename: str) -> Optional[Dict]:
     """
-    Carrega dados de um arquivo JSON.
+    Carrega dados brutos, no formato de captura ou em JSON legado.
     
     Args:
-        filename (str): Nome do arquivo
+        filename (str): Nome lógico do arquivo ('.json')
         
     Returns:
         Optional[Dict]: Dados carregados ou None se erro
     """
     try:
-        full_path = get_full_file_path(filename)
+        candidates = [get_full_file_path(get_raw_filename(filename)), get_full_file_path(filename)]
+        full_path = next((path for path in candidates if os.path.exists(path)), None)
         
-        if not os.path.exists(full_path):
-            logger.warning(f"Arquivo não encontrado: {full_path}")
+        if not full_path:
+            logger.warning(f"Arquivo não encontrado: {candidates[0]}")
             return None
         
-        with open(full_path, 'r', encoding=Constants.DEFAULT_ENCODING) as f:
-            data = json.load(f)
+        data = read_raw_file(full_path)
         
         logger.info(f"Dados carregados de: {full_path}")
         return data
@@ -332,3 +1026,97 @@ def get_filename_for_endpoint(endpoint_name: str) -> str:
         str: Nome do arquivo
     """
     return FileConfig.FILENAME_MAPPING.get(endpoint_name, f'b3_{endpoint_name}.json')
+
+def get_filename_for_index_endpoint(index: str, endpoint_name: str) -> str:
+    """
+    Retorna nome do arquivo para um par índice/endpoint (modo multi-índice).
+    
+    Args:
+        index (str): Código do índice
+        endpoint_name (str): Nome do endpoint
+        
+    Returns:
+        str: Nome do arquivo
+    """
+    return FileConfig.INDEX_FILENAME_PATTERN.format(index=index.lower(), endpoint=endpoint_name)
+
+# =============================================================================
+# LOTES COLUNARES (PIPELINE EM MEMÓRIA)
+# =============================================================================
+
+def records_to_columns(records: List[Dict]) -> Dict[str, List[Any]]:
+    """
+    Converte uma lista de registros em colunas (campo -> lista de valores).
+    
+    As colunas seguem a ordem em que os campos aparecem; campos ausentes
+    em um registro recebem None.
+    
+    Args:
+        records (List[Dict]): Registros de ações
+        
+    Returns:
+        Dict[str, List[Any]]: Valores agrupados por coluna
+    """
+    fields: Dict[str, None] = {}
+    for record in records:
+        for key in record:
+            if key not in fields:
+                fields[key] = None
+    
+    return {field: [record.get(field) for record in records] for field in fields}
+
+def _columnar_batch(source_file: str, records: List[Dict], index: Optional[str]) -> Dict[str, Any]:
+    return {
+        'source_file': source_file,
+        'index': index,
+        'num_rows': len(records),
+        'columns': records_to_columns(records)
+    }
+
+def build_columnar_batches(all_data: Dict, include_unchanged: bool = False) -> List[Dict[str, Any]]:
+    """
+    Converte o resultado do scraping em lotes colunares para o processador
+    Parquet, um por arquivo que seria gravado em disco.
+    
+    Aceita tanto o retorno de run_scraping (endpoints + consolidado) quanto
+    o de run_multi_index_scraping (endpoints agrupados por índice). Cada lote
+    usa o mesmo nome lógico do arquivo JSON correspondente, mantendo os nomes
+    dos Parquet idênticos aos do modo com arquivos.
+    
+    Args:
+        all_data (Dict): Dados retornados pelo scraper
+        include_unchanged (bool): Se deve incluir endpoints sem alterações (cache HTTP)
+        
+    Returns:
+        List[Dict[str, Any]]: Lotes com 'source_file', 'index', 'num_rows' e 'columns'
+    """
+    batches = []
+    
+    if 'indices' in all_data:
+        for index, entry in all_data['indices'].items():
+            for endpoint_name, endpoint_data in entry.get('endpoints', {}).items():
+                if endpoint_data.get('not_modified') and not include_unchanged:
+                    continue
+                batches.append(_columnar_batch(
+                    get_filename_for_index_endpoint(index, endpoint_name),
+                    endpoint_data.get('stocks_data', []), index
+                ))
+        return batches
+    
+    changed = False
+    for endpoint_name, endpoint_data in all_data.get('endpoints', {}).items():
+        if endpoint_data.get('not_modified') and not include_unchanged:
+            continue
+        changed = True
+        batches.append(_columnar_batch(
+            get_filename_for_endpoint(endpoint_name),
+            endpoint_data.get('stocks_data', []), endpoint_data.get('index')
+        ))
+    
+    # Consolidado só muda quando algum endpoint mudou
+    if all_data.get('combined_stocks') and (changed or include_unchanged):
+        batches.append(_columnar_batch(
+            FileConfig.CONSOLIDATED_FILENAME, all_data['combined_stocks'], None
+        ))
+    
+    return batches
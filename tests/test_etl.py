@@ -1,53 +1,330 @@
 #!/usr/bin/env python3
 """
 Testes para jobs ETL do Glue.
+
+As transformações são testadas no backend pandas/pyarrow, que não depende
+de Spark nem de awsglue.
 """
 
+import io
+import json
 import pytest
 import sys
 import os
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import Mock
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 # Adicionar src ao path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-# TODO: Implementar imports quando Glue estiver funcional
-# from glue.etl_job import main
-# from glue.transformations import *
+from glue.incremental_state import (
+    list_new_partitions, load_watermark, save_watermark, written_partition_prefixes
+)
+from glue.local_job import read_data_lake, run_local_job
+from glue.transformations import (
+    add_partition_columns, add_sector_rank, apply_transformations,
+    calculate_sector_aggregations, cast_numeric_columns, standardize_column_names
+)
+from glue.write_planner import estimate_row_width, rows_per_file, split_s3_path, summarize_files
+
+
+def make_records(**overrides):
+    """Registros do data lake já com as colunas de referência da partição."""
+    data = {
+        'codigo': ['PETR4', 'VALE3', 'ITUB4', 'BBDC4', 'PETR4'],
+        'acao': ['PETROBRAS', 'VALE', 'ITAU', 'BRADESCO', 'PETROBRAS'],
+        'setor': ['Petróleo', 'Mineração', 'Financeiro', 'Financeiro', 'Petróleo'],
+        'part_percent': [8.5, 10.2, 6.1, 4.3, 8.9],
+        'extraction_date': [date(2025, 8, 4)] * 4 + [date(2025, 9, 1)],
+        'year_month': ['2025-08'] * 4 + ['2025-09']
+    }
+    data.update(overrides)
+    return pd.DataFrame(data)
+
+
+def write_daily_file(root, day: date, records: pd.DataFrame):
+    """Grava um arquivo diário no layout ano=/mes=/dia= do data lake."""
+    partition = root / f"ano={day.year}" / f"mes={day.month:02d}" / f"dia={day.day:02d}"
+    partition.mkdir(parents=True, exist_ok=True)
+    pq.write_table(pa.Table.from_pandas(records, preserve_index=False),
+                   partition / f"b3_carteira_{day:%Y%m%d}.parquet")
+
 
 class TestGlueETL:
     """
     Testes para job ETL do Glue.
     """
-    
-    def test_etl_job_placeholder(self):
-        """Teste placeholder para job ETL."""
-        # TODO: Implementar quando ETL estiver funcional
-        assert True
-    
-    def test_transformations_placeholder(self):
-        """Teste placeholder para transformações."""
-        # TODO: Implementar testes de transformação
-        assert True
+
+    def test_local_job_writes_refined_partitions(self, tmp_path):
+        """Testa a execução local ponta a ponta e a substituição só das partições lidas."""
+        lake, refined = tmp_path / "data_lake", tmp_path / "refined"
+        base = make_records().drop(columns=['extraction_date', 'year_month'])
+        base['partition_date'] = date(2025, 8, 4)
+        write_daily_file(lake, date(2025, 8, 4), base.iloc[:4])
+        write_daily_file(lake, date(2025, 9, 1), base.iloc[4:])
+        (lake / "_processing_manifest.json").write_text("{}")
+
+        metrics = run_local_job(str(lake), str(refined), today=date(2025, 9, 2))
+
+        assert metrics['input_rows'] == 5
+        assert metrics['individual_rows'] == 5
+        individual = pq.read_table(refined / "individual_stocks").to_pandas()
+        assert sorted(individual['year_month'].astype(str).unique()) == ['2025-08', '2025-09']
+        assert sorted(os.listdir(refined / "sector_summary")) == ['year_month=2025-08', 'year_month=2025-09']
+
+        # Novo dia em setembro: só setembro é relido e regravado
+        write_daily_file(lake, date(2025, 9, 2), base.iloc[1:2])
+        metrics = run_local_job(str(lake), str(refined), partitions=['ano=2025/mes=09'])
+
+        assert metrics['input_rows'] == 2
+        individual = pq.read_table(refined / "individual_stocks").to_pandas()
+        assert (individual['year_month'].astype(str) == '2025-08').sum() == 4
+        assert (individual['year_month'].astype(str) == '2025-09').sum() == 2
+
+    def test_read_data_lake_uses_path_dates(self, tmp_path):
+        """Testa extraction_date/year_month pelo caminho e o fallback dos compactados."""
+        lake = tmp_path / "data_lake"
+        records = make_records().drop(columns=['extraction_date', 'year_month']).iloc[:2]
+        records['partition_date'] = date(2025, 7, 31)
+        write_daily_file(lake, date(2025, 7, 30), records)
+        monthly = lake / "ano=2025" / "mes=06"
+        monthly.mkdir(parents=True)
+        pq.write_table(pa.Table.from_pandas(records, preserve_index=False), monthly / "b3_carteira_202506.parquet")
+
+        table = read_data_lake(str(lake)).sort_by('year_month')
+
+        assert table['year_month'].to_pylist() == ['2025-06', '2025-06', '2025-07', '2025-07']
+        assert table['extraction_date'].to_pylist() == [date(2025, 7, 31)] * 2 + [date(2025, 7, 30)] * 2
 
 class TestDataTransformations:
     """
     Testes para transformações específicas.
     """
-    
-    def test_column_standardization_placeholder(self):
-        """Teste placeholder para padronização de colunas."""
-        # TODO: Implementar quando transformações estiverem prontas
-        assert True
-    
-    def test_partition_columns_placeholder(self):
-        """Teste placeholder para colunas de partição."""
-        # TODO: Implementar teste de particionamento
-        assert True
-    
-    def test_sector_aggregation_placeholder(self):
-        """Teste placeholder para agregação por setor."""
-        # TODO: Implementar teste de agregação
-        assert True
+
+    def test_column_standardization(self):
+        """Testa a renomeação das colunas, inclusive a partir de tabela Arrow."""
+        df = standardize_column_names(pa.Table.from_pandas(make_records()))
+
+        assert {'stock_code', 'company_name'} <= set(df.columns)
+        assert not {'codigo', 'acao'} & set(df.columns)
+
+    def test_partition_columns(self):
+        """Testa os campos de data derivados da data de extração."""
+        df = add_partition_columns(make_records().drop(columns=['year_month']), today=date(2025, 9, 3))
+
+        assert df['year_month'].tolist() == ['2025-08'] * 4 + ['2025-09']
+        assert df['quarter'].tolist() == [3] * 5
+        assert df['days_since_extraction'].tolist() == [30] * 4 + [2]
+
+    def test_sector_rank_per_month(self):
+        """Testa o ranking dentro do setor em cada mês."""
+        df = add_sector_rank(cast_numeric_columns(make_records(part_percent=['6,0', '1', '3.5', '7.25', '2'])))
+
+        assert df['part_percent_double'].isna().sum() == 1
+        assert df['sector_rank'].tolist() == [1, 1, 2, 1, 1]
+
+    def test_sector_aggregation(self):
+        """Testa as agregações por setor/mês/trimestre."""
+        df_individual, summary = apply_transformations(make_records(), today=date(2025, 9, 3))
+
+        financeiro = summary[(summary['setor'] == 'Financeiro') & (summary['year_month'] == '2025-08')].iloc[0]
+        assert len(summary) == 4
+        assert financeiro['total_stocks_count'] == 2
+        assert financeiro['total_sector_participation'] == pytest.approx(10.4)
+        assert financeiro['max_sector_participation'] == pytest.approx(6.1)
+        assert 'stock_code' in df_individual.columns
+        assert summary['total_stocks_count'].sum() == len(df_individual)
+
+    def test_sector_aggregation_null_sum(self):
+        """Testa que a soma de um setor sem participações válidas é nula, como no Spark."""
+        df = cast_numeric_columns(standardize_column_names(
+            add_partition_columns(make_records(part_percent=[None, 1.0, 2.0, 3.0, 4.0]))
+        ))
+
+        summary = calculate_sector_aggregations(df)
+
+        petroleo = summary[(summary['setor'] == 'Petróleo') & (summary['year_month'] == '2025-08')].iloc[0]
+        assert pd.isna(petroleo['total_sector_participation'])
+        assert petroleo['total_stocks_count'] == 1
+
+class TestWritePlanner:
+    """
+    Testes para o plano de escrita da camada refined.
+    """
+
+    def test_rows_per_file_from_row_width(self):
+        """Testa a largura estimada (tipos Spark e Arrow) e as linhas por arquivo."""
+        assert estimate_row_width(['bigint', 'double', 'date', 'string']) == 8 + 8 + 4 + 32
+        assert estimate_row_width([pa.int64(), pa.float64(), pa.date32(), pa.string(), pa.timestamp('us')]) == 60
+        assert rows_per_file(52, target_file_size_mb=1) == 1024 * 1024 // 52
+        assert rows_per_file(10 ** 9, target_file_size_mb=1) == 1
+
+    def test_summarize_files_per_partition(self):
+        """Testa o resumo de arquivos por partição, ignorando marcadores do Spark."""
+        base = 'refined/individual_stocks/'
+        files = [
+            (base + '_SUCCESS', 0),
+            (base + 'year_month=2025-08/setor=Financeiro/part-0.snappy.parquet', 2 * 1024 * 1024),
+            (base + 'year_month=2025-08/setor=Financeiro/part-1.snappy.parquet', 512),
+            (base + 'year_month=2025-08/setor=Petr%C3%B3leo/part-0.snappy.parquet', 100),
+            ('refined/sector_summary/year_month=2025-08/part-0.parquet', 100)
+        ]
+
+        summary = summarize_files(files, base)
+
+        assert list(summary) == ['year_month=2025-08/setor=Financeiro', 'year_month=2025-08/setor=Petr%C3%B3leo']
+        assert summary['year_month=2025-08/setor=Financeiro'] == {
+            'files': 2, 'bytes': 2 * 1024 * 1024 + 512, 'min_bytes': 512,
+            'max_bytes': 2 * 1024 * 1024, 'small_files': 1
+        }
+        assert split_s3_path('s3://bucket/refined//individual_stocks/') == ('bucket', 'refined/individual_stocks/')
+
+    def test_local_job_targets_file_size(self, tmp_path):
+        """Testa um arquivo por partição e a divisão quando o alvo é excedido."""
+        lake, refined = tmp_path / "data_lake", tmp_path / "refined"
+        records = pd.DataFrame({
+            'codigo': [f"TST{i}" for i in range(300)],
+            'acao': [f"EMPRESA {i}" for i in range(300)],
+            'setor': ['Financeiro', 'Petróleo', 'Mineração'] * 100,
+            'part_percent': [0.3] * 300,
+            'partition_date': date(2025, 8, 4)
+        })
+        write_daily_file(lake, date(2025, 8, 4), records)
+
+        metrics = run_local_job(str(lake), str(refined))
+
+        files = metrics['files']['individual_stocks']
+        assert len(files) == 3
+        assert all(stats['files'] == 1 for stats in files.values())
+        assert sum(stats['bytes'] for stats in files.values()) > 0
+
+        # Alvo minúsculo: cada partição é dividida em vários arquivos
+        metrics = run_local_job(str(lake), str(refined), target_file_size_mb=0.002)
+
+        files = metrics['files']['individual_stocks']
+        assert all(stats['files'] > 1 for stats in files.values())
+        assert len(pq.read_table(refined / "individual_stocks")) == 300
+
+class TestIncrementalState:
+    """
+    Testes para o watermark do processamento incremental.
+    """
+
+    class NoSuchKey(Exception):
+        pass
+
+    @classmethod
+    def make_s3_client(cls, objects, manifest_entries=None):
+        """
+        Cliente S3 simulado: a listagem filtra (chave, LastModified) por prefixo
+        e delimitador; o manifesto é devolvido por get_object, se informado.
+        """
+        def paginate(Bucket, Prefix, Delimiter=None):
+            contents = [
+                {'Key': key, 'LastModified': modified} for key, modified in objects
+                if key.startswith(Prefix) and not (Delimiter and Delimiter in key[len(Prefix):])
+            ]
+            return [{'Contents': contents}]
+
+        def get_object(Bucket, Key):
+            if manifest_entries is None:
+                raise cls.NoSuchKey(Key)
+            body = json.dumps({'manifest_version': 1, 'entries': manifest_entries}).encode()
+            return {'Body': io.BytesIO(body)}
+
+        client = Mock()
+        client.exceptions.NoSuchKey = cls.NoSuchKey
+        client.get_paginator.return_value.paginate.side_effect = paginate
+        client.get_object.side_effect = get_object
+        return client
+
+    @staticmethod
+    def listed_prefixes(client):
+        return [call.kwargs['Prefix'] for call in client.get_paginator.return_value.paginate.call_args_list]
+
+    def test_new_partitions_include_backfilled_months(self):
+        """Testa que meses anteriores ao último processado entram quando regravados."""
+        processed = datetime(2025, 8, 5, 12, tzinfo=timezone.utc)
+        later = processed + timedelta(hours=1)
+        objects = [
+            ('data_lake/_processing_manifest.json', later),
+            ('data_lake/ano=2024/b3_carteira_2024.parquet', processed),
+            ('data_lake/ano=2025/mes=03/dia=10/b3_carteira_20250310.parquet', later),
+            ('data_lake/ano=2025/mes=07/.tmp/part.parquet', later),
+            ('data_lake/ano=2025/mes=08/dia=04/b3_carteira_20250804.parquet', processed),
+            ('data_lake/ano=2025/mes=08/dia=05/b3_carteira_20250805.parquet', later - timedelta(minutes=1))
+        ]
+        manifest = {
+            'b3_carteira.json': {
+                's3_key': 'data_lake/ano=2025/mes=03/dia=10/b3_carteira_20250310.parquet',
+                'processed_at': later.isoformat()
+            },
+            'b3_antigo.json': {
+                's3_key': 'data_lake/ano=2024/mes=01/dia=02/b3_antigo_20240102.parquet',
+                'processed_at': (processed - timedelta(days=200)).isoformat()
+            }
+        }
+        client = self.make_s3_client(objects, manifest)
+        watermark = {'partition': 'ano=2025/mes=08', 'last_modified': processed.isoformat()}
+
+        partitions, new_watermark = list_new_partitions(client, 'bucket-x', watermark, now=later)
+
+        # Backfill de março vem do manifesto; agosto, da janela recente
+        assert partitions == ['ano=2025/mes=03', 'ano=2025/mes=08']
+        assert new_watermark['last_modified'] == later.isoformat()
+        assert new_watermark['partitions'] == partitions
+        # Só a janela (julho em diante) e o mês apontado pelo manifesto são listados
+        assert self.listed_prefixes(client) == [
+            'data_lake/ano=2025/', 'data_lake/ano=2025/mes=03/',
+            'data_lake/ano=2025/mes=07/', 'data_lake/ano=2025/mes=08/'
+        ]
+
+        # Nada gravado depois do novo watermark
+        assert list_new_partitions(client, 'bucket-x', new_watermark, now=later) == ([], None)
+        # Sem watermark: todas as partições, inclusive o compactado anual
+        assert list_new_partitions(client, 'bucket-x', {})[0] == [
+            'ano=2024', 'ano=2025/mes=03', 'ano=2025/mes=08'
+        ]
+
+    def test_missing_manifest_falls_back_to_full_listing(self):
+        """Testa que, sem manifesto, o data lake inteiro é listado para não perder backfills."""
+        processed = datetime(2025, 8, 5, 12, tzinfo=timezone.utc)
+        later = processed + timedelta(hours=1)
+        client = self.make_s3_client([
+            ('data_lake/ano=2025/mes=03/dia=10/b3_carteira_20250310.parquet', later)
+        ])
+
+        partitions, _ = list_new_partitions(client, 'bucket-x', {'last_modified': processed.isoformat()},
+                                            now=later)
+
+        assert partitions == ['ano=2025/mes=03']
+        assert self.listed_prefixes(client) == ['data_lake/']
+
+    def test_watermark_round_trip(self, monkeypatch):
+        """Testa leitura (vazia na primeira execução) e gravação do watermark no S3 (moto)."""
+        moto = pytest.importorskip('moto')
+        monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+        monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+        monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+
+        with moto.mock_aws():
+            import boto3
+            client = boto3.client('s3', region_name='us-east-1')
+            client.create_bucket(Bucket='bucket-x')
+            client.put_object(Bucket='bucket-x', Key='data_lake/ano=2025/mes=08/dia=04/b3_carteira_20250804.parquet',
+                              Body=b'PAR1')
+
+            assert load_watermark(client, 'bucket-x') == {}
+            partitions, watermark = list_new_partitions(client, 'bucket-x', {})
+            save_watermark(client, 'bucket-x', watermark)
+
+            assert partitions == ['ano=2025/mes=08']
+            assert load_watermark(client, 'bucket-x') == watermark
+            assert written_partition_prefixes(['ano=2024', 'ano=2025/mes=08']) == ['year_month=2024-', 'year_month=2025-08/']
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -18,6 +18,7 @@ Data: 2025-08-04
 import os
 import sys
 import pytest
+import pandas as pd
 import json
 import tempfile
 import shutil
@@ -29,7 +30,17 @@ from unittest.mock import Mock, patch
 src_path = Path(__file__).parent.parent / "src"
 sys.path.insert(0, str(src_path))
 
-from scraping.parquet_processor import B3ParquetProcessor
+from botocore.exceptions import ClientError, EndpointConnectionError, ParamValidationError
+
+from scraping.parquet_processor import (
+    B3ParquetProcessor, S3Uploader, STOCK_SCHEMA, hash_records, is_retryable_s3_error
+)
+from scraping.compaction import LakeCompactor, LocalLakeStorage, S3LakeStorage
+from scraping.processing_manifest import ProcessingManifest
+from scraping.utils import (
+    write_raw_capture, build_columnar_batches, extract_stocks_from_response,
+    extract_stocks_to_record_batch
+)
 
 
 class TestS3Pipeline:
@@ -180,6 +191,55 @@ class TestS3Pipeline:
         invalid_data = {'stocks_data': []}
         assert processor.validate_stock_data(invalid_data) is False
 
+    def test_clean_filters_once_without_mutating_input(self, temp_dirs):
+        """Testa a máscara única (vazios, obrigatórios, duplicatas) sem alterar a entrada."""
+        input_dir, output_dir = temp_dirs
+        processor = B3ParquetProcessor(input_path=input_dir, output_path=output_dir,
+                                       upload_to_s3=False)
+        df = pd.DataFrame({
+            'codigo': ['PETR4', None, 'VALE3', None, 'PETR4', 'ITUB4'],
+            'acao': ['PETROBRAS', 'SEM CODIGO', None, None, 'DUPLICADA', 'ITAU'],
+            'part_percent': ['8,5', '1,0', '2,0', None, '9,9', '3,1']
+        })
+        original = df.copy()
+        
+        df_clean, report = processor.clean_and_validate_dataframe(df)
+        df_final = processor.add_processing_metadata(df_clean, 'origem.json')
+        
+        assert df_clean['codigo'].tolist() == ['PETR4', 'ITUB4']
+        assert df_clean['part_percent'].tolist() == [8.5, 3.1]
+        assert report['invalid_records_removed'] == 2
+        assert report['final_records'] == 2
+        pd.testing.assert_frame_equal(df, original)
+        assert 'record_hash' not in df_clean.columns
+        assert df_final['source_file'].tolist() == ['origem.json'] * 2
+        expected_hash = pd.util.hash_pandas_object(df_clean[['codigo', 'acao', 'part_percent']], index=False)
+        assert df_final['record_hash'].tolist() == expected_hash.tolist()
+        # Hash em fatias é idêntico ao cálculo de uma vez
+        assert hash_records(df_clean, slice_rows=1).tolist() == expected_hash.tolist()
+    
+    def test_brazilian_number_conversion(self, temp_dirs):
+        """Testa conversão vetorizada de números brasileiros e contagem de falhas."""
+        input_dir, output_dir = temp_dirs
+        processor = B3ParquetProcessor(
+            input_path=input_dir,
+            output_path=output_dir,
+            upload_to_s3=False
+        )
+        df = pd.DataFrame({
+            'codigo': ['A', 'B', 'C', 'D', 'E'],
+            'acao': ['A', 'B', 'C', 'D', 'E'],
+            'part_percent': ['8,123', '1.234,56', None, 'n/d', 11.5],
+            'theoretical_qty': ['1.234.567', '500', 7, '-', None]
+        })
+        
+        df_clean, report = processor.clean_and_validate_dataframe(df)
+        
+        assert df_clean['part_percent'].tolist() == [8.123, 1234.56, 0.0, 0.0, 11.5]
+        assert df_clean['theoretical_qty'].tolist() == [1234567, 500, 7, 0, 0]
+        assert df_clean['theoretical_qty'].dtype == 'int64'
+        assert report['conversion_errors'] == 2
+
     @patch('scraping.parquet_processor.boto3.client')
     def test_s3_upload_success(self, mock_boto3, temp_dirs):
         """Testa upload bem-sucedido para S3 (mock)."""
@@ -227,10 +287,688 @@ class TestS3Pipeline:
         assert results['summary']['successful'] == 1
         assert results['summary']['total_records'] == 2
 
+    def test_process_all_files_reads_raw_capture(self, temp_dirs):
+        """Testa processamento de captura ndjson comprimida junto com JSON legado."""
+        input_dir, output_dir = temp_dirs
+        write_raw_capture(
+            {
+                'source_url': 'http://test.com',
+                'metadata': {'total_records': 1},
+                'stocks_data': [{'codigo': 'ITUB4', 'acao': 'ITAU', 'part_percent': '7,5'}]
+            },
+            str(Path(input_dir) / "b3_carteira_teorica_mai_ago_2025.ndjson.gz")
+        )
+        
+        processor = B3ParquetProcessor(
+            input_path=input_dir,
+            output_path=output_dir,
+            upload_to_s3=False
+        )
+        
+        results = processor.process_all_json_files(date(2025, 8, 4))
+        
+        assert results['summary']['successful'] == 1
+        assert results['files_processed'][0]['output_file'].endswith(
+            "ibov_carteira_teorica_20250804.parquet"
+        )
+
 
-if __name__ == "__main__":
-    # Executar testes se script for executado diretamente
-    pytest.main([__file__, "-v", "--tb=short"])
+    def test_manifest_skips_unchanged_files(self, temp_dirs, sample_data):
+        """Testa que o manifesto ignora arquivos inalterados e permite reprocessar tudo."""
+        input_dir, output_dir = temp_dirs
+        processor = B3ParquetProcessor(
+            input_path=input_dir,
+            output_path=output_dir,
+            upload_to_s3=False
+        )
+        
+        first = processor.process_all_json_files(date(2025, 8, 4))
+        second = processor.process_all_json_files(date(2025, 8, 4))
+        forced = processor.process_all_json_files(date(2025, 8, 4), force=True)
+        
+        assert first['summary']['successful'] == 1
+        assert second['summary']['total_files'] == 0
+        assert second['files_skipped'] == ['b3_dados_consolidados.json']
+        assert forced['summary']['successful'] == 1
+        
+        manifest = json.loads((Path(output_dir) / '_processing_manifest.json').read_text())
+        entry = manifest['entries'][sample_data]
+        assert entry['content_hash'].startswith('sha256:')
+        assert entry['output'] == first['files_processed'][0]['output_file']
+        
+        # Conteúdo novo ou nova versão do processador: reprocessa
+        with open(sample_data, 'a', encoding='utf-8') as f:
+            f.write('\n')
+        assert processor.process_all_json_files(date(2025, 8, 4))['summary']['successful'] == 1
+        with patch('scraping.parquet_processor.PROCESSOR_VERSION', '999'):
+            assert processor.process_all_json_files(date(2025, 8, 4))['summary']['successful'] == 1
+
+    def test_manifest_does_not_skip_other_dates(self, temp_dirs, sample_data):
+        """Testa que o mesmo arquivo bruto é gravado na partição de cada data processada."""
+        input_dir, output_dir = temp_dirs
+        processor = B3ParquetProcessor(
+            input_path=input_dir,
+            output_path=output_dir,
+            upload_to_s3=False
+        )
+
+        first = processor.process_all_json_files(date(2025, 8, 4))
+        second = processor.process_all_json_files(date(2025, 8, 5))
+
+        assert first['summary']['successful'] == 1
+        assert second['summary']['successful'] == 1
+        assert second['files_skipped'] == []
+        for day in ('04', '05'):
+            assert list((Path(output_dir) / 'ano=2025' / 'mes=08' / f'dia={day}').glob('*.parquet'))
+
+        manifest = json.loads((Path(output_dir) / '_processing_manifest.json').read_text())
+        assert manifest['entries'][sample_data]['partition'] == 'ano=2025/mes=08/dia=05'
+
+        # Mesma data da última execução: ignorado
+        assert processor.process_all_json_files(date(2025, 8, 5))['summary']['total_files'] == 0
+
+    @patch('scraping.parquet_processor.boto3.client')
+    def test_process_all_files_parallel_matches_sequential(self, mock_boto3, temp_dirs):
+        """Testa que o modo com pool de processos gera o mesmo relatório do sequencial."""
+        input_dir, output_dir = temp_dirs
+        mock_boto3.return_value = Mock()
+        for name in ('b3_carteira_dia_codigo', 'b3_carteira_teorica_mai_ago_2025',
+                     'b3_previa_quadrimestral_set_dez_2025'):
+            write_raw_capture(
+                {
+                    'source_url': 'http://test.com',
+                    'metadata': {'total_records': 2},
+                    'stocks_data': [
+                        {'codigo': 'PETR4', 'acao': 'PETROBRAS', 'part_percent': '8,5'},
+                        {'codigo': name[-4:].upper(), 'acao': name, 'part_percent': '1,5'}
+                    ]
+                },
+                str(Path(input_dir) / f"{name}.ndjson.gz")
+            )
+        
+        reports = []
+        for workers, subdir in ((1, 'sequential'), (2, 'parallel')):
+            with patch.dict(os.environ, {'BOVESPA_S3_BUCKET': 'test-bucket'}):
+                processor = B3ParquetProcessor(
+                    input_path=input_dir,
+                    output_path=str(Path(output_dir) / subdir),
+                    upload_to_s3=True
+                )
+            reports.append(processor.process_all_json_files(date(2025, 8, 4), max_workers=workers))
+            assert len(processor.processed_files) == 3
+        
+        sequential, parallel = reports
+        assert parallel['summary'] == sequential['summary']
+        assert parallel['summary']['successful'] == 3
+        for seq_file, par_file in zip(sequential['files_processed'], parallel['files_processed']):
+            assert par_file['source_file'] == seq_file['source_file']
+            assert par_file['s3_key'] == seq_file['s3_key']
+            assert par_file['s3_uploaded'] is True
+            assert par_file['validation_report'] == seq_file['validation_report']
+            assert Path(par_file['output_file']).name == Path(seq_file['output_file']).name
+    
+    def test_process_batches_matches_file_processing(self, temp_dirs, sample_data):
+        """Testa que lotes em memória geram o mesmo Parquet que os arquivos JSON."""
+        input_dir, output_dir = temp_dirs
+        with open(sample_data, encoding='utf-8') as f:
+            stocks = json.load(f)['stocks_data']
+        
+        processor = B3ParquetProcessor(
+            input_path=input_dir,
+            output_path=output_dir,
+            upload_to_s3=False
+        )
+        file_results = processor.process_all_json_files(date(2025, 8, 4))
+        file_df = pd.read_parquet(file_results['files_processed'][0]['output_file'])
+        
+        scraped = {
+            'endpoints': {'carteira_dia_codigo': {'stocks_data': stocks}},
+            'combined_stocks': stocks
+        }
+        batches = build_columnar_batches(scraped)
+        assert [b['source_file'] for b in batches] == [
+            'b3_carteira_dia_codigo.json', 'b3_dados_consolidados.json'
+        ]
+        assert batches[1]['columns']['codigo'] == ['PETR4', 'VALE3']
+        
+        results = processor.process_batches(batches[1:], date(2025, 8, 4))
+        
+        assert results['input_directory'] == 'memory'
+        assert results['summary']['successful'] == 1
+        memory_df = pd.read_parquet(results['files_processed'][0]['output_file'])
+        columns = ['codigo', 'acao', 'tipo', 'qtde_teorica', 'part_percent']
+        pd.testing.assert_frame_equal(memory_df[columns], file_df[columns])
+
+    def test_process_arrow_batch(self, temp_dirs):
+        """Testa processamento de um RecordBatch Arrow extraído da resposta da API."""
+        input_dir, output_dir = temp_dirs
+        record_batch = extract_stocks_to_record_batch({'results': [
+            {'cod': 'PETR4', 'asset': 'PETROBRAS', 'part': '8,5', 'theoricalQty': '1.000'},
+            {'cod': 'VALE3', 'asset': 'VALE', 'part': '6,2', 'theoricalQty': '500'}
+        ]})
+        
+        processor = B3ParquetProcessor(
+            input_path=input_dir,
+            output_path=output_dir,
+            upload_to_s3=False
+        )
+        result = processor.process_stock_batch(
+            {'source_file': 'b3_carteira_dia_codigo.json', 'index': 'IBOV',
+             'num_rows': record_batch.num_rows, 'columns': record_batch},
+            date(2025, 8, 4)
+        )
+        
+        df = pd.read_parquet(result['output_file'])
+        assert df['part_percent'].tolist() == [8.5, 6.2]
+        assert df['theoretical_qty'].tolist() == [1000, 500]
+
+    def test_arrow_batch_float_values_match_dicts(self, temp_dirs):
+        """Testa que valores numéricos (float/int) da API geram o mesmo Parquet nos dois caminhos."""
+        input_dir, output_dir = temp_dirs
+        response = {'results': [
+            {'cod': 'PETR4', 'asset': 'PETROBRAS', 'part': 8.25, 'partAcum': 1e-05, 'theoricalQty': 1000.0},
+            {'cod': 'VALE3', 'asset': 'VALE', 'part': 6.0, 'partAcum': 14.25, 'theoricalQty': 1500.7},
+            {'cod': 'ITUB4', 'asset': 'ITAU', 'part': 3, 'partAcum': '17,25', 'theoricalQty': 2500}
+        ]}
+        processor = B3ParquetProcessor(
+            input_path=input_dir,
+            output_path=output_dir,
+            upload_to_s3=False
+        )
+        
+        from_dicts = processor.process_dataframe(
+            pd.DataFrame(extract_stocks_from_response(response)), 'b3_carteira_dia_codigo.json',
+            'IBOV', date(2025, 8, 4)
+        )
+        record_batch = extract_stocks_to_record_batch(response)
+        from_batch = processor.process_stock_batch(
+            {'source_file': 'b3_carteira_dia_codigo.json', 'index': 'IBOV',
+             'num_rows': record_batch.num_rows, 'columns': record_batch},
+            date(2025, 8, 5)
+        )
+        
+        columns = ['codigo', 'part_percent', 'part_accumulated', 'theoretical_qty']
+        expected = pd.read_parquet(from_dicts['output_file'])[columns]
+        df = pd.read_parquet(from_batch['output_file'])[columns]
+        pd.testing.assert_frame_equal(df, expected)
+        assert df['theoretical_qty'].tolist() == [1000, 1500, 2500]
+        assert from_batch['validation_report']['conversion_errors'] == 0
+    
+    def test_parquet_files_share_canonical_schema(self, temp_dirs):
+        """Testa que entradas com tipos/colunas diferentes geram o mesmo schema Parquet."""
+        import pyarrow.parquet as pq
+        input_dir, output_dir = temp_dirs
+        processor = B3ParquetProcessor(
+            input_path=input_dir,
+            output_path=output_dir,
+            upload_to_s3=False
+        )
+        
+        first = processor.process_stock_batch(
+            {'source_file': 'b3_carteira_dia_codigo.json', 'index': 'IBOV', 'num_rows': 1,
+             'columns': {'codigo': ['PETR4'], 'acao': ['PETROBRAS'],
+                         'theoretical_qty': ['1.000'], 'part_percent': ['8,5']}},
+            date(2025, 8, 4)
+        )
+        second = processor.process_stock_batch(
+            {'source_file': 'b3_carteira_teorica_mai_ago_2025.json', 'index': 'IBOV', 'num_rows': 1,
+             'columns': {'codigo': ['VALE3'], 'acao': ['VALE'], 'setor': ['Mineração'],
+                         'theoretical_qty': [500.0], 'part_percent': [6.2],
+                         'endpoint_name': ['carteira_teorica']}},
+            date(2025, 8, 4)
+        )
+        
+        schemas = [pq.read_schema(r['output_file']) for r in (first, second)]
+        assert schemas[0] == schemas[1] == STOCK_SCHEMA
+        assert schemas[0].metadata is None
+        df = pd.read_parquet(second['output_file'])
+        assert df['theoretical_qty'].tolist() == [500]
+        assert df['segmento'].tolist() == ['N/A']
+    
+    def test_configurable_parquet_write_options(self, temp_dirs):
+        """Testa codec, nível, row group e byte-stream-split configuráveis."""
+        import pyarrow.parquet as pq
+        input_dir, output_dir = temp_dirs
+        processor = B3ParquetProcessor(
+            input_path=input_dir,
+            output_path=output_dir,
+            upload_to_s3=False,
+            write_options={'compression': 'zstd', 'compression_level': 9, 'row_group_size': 2,
+                           'use_byte_stream_split': True}
+        )
+        
+        result = processor.process_stock_batch(
+            {'source_file': 'b3_dados_consolidados.json', 'index': 'IBOV', 'num_rows': 3,
+             'columns': {'codigo': ['PETR4', 'VALE3', 'ITUB4'], 'acao': ['P', 'V', 'I'],
+                         'part_percent': ['8,5', '6,2', '5,1']}},
+            date(2025, 8, 4)
+        )
+        
+        metadata = pq.ParquetFile(result['output_file']).metadata
+        names = [metadata.schema.column(i).name for i in range(metadata.num_columns)]
+        columns = metadata.row_group(0)
+        assert metadata.num_row_groups == 2
+        assert columns.column(0).compression == 'ZSTD'
+        assert 'BYTE_STREAM_SPLIT' in columns.column(names.index('part_percent')).encodings
+        assert 'RLE_DICTIONARY' in columns.column(names.index('codigo')).encodings
+    
+    def test_chunked_processing_matches_single_pass(self, temp_dirs, monkeypatch):
+        """Testa o processamento em lotes de uma captura grande (streaming + ParquetWriter)."""
+        import pyarrow.parquet as pq
+        from scraping import parquet_processor
+        input_dir, output_dir = temp_dirs
+        records = [{'codigo': f'TST{i % 8}', 'acao': f'EMPRESA {i}', 'part_percent': f'{i},5',
+                    'theoretical_qty': f'{i}.000'} for i in range(10)]
+        write_raw_capture({'stocks_data': records, 'index': 'IBOV'},
+                          str(Path(input_dir) / 'b3_dados_consolidados.ndjson.gz'))
+        
+        single = B3ParquetProcessor(input_path=input_dir, output_path=str(Path(output_dir) / 'single'),
+                                    upload_to_s3=False, use_manifest=False)
+        expected = pd.read_parquet(single.process_all_json_files(date(2025, 8, 4))
+                                   ['files_processed'][0]['output_file'])
+        
+        chunked = B3ParquetProcessor(input_path=input_dir, output_path=output_dir,
+                                     upload_to_s3=False, use_manifest=False)
+        chunked.chunk_size = 4
+        chunked.memory_limit_mb = 0
+        monkeypatch.setattr(parquet_processor.ProcessingConfig, 'MIN_CHUNK_SIZE', 2)
+        monkeypatch.setattr(parquet_processor, 'current_rss_mb', lambda: 100.0)
+        result = chunked.process_all_json_files(date(2025, 8, 4))['files_processed'][0]
+        
+        # Lotes de 4, 2, 2 e 2 registros (reduzidos por exceder o limite de memória)
+        assert result['chunks'] == 4
+        assert result['peak_rss_mb'] == 100.0
+        assert result['records_processed'] == 8
+        assert pq.ParquetFile(result['output_file']).metadata.num_row_groups == 4
+        df = pd.read_parquet(result['output_file'])
+        columns = ['codigo', 'acao', 'part_percent', 'theoretical_qty']
+        pd.testing.assert_frame_equal(df[columns], expected[columns])
+        assert df['processed_at'].nunique() == 1
+    
+    def test_s3_sink_writes_without_local_copy(self, temp_dirs, sample_data, monkeypatch):
+        """Testa escrita do Parquet direto no S3 (moto), sem cópia no data lake local."""
+        moto = pytest.importorskip('moto')
+        import io
+        input_dir, output_dir = temp_dirs
+        monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+        monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+        monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+        monkeypatch.setenv('BOVESPA_S3_BUCKET', 'test-bucket')
+        
+        with moto.mock_aws():
+            import boto3
+            client = boto3.client('s3', region_name='us-east-1')
+            client.create_bucket(Bucket='test-bucket')
+            processor = B3ParquetProcessor(
+                input_path=input_dir,
+                output_path=output_dir,
+                upload_to_s3=True,
+                keep_local_copy=False
+            )
+            
+            results = processor.process_all_json_files(date(2025, 8, 4))
+            
+            result = results['files_processed'][0]
+            key = 'data_lake/ano=2025/mes=08/dia=04/ibov_consolidado_20250804.parquet'
+            assert result['s3_uploaded'] is True
+            assert result['s3_key'] == key
+            assert result['output_file'] == f"s3://test-bucket/{key}"
+            assert 'upload_report' not in results
+            body = client.get_object(Bucket='test-bucket', Key=key)['Body'].read()
+            df = pd.read_parquet(io.BytesIO(body))
+            assert df['codigo'].tolist() == ['PETR4', 'VALE3']
+        
+        assert not list(Path(output_dir).glob('ano=*'))
+    
+    def test_s3_sink_streams_chunked_files(self, temp_dirs, monkeypatch):
+        """Testa o caminho em lotes do destino S3, sem arquivo temporário local."""
+        moto = pytest.importorskip('moto')
+        import io
+        import tempfile as tempfile_module
+        input_dir, output_dir = temp_dirs
+        monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+        monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+        monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+        monkeypatch.setenv('BOVESPA_S3_BUCKET', 'test-bucket')
+        monkeypatch.setattr(tempfile_module, 'mkstemp', Mock(side_effect=AssertionError("/tmp usado")))
+        records = [{'codigo': f'TST{i}', 'acao': f'EMPRESA {i}', 'part_percent': f'{i},5'} for i in range(10)]
+        write_raw_capture({'stocks_data': records, 'index': 'IBOV'},
+                          str(Path(input_dir) / 'b3_dados_consolidados.ndjson.gz'))
+        
+        with moto.mock_aws():
+            import boto3
+            client = boto3.client('s3', region_name='us-east-1')
+            client.create_bucket(Bucket='test-bucket')
+            processor = B3ParquetProcessor(input_path=input_dir, output_path=output_dir,
+                                           upload_to_s3=True, keep_local_copy=False, use_manifest=False)
+            processor.chunk_size = 4
+            
+            result = processor.process_all_json_files(date(2025, 8, 4))['files_processed'][0]
+            
+            assert result['chunks'] == 3
+            body = client.get_object(Bucket='test-bucket', Key=result['s3_key'])['Body'].read()
+            assert pd.read_parquet(io.BytesIO(body))['codigo'].tolist() == [r['codigo'] for r in records]
+        
+        assert not list(Path(output_dir).glob('ano=*'))
+    
+    def test_keep_local_copy_requires_upload(self, temp_dirs):
+        """Testa que desativar a cópia local exige upload para o S3."""
+        input_dir, output_dir = temp_dirs
+        with pytest.raises(ValueError):
+            B3ParquetProcessor(input_path=input_dir, output_path=output_dir,
+                               upload_to_s3=False, keep_local_copy=False)
+    
+    def test_build_columnar_batches_skips_unchanged(self):
+        """Testa que endpoints inalterados (cache HTTP) não geram lotes."""
+        scraped = {
+            'endpoints': {
+                'carteira_dia': {'stocks_data': [{'codigo': 'A'}], 'not_modified': True},
+                'carteira_teorica': {'stocks_data': [{'codigo': 'B'}, {'tipo': 'PN'}]}
+            },
+            'combined_stocks': [{'codigo': 'A'}, {'codigo': 'B'}, {'tipo': 'PN'}]
+        }
+        
+        batches = build_columnar_batches(scraped)
+        
+        assert [b['source_file'] for b in batches] == [
+            'b3_carteira_teorica_mai_ago_2025.json', 'b3_dados_consolidados.json'
+        ]
+        assert batches[0]['columns'] == {'codigo': ['B', None], 'tipo': [None, 'PN']}
+        
+        scraped['endpoints']['carteira_teorica']['not_modified'] = True
+        assert build_columnar_batches(scraped) == []
+
+
+
+class TestS3Uploader:
+    """Testes do upload concorrente com retry."""
+    
+    @pytest.fixture
+    def parquet_files(self, tmp_path):
+        files = []
+        for i, size in enumerate((1024, 2048, 4096)):
+            path = tmp_path / f"part_{i}.parquet"
+            path.write_bytes(b"x" * size)
+            files.append(path)
+        return files
+    
+    def test_upload_many_retries_and_reports_timings(self, parquet_files):
+        """Testa retry com backoff e o relatório por objeto."""
+        client = Mock()
+        calls = []
+        
+        def flaky_upload(filename, bucket, key, ExtraArgs=None, Config=None):
+            calls.append(key)
+            if key.endswith('part_1.parquet') and calls.count(key) == 1:
+                raise ClientError({'Error': {'Code': 'SlowDown'},
+                                   'ResponseMetadata': {'HTTPStatusCode': 503}}, 'PutObject')
+        
+        client.upload_file.side_effect = flaky_upload
+        delays = []
+        uploader = S3Uploader(client, 'test-bucket', max_workers=3, retry_attempts=3,
+                              retry_delay=0.5, sleep=delays.append)
+        
+        report = uploader.upload_many([(f, f"data_lake/{f.name}") for f in parquet_files])
+        
+        assert report['successful'] == 3
+        assert report['failed'] == 0
+        assert report['total_bytes'] == 1024 + 2048 + 4096
+        assert [o['attempts'] for o in report['objects']] == [1, 2, 1]
+        assert all(o['seconds'] >= 0 for o in report['objects'])
+        assert len(delays) == 1 and 0 <= delays[0] <= 0.5
+        _, kwargs = client.upload_file.call_args
+        assert kwargs['Config'] is uploader.transfer_config
+        assert kwargs['ExtraArgs']['ServerSideEncryption'] == 'AES256'
+    
+    def test_upload_gives_up_after_retries(self, parquet_files):
+        """Testa falha definitiva após esgotar as tentativas em erros temporários."""
+        client = Mock()
+        client.upload_file.side_effect = EndpointConnectionError(endpoint_url='https://s3.amazonaws.com')
+        uploader = S3Uploader(client, 'test-bucket', retry_attempts=2, sleep=lambda _: None)
+        
+        record = uploader.upload_file(parquet_files[0], 'data_lake/x.parquet')
+        
+        assert record['success'] is False
+        assert record['attempts'] == 2
+        assert 'Could not connect' in record['error']
+    
+    def test_upload_fails_fast_on_permanent_errors(self, parquet_files):
+        """Testa que AccessDenied, NoSuchBucket e validação não são repetidos."""
+        from boto3.exceptions import S3UploadFailedError
+        
+        def wrapped_access_denied(*args, **kwargs):
+            # upload_file do boto3 troca o ClientError por S3UploadFailedError
+            try:
+                raise ClientError({'Error': {'Code': 'AccessDenied'},
+                                   'ResponseMetadata': {'HTTPStatusCode': 403}}, 'PutObject')
+            except ClientError as e:
+                raise S3UploadFailedError(f"Failed to upload: {e}")
+        
+        errors = [
+            wrapped_access_denied,
+            ClientError({'Error': {'Code': 'NoSuchBucket'},
+                         'ResponseMetadata': {'HTTPStatusCode': 404}}, 'PutObject'),
+            ParamValidationError(report='Invalid bucket name')
+        ]
+        records = []
+        for error in errors:
+            client = Mock()
+            client.upload_file.side_effect = error
+            delays = []
+            uploader = S3Uploader(client, 'test-bucket', retry_attempts=3, sleep=delays.append)
+            
+            records.append(uploader.upload_file(parquet_files[0], 'data_lake/x.parquet'))
+            
+            assert records[-1]['success'] is False
+            assert records[-1]['attempts'] == 1
+            assert delays == []
+        assert 'AccessDenied' in records[0]['error']
+        assert 'NoSuchBucket' in records[1]['error']
+        
+        # Throttling e 5xx continuam com retry
+        assert is_retryable_s3_error(ClientError({'Error': {'Code': 'InternalError'},
+                                                  'ResponseMetadata': {'HTTPStatusCode': 500}}, 'PutObject'))
+        assert not is_retryable_s3_error(Exception("AccessDenied"))
+    
+    def test_upload_many_against_moto(self, parquet_files, monkeypatch):
+        """Testa uploads multipart contra o S3 simulado pelo moto."""
+        moto = pytest.importorskip('moto')
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        
+        monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+        monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+        monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+        big_file = parquet_files[0].parent / "big.parquet"
+        big_file.write_bytes(b"y" * (6 * 1024 * 1024))
+        
+        with moto.mock_aws():
+            client = boto3.client('s3', region_name='us-east-1')
+            client.create_bucket(Bucket='test-bucket')
+            # Partes de 5 MB (mínimo do S3) para forçar multipart no arquivo grande
+            config = TransferConfig(multipart_threshold=5 * 1024 * 1024,
+                                    multipart_chunksize=5 * 1024 * 1024)
+            uploader = S3Uploader(client, 'test-bucket', transfer_config=config)
+            
+            files = parquet_files + [big_file]
+            report = uploader.upload_many([(f, f"data_lake/{f.name}") for f in files])
+            
+            assert report['successful'] == len(files)
+            for f in files:
+                head = client.head_object(Bucket='test-bucket', Key=f"data_lake/{f.name}")
+                assert head['ContentLength'] == f.stat().st_size
+            assert '-' in client.head_object(Bucket='test-bucket', Key="data_lake/big.parquet")['ETag']
+
+
+    def test_multipart_stream_against_moto(self, monkeypatch):
+        """Testa o envio em partes durante a escrita do Parquet e o cancelamento em caso de erro."""
+        moto = pytest.importorskip('moto')
+        import io
+        import boto3
+        import numpy as np
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from scraping.parquet_processor import S3MultipartStream
+        
+        monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+        monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+        monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+        table = pa.table({'x': np.arange(1_000_000, dtype='float64')})
+        
+        with moto.mock_aws():
+            client = boto3.client('s3', region_name='us-east-1')
+            client.create_bucket(Bucket='test-bucket')
+            uploader = S3Uploader(client, 'test-bucket')
+            
+            # Partes de 5 MB (mínimo do S3): 16 MB sem compressão viram várias partes
+            stream = S3MultipartStream(uploader, 'data_lake/big.parquet', part_size=0)
+            with pq.ParquetWriter(stream, table.schema, compression='none') as writer:
+                writer.write_table(table)
+                writer.write_table(table)
+            assert len(stream.parts) >= 3
+            record = stream.complete()
+            
+            body = client.get_object(Bucket='test-bucket', Key='data_lake/big.parquet')['Body'].read()
+            assert record['success'] is True
+            assert record['size_bytes'] == len(body)
+            assert pq.read_table(io.BytesIO(body)).num_rows == 2_000_000
+            
+            # Erro no meio da escrita: multipart cancelado, nenhum objeto criado
+            stream = S3MultipartStream(uploader, 'data_lake/broken.parquet', part_size=0)
+            stream.write(b'x' * (6 * 1024 * 1024))
+            stream.abort()
+            assert client.list_multipart_uploads(Bucket='test-bucket').get('Uploads', []) == []
+            assert 'Contents' not in client.list_objects_v2(Bucket='test-bucket', Prefix='data_lake/broken')
+
+
+class TestLakeCompaction:
+    """Testes da compactação de arquivos diários do data lake."""
+    
+    @staticmethod
+    def write_days(processor, days, codes=('PETR4', 'VALE3')):
+        for day in days:
+            processor.process_stock_batch(
+                {'source_file': 'b3_dados_consolidados.json', 'index': 'IBOV', 'num_rows': len(codes),
+                 'columns': {'codigo': list(codes), 'acao': ['X'] * len(codes),
+                             'part_percent': ['1,5'] * len(codes)}},
+                day
+            )
+    
+    def test_compacted_rows_keep_partition_day(self, tmp_path):
+        """Testa que o dia da partição (não o dia do processamento) sobrevive à compactação."""
+        from glue.local_job import read_data_lake
+        output_dir = tmp_path / "lake"
+        processor = B3ParquetProcessor(input_path=str(tmp_path), output_path=str(output_dir),
+                                       upload_to_s3=False)
+        self.write_days(processor, [date(2024, 3, 4), date(2024, 5, 20)])
+        
+        LakeCompactor(LocalLakeStorage(str(output_dir)), granularity='year').run(until=date(2025, 9, 10))
+        
+        assert not list(output_dir.glob("ano=2024/mes=*"))
+        table = read_data_lake(str(output_dir)).sort_by('extraction_date')
+        assert table['partition_date'].to_pylist() == [date(2024, 3, 4)] * 2 + [date(2024, 5, 20)] * 2
+        assert table['extraction_date'].to_pylist() == [date(2024, 3, 4)] * 2 + [date(2024, 5, 20)] * 2
+        assert table['year_month'].to_pylist() == ['2024-03'] * 2 + ['2024-05'] * 2
+    
+    def test_compaction_stages_outputs_before_promoting(self, tmp_path):
+        """Testa que os compactados só aparecem na partição depois de gravados no staging."""
+        output_dir = tmp_path / "lake"
+        processor = B3ParquetProcessor(input_path=str(tmp_path), output_path=str(output_dir),
+                                       upload_to_s3=False)
+        self.write_days(processor, [date(2025, 8, 4), date(2025, 8, 5)])
+        storage = LocalLakeStorage(str(output_dir))
+        daily = storage.list_files()
+        
+        # Falha na gravação: partição intacta e staging descartado
+        with patch.object(LocalLakeStorage, 'write', side_effect=IOError("disco cheio")):
+            results = LakeCompactor(storage).run(until=date(2025, 9, 10))
+        assert results['errors']
+        assert storage.list_files() == daily
+        assert not (output_dir / "_staging").exists()
+        
+        # Na promoção, o arquivo completo já está no staging e os leitores ainda veem só os diários
+        promote = LocalLakeStorage.promote
+        seen = []
+        
+        def checked_promote(self, source, key):
+            seen.append((source, sorted(self.list_files()), (self.root / source).exists()))
+            promote(self, source, key)
+        
+        with patch.object(LocalLakeStorage, 'promote', checked_promote):
+            LakeCompactor(storage).run(until=date(2025, 9, 10))
+        
+        monthly = "ano=2025/mes=08/ibov_consolidado_202508.parquet"
+        assert seen == [("_staging/" + monthly, sorted(daily), True)]
+        assert list(storage.list_files()) == [monthly]
+        assert not (output_dir / "_staging").exists()
+    
+    def test_monthly_compaction_is_idempotent(self, tmp_path):
+        """Testa compactação mensal, período em aberto, manifesto e reprocessamento."""
+        output_dir = tmp_path / "lake"
+        processor = B3ParquetProcessor(input_path=str(tmp_path), output_path=str(output_dir),
+                                       upload_to_s3=False)
+        self.write_days(processor, [date(2025, 8, 4), date(2025, 8, 5), date(2025, 9, 1)])
+        daily = output_dir / "ano=2025/mes=08/dia=05/ibov_consolidado_20250805.parquet"
+        manifest = ProcessingManifest(output_dir / "_processing_manifest.json")
+        manifest.record('raw/b3_dados_consolidados.json', 'sha256:x', '1', str(daily))
+        manifest.save()
+        
+        compactor = LakeCompactor(LocalLakeStorage(str(output_dir)), manifest=manifest)
+        results = compactor.run(until=date(2025, 9, 10))
+        
+        monthly = output_dir / "ano=2025/mes=08/ibov_consolidado_202508.parquet"
+        assert results['files_before'] == 2 and results['files_after'] == 1
+        assert not (output_dir / "ano=2025/mes=08/dia=04").exists()
+        assert (output_dir / "ano=2025/mes=09/dia=01/ibov_consolidado_20250901.parquet").exists()
+        assert pd.read_parquet(monthly)['codigo'].tolist() == ['PETR4', 'VALE3'] * 2
+        entry = ProcessingManifest(output_dir / "_processing_manifest.json").load().get(
+            'raw/b3_dados_consolidados.json')
+        assert entry['output'] == str(monthly)
+        assert entry['output_daily'] == str(daily)
+        
+        # Nova execução sem arquivos pendentes não altera nada
+        assert compactor.run(until=date(2025, 9, 10))['groups'] == []
+        
+        # Dia reprocessado substitui apenas a sua faixa de linhas
+        self.write_days(processor, [date(2025, 8, 5)], codes=('ITUB4',))
+        compactor.run(until=date(2025, 9, 10))
+        assert pd.read_parquet(monthly)['codigo'].tolist() == ['PETR4', 'VALE3', 'ITUB4']
+        assert not daily.exists()
+    
+    def test_target_size_splits_and_s3_storage(self, tmp_path, monkeypatch):
+        """Testa divisão por tamanho alvo e compactação anual em um bucket (moto)."""
+        moto = pytest.importorskip('moto')
+        monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+        monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+        monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+        monkeypatch.setenv('BOVESPA_S3_BUCKET', 'test-bucket')
+        
+        with moto.mock_aws():
+            import boto3
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            client = boto3.client('s3', region_name='us-east-1')
+            client.create_bucket(Bucket='test-bucket')
+            processor = B3ParquetProcessor(input_path=str(tmp_path), output_path=str(tmp_path),
+                                           upload_to_s3=True, keep_local_copy=False)
+            self.write_days(processor, [date(2024, 3, 1), date(2024, 3, 2), date(2024, 7, 1)])
+            
+            storage = S3LakeStorage(client, 'test-bucket')
+            results = LakeCompactor(storage, granularity='year', target_file_size_mb=0.000001).run(
+                until=date(2025, 1, 1))
+            
+            assert sorted(storage.list_files()) == [
+                f'ano=2024/ibov_consolidado_2024_part0{i}.parquet' for i in (1, 2, 3)
+            ]
+            assert results['files_deleted'] == 3
+            
+            table = pq.read_table(pa.BufferReader(storage.read_bytes(
+                'ano=2024/ibov_consolidado_2024_part03.parquet')))
+            assert table.num_rows == 2
+            assert table.schema.remove_metadata() == STOCK_SCHEMA
+            
+            # Arquivos já no nível anual não são reescritos
+            assert LakeCompactor(storage, granularity='year').run(until=date(2025, 1, 1))['groups'] == []
 
 
 if __name__ == "__main__":
@@ -4,10 +4,12 @@ Testes simples para o módulo de scraping da B3.
 Versão educacional - foco na funcionalidade básica.
 """
 
+import io
 import sys
 import os
 import pytest
 import json
+import requests
 from unittest.mock import Mock, patch
 
 # Adicionar src ao path para imports funcionarem
@@ -15,7 +17,26 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from scraping import B3Scraper, display_summary
 from scraping.config import ENDPOINTS_CONFIG, Constants
-from scraping.utils import parse_stock_data, validate_json_response
+from scraping.http_cache import ResponseCache
+from scraping.request_executor import RequestExecutor, TokenBucket
+from scraping.utils import (
+    parse_stock_data, validate_json_response, build_endpoint_url, calculate_total_pages,
+    build_index_endpoints, encode_payload, iter_json_results,
+    get_json_codec, decode_stock_records, stock_record_to_dict, JSON_BACKENDS,
+    save_json_data, load_json_data, get_raw_filename, get_logical_filename,
+    extract_stocks_from_response, STOCK_RECORD_BATCH_SCHEMA
+)
+from scraping.config import FileConfig
+
+
+def make_stream_response(payload, chunk_size=16):
+    """Cria resposta mock cujo corpo é lido em blocos (stream=True)."""
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    response = Mock()
+    response.iter_content.side_effect = lambda chunk_size=chunk_size: (
+        body[i:i + chunk_size] for i in range(0, len(body), chunk_size)
+    )
+    return response
 
 
 class TestB3Scraper:
@@ -53,6 +74,86 @@ class TestB3Scraper:
         response = self.scraper.make_request("http://test.com")
         
         assert response is None
+    
+    @patch('scraping.scraping.save_json_data', return_value=True)
+    @patch('scraping.scraping.format_timestamp', return_value='2025-08-03T19:00:00')
+    def test_run_scraping_concurrent_matches_sequential(self, mock_ts, mock_save):
+        """Testa se o modo concorrente gera a mesma estrutura do sequencial."""
+        def fake_endpoint(name, info):
+            return {
+                'source_url': info['url'],
+                'stocks_data': [{'codigo': f'{name[:4].upper()}3', 'acao': name}],
+                'endpoint_description': info['description']
+            }
+        
+        with patch.object(self.scraper, 'process_single_endpoint', side_effect=fake_endpoint):
+            sequential = self.scraper.run_scraping()
+            concurrent = self.scraper.run_scraping(concurrent=True, max_workers=2)
+        
+        assert concurrent == sequential
+        assert list(concurrent['endpoints']) == list(ENDPOINTS_CONFIG)
+        assert concurrent['metadata']['total_stocks_combined'] == len(ENDPOINTS_CONFIG)
+    
+    def test_process_single_endpoint_fetches_all_pages(self):
+        """Testa se as páginas restantes são buscadas e agregadas em ordem."""
+        endpoint_info = ENDPOINTS_CONFIG['carteira_teorica']
+        page_urls = {
+            build_endpoint_url(endpoint_info['method'], endpoint_info['payload'], n): n
+            for n in (1, 2, 3)
+        }
+        
+        def fake_request(url, stream=False):
+            page = page_urls[url]
+            return make_stream_response({
+                'page': {'pageNumber': page, 'pageSize': 2, 'totalRecords': 5},
+                'results': [{'cod': f'P{page}A{i}', 'asset': 'X'} for i in range(2 if page < 3 else 1)]
+            })
+        
+        with patch.object(self.scraper, 'make_request', side_effect=fake_request), \
+             patch.object(self.scraper, 'save_endpoint_data', return_value=True):
+            data = self.scraper.process_single_endpoint('carteira_teorica', endpoint_info)
+        
+        codes = [stock['codigo'] for stock in data['stocks_data']]
+        assert codes == ['P1A0', 'P1A1', 'P2A0', 'P2A1', 'P3A0']
+        assert data['metadata']['total_pages'] == 3
+        assert data['metadata']['pages_fetched'] == 3
+    
+    @patch('scraping.scraping.save_json_data', return_value=True)
+    def test_run_multi_index_scraping(self, mock_save):
+        """Testa fan-out índice × endpoint com um arquivo por combinação."""
+        def fake_request(url, stream=False):
+            return make_stream_response({
+                'page': {'pageNumber': 1, 'pageSize': 120, 'totalRecords': 1},
+                'results': [{'cod': 'TEST3', 'asset': 'TEST'}]
+            })
+        
+        with patch.object(self.scraper, 'make_request', side_effect=fake_request):
+            data = self.scraper.run_multi_index_scraping(['ibov', 'SMLL'], max_workers=3)
+        
+        saved = sorted(call.args[1] for call in mock_save.call_args_list)
+        assert len(saved) == 2 * len(ENDPOINTS_CONFIG)
+        assert 'b3_smll_carteira_teorica.json' in saved
+        assert set(data['indices']) == {'IBOV', 'SMLL'}
+        assert data['metadata']['total_stocks'] == 2 * len(ENDPOINTS_CONFIG)
+        assert data['indices']['SMLL']['endpoints']['carteira_teorica']['index'] == 'SMLL'
+
+    
+    @patch('scraping.scraping.save_json_data', return_value=True)
+    def test_run_scraping_in_memory_writes_nothing(self, mock_save):
+        """Testa que persist_raw=False não grava arquivos brutos."""
+        def fake_request(url, stream=False):
+            return make_stream_response({
+                'page': {'pageNumber': 1, 'pageSize': 120, 'totalRecords': 1},
+                'results': [{'cod': 'TEST3', 'asset': 'TEST'}]
+            })
+        
+        scraper = B3Scraper(persist_raw=False)
+        with patch.object(scraper, 'make_request', side_effect=fake_request):
+            data = scraper.run_scraping(concurrent=True)
+        
+        mock_save.assert_not_called()
+        assert len(data['combined_stocks']) == len(ENDPOINTS_CONFIG)
+        assert data['metadata']['individual_files_saved'] == []
 
 
 class TestUtilityFunctions:
@@ -77,6 +178,27 @@ class TestUtilityFunctions:
         assert result['setor'] == 'Mineração'
         assert result['part_percent'] == 11.5
     
+    def test_extract_stocks_as_record_batch(self):
+        """Testa que o RecordBatch Arrow equivale à lista de dicts."""
+        response = {'results': [
+            {'cod': 'VALE3', 'asset': 'VALE', 'segment': None, 'part': '11,5',
+             'partAcum': None, 'theoricalQty': '1.000.000'},
+            {'cod': 'PETR4', 'asset': 'PETROBRAS', 'part': 8.25, 'theoricalQty': 500}
+        ]}
+        
+        stocks = extract_stocks_from_response(response)
+        batch = extract_stocks_from_response(response, as_record_batch=True)
+        
+        assert batch.schema.equals(STOCK_RECORD_BATCH_SCHEMA)
+        assert batch.num_rows == 2
+        assert batch.column_names == list(stocks[0])
+        rows = batch.to_pylist()
+        assert rows[0] == stocks[0]
+        assert rows[1]['part_percent'] == '8.25'
+        assert rows[1]['theoretical_qty'] == '500'
+        assert rows[1]['part_accumulated'] is None
+        assert extract_stocks_from_response({}, as_record_batch=True).num_rows == 0
+    
     def test_validate_json_response_valid(self):
         """Testa validação de JSON válido."""
         valid_json = '{"test": "data", "results": []}'
@@ -92,6 +214,299 @@ class TestUtilityFunctions:
         result = validate_json_response(invalid_json)
         
         assert result is None
+    
+    def test_iter_json_results_streams_items(self):
+        """Testa decodificação incremental de 'results' com blocos pequenos."""
+        payload = {
+            'results': [{'cod': 'VALE3', 'part': '11,5'}, {'cod': 'PETR4', 'theoricalQty': 123456}],
+            'page': {'pageNumber': 1, 'totalRecords': 2.0e0}
+        }
+        body = json.dumps(payload, ensure_ascii=False, indent=2).encode('utf-8')
+        
+        for chunk_size in (1, 3, 1024):
+            envelope = {}
+            chunks = (body[i:i + chunk_size] for i in range(0, len(body), chunk_size))
+            items = list(iter_json_results(chunks, envelope))
+            
+            assert items == payload['results']
+            assert envelope['page'] == payload['page']
+            assert envelope['results'] == 2
+    
+    def test_iter_json_results_invalid(self):
+        """Testa erro em conteúdo JSON inválido ou truncado."""
+        with pytest.raises(ValueError):
+            list(iter_json_results([b'{ invalid'], {}))
+        with pytest.raises(ValueError):
+            list(iter_json_results([b'{"results": [{"cod": "A"}'], {}))
+    
+    @pytest.mark.parametrize('backend', [name for name, (_, available) in JSON_BACKENDS.items() if available()])
+    def test_json_codec_roundtrip(self, backend):
+        """Testa que todos os backends instalados produzem JSON equivalente."""
+        codec = get_json_codec(backend)
+        data = {'acao': 'Ação', 'part': 11.216, 'qty': 1000, 'items': [None, True]}
+        
+        assert codec.name == backend
+        assert codec.loads(codec.dumps(data)) == data
+        assert json.loads(codec.dumps(data, pretty=True).decode('utf-8')) == data
+        with pytest.raises(ValueError):
+            codec.loads(b'{ invalid')
+    
+    def test_decode_stock_records(self):
+        """Testa decodificação tipada equivalente a parse_stock_data."""
+        raw = [
+            {'cod': 'VALE3', 'asset': 'VALE', 'sectorName': 'Mineração', 'part': '11,216',
+             'theoricalQty': '1.000.000', 'extra': 1},
+            {'cod': 'PETR4', 'asset': 'PETROBRAS', 'part': 8.5}
+        ]
+        content = json.dumps({'page': {'totalRecords': 2}, 'results': raw}).encode('utf-8')
+        
+        records = decode_stock_records(content)
+        
+        assert records[0].codigo == 'VALE3'
+        assert [stock_record_to_dict(r) for r in records] == [parse_stock_data(r) for r in raw]
+    
+    @pytest.mark.parametrize('compression', ['gzip', 'zstd'])
+    def test_raw_capture_roundtrip(self, tmp_path, compression):
+        """Testa gravação/leitura da captura ndjson comprimida (consolidado sem duplicação)."""
+        if compression == 'zstd':
+            pytest.importorskip('zstandard')
+        stocks = [
+            {'codigo': 'VALE3', 'acao': 'VALE', 'endpoint_name': 'carteira_teorica'},
+            {'codigo': 'PETR4', 'acao': 'PETROBRAS', 'endpoint_name': 'previa_quadrimestral'}
+        ]
+        data = {
+            'timestamp': '2025-08-04T10:00:00',
+            'endpoints': {
+                'carteira_teorica': {'source_url': 'http://a', 'stocks_data': stocks[:1],
+                                     'metadata': {'total_records': 1, 'page_size': 120}},
+                'previa_quadrimestral': {'source_url': 'http://b', 'stocks_data': stocks[1:],
+                                         'metadata': {'total_records': 1, 'page_size': 120}}
+            },
+            'combined_stocks': stocks,
+            'metadata': {'total_stocks_combined': 2}
+        }
+        
+        with patch.object(FileConfig, 'DATA_DIR', str(tmp_path)), \
+             patch.object(FileConfig, 'RAW_COMPRESSION', compression):
+            assert save_json_data(data, 'b3_dados_consolidados.json') is True
+            raw_name = get_raw_filename('b3_dados_consolidados.json')
+            loaded = load_json_data('b3_dados_consolidados.json')
+        
+        assert raw_name == 'b3_dados_consolidados' + FileConfig.RAW_SUFFIXES[compression]
+        assert (tmp_path / raw_name).exists()
+        assert get_logical_filename(raw_name) == 'b3_dados_consolidados.json'
+        assert loaded == data
+    
+    def test_load_json_data_reads_legacy_json(self, tmp_path):
+        """Testa leitura transparente de arquivos JSON legados."""
+        (tmp_path / 'b3_legado.json').write_text(json.dumps({'stocks_data': [{'codigo': 'A'}]}))
+        
+        with patch.object(FileConfig, 'DATA_DIR', str(tmp_path)):
+            loaded = load_json_data('b3_legado.json')
+        
+        assert loaded == {'stocks_data': [{'codigo': 'A'}]}
+    
+    def test_build_endpoint_url_matches_configured_urls(self):
+        """Testa se o payload builder reproduz as URLs configuradas (página 1)."""
+        for endpoint_info in ENDPOINTS_CONFIG.values():
+            url = build_endpoint_url(endpoint_info['method'], endpoint_info['payload'])
+            assert url == endpoint_info['url']
+    
+    def test_build_index_endpoints(self):
+        """Testa parametrização do índice no payload."""
+        endpoints = build_index_endpoints('idiv')
+        
+        assert set(endpoints) == set(ENDPOINTS_CONFIG)
+        for endpoint_info in endpoints.values():
+            assert endpoint_info['payload']['index'] == 'IDIV'
+            assert encode_payload(endpoint_info['payload']) in endpoint_info['url']
+            assert endpoint_info['filename'].startswith('b3_idiv_')
+        assert build_index_endpoints('IBOV')['carteira_teorica']['url'] == ENDPOINTS_CONFIG['carteira_teorica']['url']
+    
+    def test_calculate_total_pages(self):
+        """Testa cálculo do número de páginas."""
+        assert calculate_total_pages(120, 120) == 1
+        assert calculate_total_pages(121, 120) == 2
+        assert calculate_total_pages(0, 120) == 1
+
+
+class TestResponseCache:
+    """
+    Testes para o cache persistente de respostas HTTP.
+    """
+    
+    @staticmethod
+    def make_response(content=b'{"results": []}', etag='"v1"', status_code=200):
+        response = Mock()
+        response.status_code = status_code
+        response.content = content
+        response.encoding = 'utf-8'
+        response.headers = {'ETag': etag, 'Last-Modified': 'Mon, 04 Aug 2025 10:00:00 GMT'}
+        response.raise_for_status.return_value = None
+        return response
+    
+    def test_store_and_conditional_headers(self, tmp_path):
+        """Testa armazenamento e headers de GET condicional."""
+        cache = ResponseCache(str(tmp_path))
+        cache.store("http://test.com/a", self.make_response())
+        
+        entry = cache.get("http://test.com/a")
+        
+        assert entry['content'] == b'{"results": []}'
+        assert cache.conditional_headers(entry) == {
+            'If-None-Match': '"v1"',
+            'If-Modified-Since': 'Mon, 04 Aug 2025 10:00:00 GMT'
+        }
+        assert cache.get("http://test.com/b") is None
+    
+    def test_lru_eviction_by_size(self, tmp_path):
+        """Testa evicção da entrada menos usada quando o limite é excedido."""
+        cache = ResponseCache(str(tmp_path), max_size_mb=1.5 / 1024)  # 1,5 KB
+        cache.store("http://test.com/a", self.make_response(b'a' * 700))
+        cache.store("http://test.com/b", self.make_response(b'b' * 700))
+        cache.get("http://test.com/a")  # 'a' passa a ser a mais recente
+        cache.store("http://test.com/c", self.make_response(b'c' * 700))
+        
+        assert cache.get("http://test.com/a") is not None
+        assert cache.get("http://test.com/b") is None
+        assert cache.get("http://test.com/c") is not None
+    
+    def test_make_request_revalidates_with_304(self, tmp_path):
+        """Testa revalidação: resposta 304 retorna o conteúdo do cache."""
+        cache = ResponseCache(str(tmp_path), ttl_seconds=0)
+        scraper = B3Scraper(cache=cache)
+        
+        with patch.object(scraper.session, 'get', return_value=self.make_response()):
+            first = scraper.make_request("http://test.com/a")
+        with patch.object(scraper.session, 'get',
+                          return_value=self.make_response(status_code=304)) as mock_get:
+            second = scraper.make_request("http://test.com/a")
+        
+        assert first.status_code == 200
+        assert second.from_cache is True
+        assert second.text == '{"results": []}'
+        assert mock_get.call_args.kwargs['headers']['If-None-Match'] == '"v1"'
+    
+    def test_make_request_fresh_entry_skips_network(self, tmp_path):
+        """Testa que entradas dentro do TTL não geram requisição."""
+        cache = ResponseCache(str(tmp_path), ttl_seconds=3600)
+        cache.store("http://test.com/a", self.make_response())
+        scraper = B3Scraper(cache=cache)
+        
+        with patch.object(scraper.session, 'get') as mock_get:
+            response = scraper.make_request("http://test.com/a")
+        
+        mock_get.assert_not_called()
+        assert response.from_cache is True
+    
+    @staticmethod
+    def make_stream_response(content):
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = io.BytesIO(content)
+        response.encoding = 'utf-8'
+        response.headers = requests.structures.CaseInsensitiveDict({'ETag': '"v2"'})
+        return response
+    
+    def test_store_streamed_response_while_consumed(self, tmp_path):
+        """Testa que respostas stream=True são gravadas à medida que são lidas."""
+        cache = ResponseCache(str(tmp_path))
+        content = b'{"results": [' + b'{"cod": "PETR4"},' * 100 + b'{}]}'
+        response = self.make_stream_response(content)
+        
+        cache.store("http://test.com/a", response)
+        
+        # Nada é lido nem registrado antes de o consumidor percorrer o stream
+        assert response._content_consumed is False
+        assert cache.get("http://test.com/a") is None
+        
+        chunks = list(response.iter_content(chunk_size=64))
+        
+        assert b''.join(chunks) == content
+        entry = cache.get("http://test.com/a")
+        assert entry['content'] == content
+        assert entry['size'] == len(content)
+        assert entry['etag'] == '"v2"'
+    
+    def test_interrupted_stream_is_not_cached(self, tmp_path):
+        """Testa que um stream consumido parcialmente não gera entrada no cache."""
+        cache = ResponseCache(str(tmp_path))
+        response = self.make_stream_response(b'x' * 1024)
+        cache.store("http://test.com/a", response)
+        
+        stream = response.iter_content(chunk_size=64)
+        next(stream)
+        stream.close()
+        
+        assert cache.get("http://test.com/a") is None
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestRequestExecutor:
+    """
+    Testes para retry com backoff e rate limit.
+    """
+    
+    @staticmethod
+    def make_response(status_code):
+        response = Mock()
+        response.status_code = status_code
+        if status_code >= 400:
+            response.raise_for_status.side_effect = requests.exceptions.HTTPError(str(status_code))
+        return response
+    
+    def make_executor(self, responses, **kwargs):
+        session = Mock()
+        session.get.side_effect = responses
+        sleeps = []
+        executor = RequestExecutor(session, retry_delay=1, sleep=sleeps.append, **kwargs)
+        return executor, session, sleeps
+    
+    def test_retries_on_5xx_until_success(self):
+        """Testa retry em 5xx com backoff limitado pelo teto exponencial."""
+        executor, session, sleeps = self.make_executor(
+            [self.make_response(503), self.make_response(502), self.make_response(200)]
+        )
+        
+        response = executor.get("http://test.com")
+        
+        assert response.status_code == 200
+        assert session.get.call_count == 3
+        assert len(sleeps) == 2
+        assert 0 <= sleeps[0] <= 1 and 0 <= sleeps[1] <= 2
+        stats = executor.get_stats()
+        assert stats['total_attempts'] == 3
+        assert stats['retries'] == 2
+    
+    def test_retries_on_timeout_and_gives_up(self):
+        """Testa que timeouts são repetidos até esgotar as tentativas."""
+        executor, session, _ = self.make_executor(requests.exceptions.Timeout("timeout"),
+                                                  retry_attempts=2)
+        
+        with pytest.raises(requests.exceptions.Timeout):
+            executor.get("http://test.com")
+        assert session.get.call_count == 2
+    
+    def test_no_retry_on_4xx(self):
+        """Testa que erros 4xx não são repetidos."""
+        executor, session, sleeps = self.make_executor([self.make_response(404)])
+        
+        with pytest.raises(requests.exceptions.HTTPError):
+            executor.get("http://test.com")
+        assert session.get.call_count == 1
+        assert sleeps == []
+    
+    def test_token_bucket_limits_rate_after_burst(self):
+        """Testa que o token bucket libera a rajada e depois espera 1/rate."""
+        now = [0.0]
+        waits = []
+        bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0], sleep=waits.append)
+        
+        assert bucket.acquire() == 0
+        assert bucket.acquire() == 0
+        assert bucket.acquire() == pytest.approx(0.5)
+        assert bucket.acquire() == pytest.approx(1.0)
+        assert waits == [pytest.approx(0.5), pytest.approx(1.0)]
 
 
 class TestConfiguration: